@@ -0,0 +1,336 @@
+"""Motor de agregación compartido por los gráficos de los dashboards.
+
+Un "cubo" es una única pasada ``groupby`` sobre todas las dimensiones de
+análisis con la suma de cada monto y el número de registros por celda. Todos
+los gráficos (por cartera, asesor, campaña, estado, fecha) se sirven
+re-agregando el cubo, que tiene muchas menos filas que los datos originales.
+
+Los montos del cubo se guardan en céntimos ``int64`` (ver ``montos``): las
+sumas, incluidas las actualizaciones por delta, son exactas y se pasan a
+soles solo en los resultados de ``totales``, ``rebanar`` y las series.
+
+Las funciones que recorren los datos aceptan también una ``motor_sql.Vista``
+en lugar del DataFrame (modo ``DASHBOARD_MOTOR=duckdb``): en ese caso la
+agregación se delega a la consulta SQL y devuelve el mismo resultado.
+"""
+import threading
+
+import pandas as pd
+
+from ingesta import calcular_delta, huella_filas
+from montos import a_centimos, a_soles, sumar
+
+# Dimensiones y montos del libro CIERRE GASTOS ADMINISTRATIVOS
+DIMENSIONES_CIERRE = ["CARTERA", "ASESOR", "CAMPANA", "ESTADO_PLANILLA", "FECHA_DE_PAGO"]
+MONTOS_CIERRE = ["VALOR VENTA", "IGV", "MONTO"]
+
+# Montos del libro PAGOS
+MONTOS_PAGOS = ["PAGO PLANILLA", "PAGO GASTOS", "Suma Total", "Pago Planilla y Gastos"]
+
+# Columna con el número de registros de cada celda del cubo
+CANTIDAD = "CANTIDAD"
+
+MESES_CORTOS = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
+
+# Resoluciones de las líneas de tiempo, de la más fina a la más gruesa:
+# (frecuencia de periodo de pandas, nombre). Las semanas van de lunes a domingo
+RESOLUCIONES = [("D", "Día"), ("W-SUN", "Semana"), ("M", "Mes")]
+
+# Periodos máximos de una línea de tiempo antes de pasar a la resolución
+# siguiente (un trimestre por día, ~1,8 años por semana, luego por mes)
+MAX_PERIODOS_SERIE = 93
+
+
+def _es_vista(df):
+    # Vista SQL de motor_sql en lugar de un DataFrame en memoria
+    return not isinstance(df, pd.DataFrame)
+
+
+def construir_cubo(df, dimensiones, montos):
+    """Suma de ``montos`` (en céntimos) y conteo de registros por combinación de ``dimensiones``.
+
+    Las celdas con alguna dimensión nula se conservan (``dropna=False``) para que
+    los totales del cubo coincidan con los de los datos originales.
+    """
+    if _es_vista(df):
+        return df.construir_cubo(dimensiones, montos)
+    centimos = df[dimensiones].assign(**{col: a_centimos(df[col]) for col in montos})
+    grupos = centimos.groupby(dimensiones, observed=True, dropna=False, sort=False)
+    cubo = grupos[montos].sum()
+    cubo[CANTIDAD] = grupos.size()
+    return cubo.reset_index()
+
+
+def aplicar_delta(cubo, cubo_añadidas, cubo_eliminadas, dimensiones, montos):
+    """Actualiza un cubo sumando el cubo de las filas añadidas y restando el de las eliminadas.
+
+    Solo se re-agregan las celdas del cubo, no los datos originales. Las celdas
+    que quedan sin registros se eliminan.
+    """
+    eliminadas = cubo_eliminadas.copy()
+    eliminadas[montos + [CANTIDAD]] = -eliminadas[montos + [CANTIDAD]]
+    combinado = pd.concat([cubo, cubo_añadidas, eliminadas], ignore_index=True)
+    # Las categorías pueden diferir entre versiones: se agrupa sobre los valores
+    for col in dimensiones:
+        if isinstance(combinado[col].dtype, pd.CategoricalDtype) or combinado[col].dtype == object:
+            combinado[col] = combinado[col].astype("string").astype("category")
+    nuevo = combinado.groupby(dimensiones, observed=True, dropna=False, sort=False)[montos + [CANTIDAD]].sum()
+    return nuevo[nuevo[CANTIDAD] > 0].reset_index()
+
+
+def _perdio_categorias(anterior, nuevo, dimensiones):
+    # Si un valor deja de existir (p.ej. un nombre que ahora se muestra con
+    # otra ortografía) las filas sin cambios conservarían en el cubo la
+    # etiqueta vieja: hay que reconstruirlo
+    for col in dimensiones:
+        if isinstance(anterior[col].dtype, pd.CategoricalDtype) and isinstance(nuevo[col].dtype, pd.CategoricalDtype):
+            if not anterior[col].cat.categories.isin(nuevo[col].cat.categories).all():
+                return True
+    return False
+
+
+class CuboIncremental:
+    """Cubo que se actualiza por delta cuando llega una nueva versión de los datos.
+
+    Guarda el cubo de la última versión y su huella (``ingesta.huella_filas``:
+    conteos por ``HASH_FILA`` y una fila por hash con las dimensiones y los
+    montos), no el DataFrame. Con una versión nueva solo
+    agrega las filas añadidas y eliminadas (detectadas por ``HASH_FILA``); si el
+    cambio afecta a más de ``fraccion_maxima`` de las filas, o algún valor de
+    una dimensión desaparece de sus categorías, se reconstruye entero.
+    El cubo de la versión reemplazada se conserva para las sesiones que aún la
+    usan (p.ej. mientras el vigilante precarga la nueva), sin volver atrás.
+    Es seguro para varias sesiones concurrentes (``st.cache_resource``).
+    """
+
+    def __init__(self, dimensiones, montos, fraccion_maxima=0.5):
+        self.dimensiones = dimensiones
+        self.montos = montos
+        self.fraccion_maxima = fraccion_maxima
+        self.version = None
+        # Huella de la versión actual (ver ingesta.huella_filas), no el DataFrame:
+        # una versión expulsada del almacén no queda retenida aquí
+        self.huella = None
+        self.cubo = None
+        self.anterior = None  # (versión, cubo) reemplazados por la actual
+        # Resumen de la última actualización: modo ("completo"/"delta") y filas
+        self.ultima_actualizacion = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, df, version, cubo=None):
+        """Cubo de ``df``; ``version`` identifica los datos (hash del contenido).
+
+        ``cubo`` es un cubo ya calculado para ``df`` (p.ej. de un snapshot) que
+        se adopta sin re-agregar.
+        """
+        with self._lock:
+            if version == self.version:
+                return self.cubo
+            if self.anterior is not None and version == self.anterior[0]:
+                return self.anterior[1]
+
+            modo = "completo"
+            añadidas = eliminadas = 0
+            cubo_actual = self.cubo
+            huella = huella_filas(df, self.dimensiones + self.montos)
+            if cubo is not None:
+                modo = "precalculado"
+                self.cubo = cubo
+            elif self.huella is not None and not _perdio_categorias(self.huella["filas"], df, self.dimensiones):
+                filas_añadidas, filas_eliminadas = calcular_delta(self.huella, huella)
+                añadidas, eliminadas = len(filas_añadidas), len(filas_eliminadas)
+                if añadidas + eliminadas <= self.fraccion_maxima * max(len(df), 1):
+                    modo = "delta"
+                    self.cubo = aplicar_delta(
+                        self.cubo,
+                        construir_cubo(filas_añadidas, self.dimensiones, self.montos),
+                        construir_cubo(filas_eliminadas, self.dimensiones, self.montos),
+                        self.dimensiones, self.montos,
+                    )
+            if modo == "completo":
+                self.cubo = construir_cubo(df, self.dimensiones, self.montos)
+
+            if self.version is not None:
+                self.anterior = (self.version, cubo_actual)
+            self.version = version
+            self.huella = huella
+            self.ultima_actualizacion = {"modo": modo, "añadidas": añadidas, "eliminadas": eliminadas}
+            return self.cubo
+
+
+def _en_soles(df, columnas):
+    # Los céntimos del cubo pasan a soles solo en el resultado
+    for col in columnas:
+        df[col] = a_soles(df[col])
+    return df
+
+
+def totales(cubo, montos):
+    """Totales generales del cubo como ``{monto: suma en soles}``."""
+    return {col: a_soles(int(cubo[col].sum())) for col in montos}
+
+
+def _rebanar_centimos(cubo, dimension, montos):
+    return cubo.groupby(dimension, observed=True)[montos + [CANTIDAD]].sum().reset_index()
+
+
+def rebanar(cubo, dimension, montos, orden=None, ascendente=False, limite=None):
+    """Re-agrega el cubo por una sola dimensión (las filas con dimensión nula se omiten).
+
+    Devuelve un DataFrame con ``dimension``, los ``montos`` (en soles) y
+    ``CANTIDAD``, ordenado por ``orden`` si se indica y recortado a ``limite`` filas.
+    """
+    df = _rebanar_centimos(cubo, dimension, montos)
+    if orden is not None:
+        df = df.sort_values(orden, ascending=ascendente)
+    if limite is not None:
+        df = df.head(limite)
+    return _en_soles(df, montos)
+
+
+def serie_diaria(cubo, columna_fecha, montos, acumulado=None):
+    """Montos por fecha en orden cronológico.
+
+    Si se indica ``acumulado`` (un monto), se añade la columna
+    ``<monto>_ACUMULADO`` con la suma acumulada.
+    """
+    df = _rebanar_centimos(cubo, columna_fecha, montos).sort_values(columna_fecha).reset_index(drop=True)
+    columnas = list(montos)
+    if acumulado is not None:
+        # Acumulado en céntimos: el último valor coincide exactamente con el total
+        df[f"{acumulado}_ACUMULADO"] = df[acumulado].cumsum()
+        columnas.append(f"{acumulado}_ACUMULADO")
+    return _en_soles(df, columnas)
+
+
+def etiqueta_semana(inicio, fin, con_anio=False):
+    """Etiqueta legible de una semana ISO, p.ej. ``Semana 2 (5 - 11 Ene)``."""
+    anio_iso, semana_iso, _ = inicio.isocalendar()
+    if inicio.month == fin.month:
+        rango = f"{inicio.day} - {fin.day} {MESES_CORTOS[fin.month - 1]}"
+    else:
+        rango = f"{inicio.day} {MESES_CORTOS[inicio.month - 1]} - {fin.day} {MESES_CORTOS[fin.month - 1]}"
+    nombre = f"Semana {semana_iso} {anio_iso}" if con_anio else f"Semana {semana_iso}"
+    return f"{nombre} ({rango})"
+
+
+def serie_semanal(cubo, columna_fecha, montos):
+    """Montos por semana ISO (lunes a domingo) en un solo ``groupby``.
+
+    Funciona para cualquier rango de fechas: las semanas se derivan de las
+    fechas con ``to_period('W-SUN')``. Devuelve las columnas ``Semana``
+    (etiqueta), ``INICIO``, ``FIN``, los ``montos`` y ``CANTIDAD`` en orden
+    cronológico; solo aparecen semanas con registros.
+    """
+    df = cubo.dropna(subset=[columna_fecha])
+    semanas = df.groupby(df[columna_fecha].dt.to_period("W-SUN"))[montos + [CANTIDAD]].sum()
+    semanas = _en_soles(semanas.sort_index(), montos)
+
+    inicio = semanas.index.start_time
+    fin = semanas.index.end_time.normalize()
+    con_anio = inicio.isocalendar().year.nunique() > 1
+    etiquetas = [etiqueta_semana(i, f, con_anio) for i, f in zip(inicio, fin)]
+
+    semanas = semanas.reset_index(drop=True)
+    semanas.insert(0, "FIN", fin)
+    semanas.insert(0, "INICIO", inicio)
+    semanas.insert(0, "Semana", etiquetas)
+    return semanas
+
+
+def resolucion_temporal(fechas, max_periodos=MAX_PERIODOS_SERIE):
+    """Resolución más fina de ``RESOLUCIONES`` que cubre ``fechas`` con a lo sumo ``max_periodos`` periodos.
+
+    Devuelve ``(frecuencia, nombre)``; si ni por mes alcanza, la más gruesa.
+    """
+    fechas = pd.Series(fechas).dropna()
+    if fechas.empty:
+        return RESOLUCIONES[0]
+    inicio, fin = fechas.min(), fechas.max()
+    for frecuencia, nombre in RESOLUCIONES:
+        if len(pd.period_range(inicio, fin, freq=frecuencia)) <= max_periodos:
+            return frecuencia, nombre
+    return RESOLUCIONES[-1]
+
+
+def por_resolucion(df, columna_fecha, columnas, max_periodos=MAX_PERIODOS_SERIE):
+    """Re-agrega una serie por fecha a la resolución de ``resolucion_temporal``.
+
+    Suma ``columnas`` por periodo (los montos en céntimos, exactos; las
+    columnas enteras tal cual) y deja en ``columna_fecha`` el inicio de cada
+    periodo. Devuelve ``(serie, nombre de la resolución)``; con resolución
+    diaria la serie se devuelve sin copiar.
+    """
+    frecuencia, nombre = resolucion_temporal(df[columna_fecha], max_periodos)
+    if frecuencia == "D":
+        return df, nombre
+    df = df.dropna(subset=[columna_fecha])
+    montos = [col for col in columnas if not pd.api.types.is_integer_dtype(df[col])]
+    valores = df[columnas].assign(**{col: a_centimos(df[col]) for col in montos})
+    periodos = df[columna_fecha].dt.to_period(frecuencia).dt.start_time.rename(columna_fecha)
+    serie = valores.groupby(periodos)[columnas].sum().sort_index().reset_index()
+    return _en_soles(serie, montos), nombre
+
+
+# ============ AGREGADOS DIRECTOS SOBRE LOS DATOS (libro PAGOS) ============
+
+def sumas_por(df, dimension, columnas, orden=None, limite=None):
+    """Suma exacta (en céntimos) de los montos ``columnas`` por ``dimension``.
+
+    Ordena de mayor a menor por ``orden`` si se indica y recorta a ``limite`` filas.
+    """
+    if _es_vista(df):
+        return df.sumas_por(dimension, columnas, orden, limite)
+    centimos = df[[dimension]].assign(**{col: a_centimos(df[col]) for col in columnas})
+    resultado = centimos.groupby(dimension, observed=True)[columnas].sum().reset_index()
+    if orden is not None:
+        resultado = resultado.sort_values(orden, ascending=False)
+    if limite is not None:
+        resultado = resultado.head(limite)
+    return _en_soles(resultado, columnas)
+
+
+def distintos_por(df, dimension, columna, nombre, limite=None):
+    """Número de valores distintos de ``columna`` por ``dimension`` (en la columna ``nombre``), de mayor a menor."""
+    if _es_vista(df):
+        return df.distintos_por(dimension, columna, nombre, limite)
+    resultado = df.groupby(dimension, observed=True)[columna].nunique().reset_index()
+    resultado.columns = [dimension, nombre]
+    resultado = resultado.sort_values(nombre, ascending=False)
+    return resultado.head(limite) if limite is not None else resultado
+
+
+def sumas_por_fecha(df, columna_fecha, columnas):
+    """Suma exacta por fecha de ``columnas`` (``{columna: nombre}``), con la fecha en ``Fecha``."""
+    if _es_vista(df):
+        return df.sumas_por_fecha(columna_fecha, columnas)
+    por_fecha = sumas_por(df.dropna(subset=[columna_fecha]), columna_fecha, list(columnas))
+    return por_fecha.rename(columns=dict(columnas, **{columna_fecha: "Fecha"})).sort_values("Fecha")
+
+
+def cantidad_por_fecha(df, columna_fecha):
+    """Número de registros por fecha, con las columnas ``Fecha`` y ``Cantidad``."""
+    if _es_vista(df):
+        return df.cantidad_por_fecha(columna_fecha)
+    return df.groupby(columna_fecha).size().rename("Cantidad").rename_axis("Fecha").reset_index().sort_values("Fecha")
+
+
+def sumas_totales(df, columnas):
+    """Suma exacta de cada monto de ``columnas``: ``{columna: soles}``."""
+    if _es_vista(df):
+        return df.sumas(columnas)
+    return {col: sumar(df[col]) for col in columnas}
+
+
+def distintos(df, columna):
+    """Número de valores distintos (no nulos) de ``columna``."""
+    if _es_vista(df):
+        return df.distintos(columna)
+    return df[columna].nunique()
+
+
+def describir(df, columnas):
+    """Resumen estadístico (``describe()``) de las columnas numéricas ``columnas``."""
+    if _es_vista(df):
+        return df.describir(columnas)
+    return df[columnas].describe()
@@ -0,0 +1,121 @@
+"""Almacén de datos compartido por todas las sesiones del proceso.
+
+``st.cache_data`` serializa el resultado y entrega una copia a cada llamador:
+con muchas sesiones abiertas cada una tiene su propio DataFrame. El almacén
+guarda una sola instancia por (conjunto de datos, versión) y la entrega tal
+cual, sin copiar; los llamadores deben tratarla como de solo lectura.
+
+La memoria total se limita a un presupuesto (``DASHBOARD_MEMORIA_MB``). Al
+superarlo se expulsan primero las versiones reemplazadas por una más nueva
+del mismo conjunto y luego las menos usadas (LRU). Las métricas de aciertos,
+fallos, expulsiones y bytes residentes están en ``metricas()``.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# Presupuesto de memoria del almacén en MB (configurable con DASHBOARD_MEMORIA_MB)
+PRESUPUESTO_MB = int(os.environ.get("DASHBOARD_MEMORIA_MB", 1024))
+
+
+def tamano_en_memoria(valor):
+    """Bytes ocupados por los DataFrames/Series contenidos en ``valor`` (tuplas, listas, dicts)."""
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        uso = valor.memory_usage(deep=True)
+        return int(uso.sum()) if isinstance(uso, pd.Series) else int(uso)
+    if isinstance(valor, (tuple, list)):
+        return sum(tamano_en_memoria(v) for v in valor)
+    if isinstance(valor, dict):
+        return sum(tamano_en_memoria(v) for v in valor.values())
+    return 0
+
+
+def _etiqueta(version):
+    # Versión corta para mostrar (las huellas de archivos son tuplas largas)
+    texto = version if isinstance(version, str) else hashlib.sha1(repr(version).encode("utf-8")).hexdigest()
+    return texto[:12]
+
+
+class AlmacenDatos:
+    """Datos de solo lectura por (conjunto, versión) con presupuesto de memoria y LRU.
+
+    Es seguro para sesiones concurrentes: si varias piden a la vez una versión
+    que no está cargada, solo una la carga y las demás esperan su resultado.
+    """
+
+    def __init__(self, presupuesto_mb=None):
+        self.presupuesto = (presupuesto_mb or PRESUPUESTO_MB) * 1024 * 1024
+        self._entradas = OrderedDict()  # (conjunto, versión) -> (valor, bytes)
+        self._cargando = {}  # (conjunto, versión) -> Lock de la carga en curso
+        self._lock = threading.Lock()
+        self._metricas = {"aciertos": 0, "fallos": 0, "expulsiones": 0}
+
+    def obtener(self, conjunto, version, cargar):
+        """Valor de ``conjunto`` en ``version``; ``cargar()`` lo produce si no está en memoria."""
+        clave = (conjunto, version)
+        with self._lock:
+            if clave in self._entradas:
+                self._entradas.move_to_end(clave)
+                self._metricas["aciertos"] += 1
+                return self._entradas[clave][0]
+            lock_carga = self._cargando.setdefault(clave, threading.Lock())
+
+        with lock_carga:
+            with self._lock:
+                # Otra sesión pudo terminar la carga mientras se esperaba
+                if clave in self._entradas:
+                    self._entradas.move_to_end(clave)
+                    self._metricas["aciertos"] += 1
+                    return self._entradas[clave][0]
+            try:
+                valor = cargar()
+                bytes_valor = tamano_en_memoria(valor)
+            except BaseException:
+                with self._lock:
+                    self._metricas["fallos"] += 1
+                    self._cargando.pop(clave, None)
+                raise
+            with self._lock:
+                self._metricas["fallos"] += 1
+                # Las versiones anteriores del mismo conjunto son las primeras en salir
+                for otra in reversed([c for c in self._entradas if c[0] == conjunto]):
+                    self._entradas.move_to_end(otra, last=False)
+                self._entradas[clave] = (valor, bytes_valor)
+                # La entrada y el fin de la carga en el mismo bloque: quien llegue
+                # después la encuentra en memoria y no vuelve a cargar
+                self._cargando.pop(clave, None)
+                self._expulsar(clave)
+            return valor
+
+    def _expulsar(self, conservar):
+        # La entrada recién cargada se conserva aunque sola supere el presupuesto
+        while self._bytes_residentes() > self.presupuesto and len(self._entradas) > 1:
+            clave = next(iter(self._entradas))
+            if clave == conservar:
+                self._entradas.move_to_end(clave)
+                clave = next(iter(self._entradas))
+            del self._entradas[clave]
+            self._metricas["expulsiones"] += 1
+
+    def _bytes_residentes(self):
+        return sum(bytes_valor for _, bytes_valor in self._entradas.values())
+
+    def metricas(self):
+        """Aciertos, fallos, expulsiones, entradas y bytes residentes frente al presupuesto."""
+        with self._lock:
+            return dict(
+                self._metricas,
+                entradas=[f"{conjunto} @ {_etiqueta(version)}" for conjunto, version in self._entradas],
+                bytes_residentes=self._bytes_residentes(),
+                presupuesto=self.presupuesto,
+            )
+
+    def resumen(self):
+        """Métricas en una línea de texto, para mostrar en la barra lateral."""
+        metricas = self.metricas()
+        return (f"{metricas['bytes_residentes'] / 2**20:,.1f} MB de {metricas['presupuesto'] / 2**20:,.0f} MB · "
+                f"{len(metricas['entradas'])} versiones · aciertos {metricas['aciertos']} · "
+                f"fallos {metricas['fallos']} · expulsiones {metricas['expulsiones']}")
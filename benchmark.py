@@ -0,0 +1,346 @@
+"""Benchmark de ingesta, agregación, gráficos y exportación con libros sintéticos.
+
+Genera libros con los mismos esquemas que ``PAGOS ENERO 2026.xlsx`` y
+``CIERRE GASTOS ADMINISTRATIVOS ENERO 2026.xlsx`` (columnas y tipos de
+``ingesta.ESQUEMAS``, datos aleatorios con semilla fija) y mide por etapa el
+tiempo de reloj y la memoria pico del proceso (RSS muestreado):
+
+- ``ingesta_fria``: lectura del Excel y tipado (caché Parquet vacía)
+- ``ingesta_cache``: la misma carga servida desde la caché Parquet
+- cada sección de agregados de los dashboards
+- ``figuras``: construcción de todas las figuras y ``serializacion`` a JSON
+- ``exportar_<formato>``: exportación de los datos detallados
+
+Todo corre sin red, en una carpeta temporal (libros y caché). El resultado se
+guarda en JSON; con ``--comparar`` se contrasta con una ejecución anterior y
+termina con código 1 si alguna etapa empeora más del umbral.
+
+Uso:
+    python benchmark.py [--filas 1000 10000 100000 1000000] [--esquema cierre_gastos|pagos|todos]
+        [--repeticiones 3] [--salida benchmarks] [--comparar benchmarks/anterior.json] [--umbral 0.2]
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import plotly
+import plotly.io as pio
+
+import cache_datos
+from agregados import (DIMENSIONES_CIERRE, MONTOS_CIERRE, cantidad_por_fecha, construir_cubo, distintos_por,
+                       rebanar, serie_diaria, serie_semanal, sumas_por, sumas_por_fecha)
+from exportar import exportar
+from filtros import construir_indice
+from ingesta import ESQUEMAS, PERIODO, cargar_periodos
+from montos import TASA_IGV, conciliar
+from reporte_cierre import REPORTES
+
+FILAS_POR_DEFECTO = [1_000, 10_000, 100_000]
+
+# Valores distintos de cada dimensión en los libros sintéticos
+CARDINALIDADES = {
+    "ASESOR": 40, "CARTERA": 8, "CAMPANA": 3, "CAMPAÑA": 3, "SUBCARTERA": 20,
+    "RAZON_SOCIAL": 2_000, "RAZON SOCIAL": 2_000, "ESTADO_PLANILLA": 3,
+}
+
+# Intervalo de muestreo de la memoria del proceso (segundos)
+INTERVALO_MEMORIA = 0.005
+
+# Diferencia mínima (segundos) para contar una regresión: por debajo es ruido
+DIFERENCIA_MINIMA = 0.01
+
+
+# ============ LIBROS SINTÉTICOS ============
+
+def _columna_sintetica(col, tipo, filas, rng):
+    if tipo == "categoria":
+        valores = np.array([f"{col} {i:04d}" for i in range(CARDINALIDADES.get(col, 10))], dtype=object)
+        return valores[rng.integers(0, len(valores), filas)]
+    if tipo == "fecha":
+        inicio = datetime(2026, 1, 1)
+        return [inicio + timedelta(days=int(d)) for d in rng.integers(0, 31, filas)]
+    if tipo == "entero":
+        return rng.integers(10_000_000, 99_999_999, filas).tolist()
+    if tipo == "monto":
+        return np.round(rng.gamma(2.0, 150.0, filas), 2).tolist()
+    return [f"{col[:3]}-{i:07d}" for i in range(filas)]
+
+
+def datos_sinteticos(nombre_esquema, filas, semilla=2026):
+    """Columnas del esquema con ``filas`` valores aleatorios (como listas Python, listas para openpyxl)."""
+    rng = np.random.default_rng(semilla)
+    datos = {col: list(_columna_sintetica(col, tipo, filas, rng))
+             for col, tipo in ESQUEMAS[nombre_esquema]["columnas"].items()}
+    if nombre_esquema == "cierre_gastos":
+        # MONTO e IGV coherentes con el VALOR VENTA, como en el libro real
+        venta = np.array(datos["VALOR VENTA"])
+        igv = np.round(venta * TASA_IGV / 100, 2)
+        datos["IGV"] = igv.tolist()
+        datos["MONTO"] = np.round(venta + igv, 2).tolist()
+    else:
+        planilla, gastos = np.array(datos["PAGO PLANILLA"]), np.array(datos["PAGO GASTOS"])
+        datos["Suma Total"] = datos["Pago Planilla y Gastos"] = np.round(planilla + gastos, 2).tolist()
+    return datos
+
+
+def generar_libro(nombre_esquema, filas, directorio, semilla=2026):
+    """Escribe el libro sintético del esquema en ``directorio`` y devuelve su ruta."""
+    esquema = ESQUEMAS[nombre_esquema]
+    datos = datos_sinteticos(nombre_esquema, filas, semilla)
+    libro = openpyxl.Workbook(write_only=True)
+    hoja = libro.create_sheet(esquema["hoja"])
+    hoja.append(list(datos))
+    for fila in zip(*datos.values()):
+        hoja.append(fila)
+    if esquema["descartar_sin"]:
+        # Fila de totales al final (sin ASESOR), que la ingesta descarta
+        hoja.append([None] * (len(datos) - 1) + ["TOTAL"])
+    ruta = Path(directorio) / esquema["archivo"]
+    libro.save(ruta)
+    return ruta
+
+
+# ============ MEDICIÓN ============
+
+def _rss_bytes():
+    # Memoria residente actual del proceso (Linux); None si no se puede leer
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class MedidorMemoria:
+    """RSS pico del proceso mientras dura el bloque ``with`` (muestreo en un hilo)."""
+
+    def __enter__(self):
+        self.inicio = self.pico = _rss_bytes()
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+        self._hilo.start()
+        return self
+
+    def _muestrear(self):
+        while self.inicio is not None and not self._parar.wait(INTERVALO_MEMORIA):
+            self.pico = max(self.pico, _rss_bytes())
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._hilo.join()
+        if self.inicio is not None:
+            self.pico = max(self.pico, _rss_bytes())
+
+
+def medir(funcion, repeticiones=1, preparar=None):
+    """Ejecuta ``funcion`` ``repeticiones`` veces; devuelve ``(resultado, medición)``.
+
+    ``preparar()`` se llama antes de cada repetición, fuera del tiempo medido.
+    La medición incluye los tiempos (mínimo y mediana) y la memoria pico.
+    """
+    tiempos = []
+    pico = incremento = None
+    for _ in range(repeticiones):
+        if preparar is not None:
+            preparar()
+        gc.collect()
+        with MedidorMemoria() as memoria:
+            inicio = time.perf_counter()
+            resultado = funcion()
+            tiempos.append(time.perf_counter() - inicio)
+        if memoria.inicio is not None:
+            pico = max(pico or 0, memoria.pico)
+            incremento = max(incremento or 0, memoria.pico - memoria.inicio)
+    medicion = {
+        "segundos": min(tiempos),
+        "segundos_mediana": statistics.median(tiempos),
+        "memoria_pico_mb": round(pico / 2**20, 1) if pico is not None else None,
+        "memoria_incremento_mb": round(incremento / 2**20, 1) if incremento is not None else None,
+    }
+    return resultado, medicion
+
+
+# ============ ETAPAS ============
+
+def secciones_cierre(df):
+    """Secciones de agregación del dashboard de finanzas como ``{nombre: función}``."""
+    cubo = construir_cubo(df, DIMENSIONES_CIERRE, MONTOS_CIERRE)
+    return {
+        "cubo": lambda: construir_cubo(df, DIMENSIONES_CIERRE, MONTOS_CIERRE),
+        "rebanadas": lambda: [rebanar(cubo, dim, MONTOS_CIERRE, orden="MONTO")
+                              for dim in ["CARTERA", "ASESOR", "CAMPANA", "ESTADO_PLANILLA"]],
+        "serie_diaria": lambda: serie_diaria(cubo, "FECHA_DE_PAGO", MONTOS_CIERRE, acumulado="MONTO"),
+        "serie_semanal": lambda: serie_semanal(cubo, "FECHA_DE_PAGO", MONTOS_CIERRE),
+        "conciliacion": lambda: conciliar(df),
+        "indice_filtros": lambda: construir_indice(df, [PERIODO, "ASESOR", "CARTERA", "CAMPANA", "RAZON_SOCIAL"],
+                                                   "FECHA_DE_PAGO"),
+    }
+
+
+def secciones_pagos(df):
+    """Secciones de agregación del dashboard de pagos como ``{nombre: función}``."""
+    return {
+        "por_asesor": lambda: [sumas_por(df, "ASESOR", ["PAGO PLANILLA"], orden="PAGO PLANILLA", limite=10),
+                               sumas_por(df, "ASESOR", ["PAGO GASTOS"], orden="PAGO GASTOS", limite=10),
+                               distintos_por(df, "ASESOR", "CARTERA", "Cantidad_Cartera", limite=10)],
+        "por_fecha": lambda: [sumas_por_fecha(df, "FECHA_DE_PAGO", {"PAGO PLANILLA": "Pago Planilla",
+                                                                    "PAGO GASTOS": "Pago Gastos"}),
+                              cantidad_por_fecha(df, "FECHA_DE_PAGO"),
+                              sumas_por_fecha(df, "Fecha de Pago", {"Suma Total": "Suma Total"})],
+        "por_campana_razon": lambda: [sumas_por(df, "CAMPAÑA", ["Suma Total"], orden="Suma Total"),
+                                      sumas_por(df, "RAZON SOCIAL", ["Suma Total", "Pago Planilla y Gastos"],
+                                                orden="Suma Total", limite=10)],
+        "resumen_estadistico": lambda: df[["Suma Total", "Pago Planilla y Gastos"]].describe(),
+        "indice_filtros": lambda: construir_indice(df, [PERIODO, "ASESOR", "CARTERA", "CAMPAÑA", "RAZON SOCIAL"],
+                                                   "FECHA_DE_PAGO"),
+    }
+
+
+SECCIONES = {
+    "cierre_gastos": secciones_cierre,
+    "pagos": secciones_pagos,
+}
+
+
+def medir_esquema(nombre_esquema, filas, directorio, repeticiones=1, formatos_exportacion=("xlsx", "csv", "parquet")):
+    """Genera el libro de ``filas`` filas y mide todas las etapas; devuelve ``{etapa: medición}``."""
+    etapas = {}
+    carpeta = Path(directorio) / f"{nombre_esquema}-{filas}"
+    carpeta.mkdir(parents=True, exist_ok=True)
+    _, etapas["generar_libro"] = medir(lambda: generar_libro(nombre_esquema, filas, carpeta))
+
+    def vaciar_cache():
+        shutil.rmtree(cache_datos.DIRECTORIO_CACHE, ignore_errors=True)
+
+    (df, _), etapas["ingesta_fria"] = medir(lambda: cargar_periodos(nombre_esquema, carpeta), preparar=vaciar_cache)
+    _, etapas["ingesta_cache"] = medir(lambda: cargar_periodos(nombre_esquema, carpeta), repeticiones)
+
+    for seccion, funcion in SECCIONES[nombre_esquema](df).items():
+        _, etapas[f"agregados_{seccion}"] = medir(funcion, repeticiones)
+
+    calcular, dibujar = REPORTES[nombre_esquema]
+    kpis, tablas = calcular(df)
+    figuras, etapas["figuras"] = medir(lambda: dibujar(kpis, tablas, "Enero 2026"), repeticiones)
+    _, etapas["serializacion"] = medir(lambda: [pio.to_json(fig, validate=False) for fig in figuras.values()],
+                                       repeticiones)
+
+    detalle = df[[col for col in ESQUEMAS[nombre_esquema]["columnas"] if col in df.columns]]
+    for formato in formatos_exportacion:
+        _, etapas[f"exportar_{formato}"] = medir(lambda: exportar(detalle, formato))
+    return etapas
+
+
+# ============ RESULTADOS ============
+
+def _commit_git():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def entorno():
+    """Versiones y máquina, para interpretar los resultados."""
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit_git(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "plotly": plotly.__version__,
+        "openpyxl": openpyxl.__version__,
+    }
+
+
+def comparar(actual, anterior, umbral):
+    """Etapas que empeoran más de ``umbral`` (fracción) frente a ``anterior``: ``[(clave, antes, ahora)]``.
+
+    No cuentan las diferencias menores que ``DIFERENCIA_MINIMA`` segundos.
+    """
+    regresiones = []
+    for clave, etapas in actual["resultados"].items():
+        for etapa, medicion in etapas.items():
+            previa = anterior.get("resultados", {}).get(clave, {}).get(etapa)
+            if not previa or not previa["segundos"]:
+                continue
+            cambio = medicion["segundos"] / previa["segundos"] - 1
+            empeora = cambio > umbral and medicion["segundos"] - previa["segundos"] > DIFERENCIA_MINIMA
+            marca = "⚠" if empeora else " "
+            print(f"  {marca} {clave:>22} {etapa:<30} {previa['segundos']:9.4f}s -> {medicion['segundos']:9.4f}s "
+                  f"({cambio:+.0%})")
+            if empeora:
+                regresiones.append((f"{clave}/{etapa}", previa["segundos"], medicion["segundos"]))
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de los dashboards con libros sintéticos.")
+    parser.add_argument("--filas", type=int, nargs="+", default=FILAS_POR_DEFECTO,
+                        help="Tamaños de libro a medir (por defecto 1000 10000 100000; 1000000 tarda varios minutos)")
+    parser.add_argument("--esquema", choices=sorted(ESQUEMAS) + ["todos"], default="todos",
+                        help="Libros a medir (por defecto, todos)")
+    parser.add_argument("--repeticiones", type=int, default=3,
+                        help="Repeticiones de las etapas rápidas; se informa el mínimo y la mediana (por defecto 3)")
+    parser.add_argument("--salida", default="benchmarks", help="Carpeta del JSON de resultados (por defecto 'benchmarks')")
+    parser.add_argument("--comparar", default=None, help="JSON de una ejecución anterior para detectar regresiones")
+    parser.add_argument("--umbral", type=float, default=0.2,
+                        help="Empeoramiento relativo que cuenta como regresión (por defecto 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    esquemas = sorted(ESQUEMAS) if args.esquema == "todos" else [args.esquema]
+    resultado = {"entorno": entorno(), "resultados": {}}
+    directorio = Path(tempfile.mkdtemp(prefix="benchmark_dashboards_"))
+    cache_original = cache_datos.DIRECTORIO_CACHE
+    # Caché Parquet aislada: no se toca la caché real de los dashboards
+    cache_datos.DIRECTORIO_CACHE = directorio / ".cache_datos"
+    try:
+        for nombre in esquemas:
+            for filas in args.filas:
+                clave = f"{nombre}/{filas}"
+                print(f"▶ {clave}")
+                etapas = medir_esquema(nombre, filas, directorio, args.repeticiones)
+                resultado["resultados"][clave] = etapas
+                for etapa, medicion in etapas.items():
+                    memoria = (f"{medicion['memoria_pico_mb']:8.1f} MB pico"
+                               if medicion["memoria_pico_mb"] is not None else "")
+                    print(f"    {etapa:<30} {medicion['segundos']:9.4f}s  {memoria}")
+    finally:
+        cache_datos.DIRECTORIO_CACHE = cache_original
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    salida = Path(args.salida)
+    salida.mkdir(parents=True, exist_ok=True)
+    ruta = salida / f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json"
+    ruta.write_text(json.dumps(resultado, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\nResultados en {ruta}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+        print(f"\nCOMPARACIÓN con {args.comparar} (umbral {args.umbral:.0%}):")
+        regresiones = comparar(resultado, anterior, args.umbral)
+        if regresiones:
+            print(f"\n{len(regresiones)} etapas empeoran más del {args.umbral:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""Caché columnar (Parquet) en disco delante de la lectura de los libros Excel.
+
+Cada hoja se parsea con openpyxl (en streaming) una sola vez; las siguientes cargas leen el
+Parquet con tipos ya resueltos (fechas datetime64, montos float64). La caché se
+invalida por ruta, fecha de modificación y hash del contenido del libro.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from lector_xlsx import leer_hoja
+
+# Carpeta de la caché (configurable para despliegues con disco de solo lectura)
+DIRECTORIO_CACHE = Path(os.environ.get("DASHBOARD_CACHE_DIR", Path(__file__).parent / ".cache_datos"))
+
+# Subir este número invalida todas las cachés escritas con un formato anterior
+VERSION_CACHE = 1
+
+
+def huella_archivo(ruta):
+    """Huella barata (ruta, mtime, tamaño) para usar como clave de st.cache_data."""
+    ruta = Path(ruta).resolve()
+    stat = ruta.stat()
+    return (str(ruta), stat.st_mtime_ns, stat.st_size)
+
+
+def hash_contenido(ruta, tamano_bloque=1 << 20):
+    """SHA-256 del contenido del archivo, leído por bloques."""
+    sha = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(tamano_bloque), b""):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def _rutas_cache(ruta, hoja):
+    ruta = Path(ruta).resolve()
+    clave = hashlib.sha1(str(ruta).encode("utf-8")).hexdigest()[:10]
+    base = DIRECTORIO_CACHE / f"{ruta.stem}-{clave}-{hoja}"
+    return base.with_suffix(".parquet"), base.with_suffix(".json")
+
+
+def _leer_manifiesto(ruta_manifiesto):
+    try:
+        with open(ruta_manifiesto, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def escribir_atomico(ruta_destino, escribir):
+    """Llama a ``escribir(ruta)`` sobre un temporal y lo renombra a ``ruta_destino``.
+
+    Ningún lector ve un archivo a medias.
+    """
+    temporal = ruta_destino.with_name(f".{ruta_destino.name}.{os.getpid()}.tmp")
+    try:
+        escribir(temporal)
+        os.replace(temporal, ruta_destino)
+    finally:
+        if temporal.exists():
+            temporal.unlink()
+
+
+def _normalizar_para_parquet(df):
+    # Columnas object con tipos mezclados (p.ej. 202510 y "202509|202510") no
+    # tienen tipo Arrow: se guardan como texto conservando los nulos
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].map(lambda x: x if pd.isna(x) else str(x)).astype("string")
+    return df
+
+
+def _manifiesto_vigente(ruta, hoja, version):
+    """Devuelve ``(manifiesto, sha256)``; el manifiesto es None si la caché no sirve.
+
+    El sha256 solo se calcula (y se devuelve) cuando hizo falta comparar contenido.
+    """
+    ruta_parquet, ruta_manifiesto = _rutas_cache(ruta, hoja)
+    _, mtime_ns, tamano = huella_archivo(ruta)
+    manifiesto = _leer_manifiesto(ruta_manifiesto)
+
+    if not (manifiesto and ruta_parquet.exists()
+            and manifiesto.get("version_cache") == VERSION_CACHE
+            and manifiesto.get("version") == version):
+        return None, None
+    if manifiesto["mtime_ns"] == mtime_ns and manifiesto["tamano"] == tamano:
+        return manifiesto, None
+
+    # El mtime cambia al copiar o re-guardar sin cambios: confirmar por contenido
+    sha = hash_contenido(ruta)
+    if manifiesto["sha256"] != sha:
+        return None, sha
+    manifiesto.update(mtime_ns=mtime_ns, tamano=tamano)
+    try:
+        escribir_atomico(ruta_manifiesto, lambda p: p.write_text(json.dumps(manifiesto), encoding="utf-8"))
+    except OSError:
+        pass
+    return manifiesto, sha
+
+
+def cache_vigente(ruta, hoja="Hoja1", version=""):
+    """Indica si la hoja del libro puede servirse desde la caché sin parsear el Excel."""
+    ruta = Path(ruta)
+    return ruta.exists() and _manifiesto_vigente(ruta, hoja, version)[0] is not None
+
+
+def parquet_vigente(ruta, hoja="Hoja1", version=""):
+    """``(ruta del Parquet, manifiesto)`` de la hoja si su caché está vigente; si no, ``(None, None)``.
+
+    Sirve para consultar la caché directamente (p.ej. con DuckDB) sin cargarla en memoria.
+    """
+    ruta = Path(ruta)
+    manifiesto = _manifiesto_vigente(ruta, hoja, version)[0] if ruta.exists() else None
+    if manifiesto is None:
+        return None, None
+    return _rutas_cache(ruta, hoja)[0], manifiesto
+
+
+def cargar_con_cache(ruta, hoja="Hoja1", leer=None, version=""):
+    """Lee una hoja del libro usando la caché Parquet cuando está vigente.
+
+    ``leer(ruta, hoja)`` parsea el libro cuando la caché no sirve y devuelve
+    ``(df, metadatos)``; por defecto se usa el lector en streaming sin
+    transformar. Lo que devuelve es lo que se guarda en caché, junto con los
+    metadatos (serializables a JSON) en el manifiesto. ``version`` identifica
+    esa lectura: si cambia, la caché se considera obsoleta aunque el libro sea
+    el mismo.
+
+    Devuelve ``(df, manifiesto)``; el manifiesto incluye ``sha256`` del libro y
+    los ``metadatos`` de la transformación.
+    """
+    ruta = Path(ruta)
+    if not ruta.exists():
+        raise FileNotFoundError(f"No se encontró el archivo: {ruta}")
+
+    ruta_parquet, ruta_manifiesto = _rutas_cache(ruta, hoja)
+    _, mtime_ns, tamano = huella_archivo(ruta)
+
+    manifiesto, sha = _manifiesto_vigente(ruta, hoja, version)
+    if manifiesto is not None:
+        try:
+            return pd.read_parquet(ruta_parquet), manifiesto
+        except Exception:
+            pass  # Caché corrupta o sin motor Parquet: se vuelve a leer el Excel
+
+    if leer is None:
+        df, metadatos = leer_hoja(ruta, hoja), {}
+    else:
+        df, metadatos = leer(ruta, hoja)
+    df = _normalizar_para_parquet(df)
+
+    manifiesto = {
+        "version_cache": VERSION_CACHE,
+        "version": version,
+        "ruta": str(ruta.resolve()),
+        "hoja": hoja,
+        "mtime_ns": mtime_ns,
+        "tamano": tamano,
+        "sha256": sha or hash_contenido(ruta),
+        "metadatos": metadatos,
+    }
+    try:
+        DIRECTORIO_CACHE.mkdir(parents=True, exist_ok=True)
+        escribir_atomico(ruta_parquet, lambda p: df.to_parquet(p, index=False))
+        escribir_atomico(ruta_manifiesto, lambda p: p.write_text(json.dumps(manifiesto), encoding="utf-8"))
+    except (ImportError, OSError, ValueError):
+        pass  # Sin pyarrow o sin permisos de escritura: se sirve sin caché
+
+    return df, manifiesto
+
+
+def leer_excel_con_cache(ruta, hoja="Hoja1", version=""):
+    """Como ``cargar_con_cache`` sin transformación; devuelve solo el DataFrame."""
+    df, _ = cargar_con_cache(ruta, hoja=hoja, version=version)
+    return df
@@ -0,0 +1,193 @@
+"""Cruce de los libros PAGOS y CIERRE GASTOS ADMINISTRATIVOS.
+
+Ambos libros comparten asesor, cartera, campaña, razón social y fecha de
+pago, con nombres de columna distintos (``CAMPAÑA``/``CAMPANA``,
+``RAZON SOCIAL``/``RAZON_SOCIAL``). El cruce:
+
+1. agrega cada libro al grano de las claves con ``agregados.construir_cubo``
+   (también sobre una vista SQL), con el monto pagado o facturado en céntimos;
+2. funde las categorías de texto que solo difieren en espacios, mayúsculas o
+   tildes (misma ``nombres.clave_nombre``) una vez por categoría, no por fila;
+3. codifica las claves con un diccionario común a ambos libros por columna
+   (por su clave, no por el texto) y combina los códigos en un solo entero
+   ``int64`` por fila;
+4. une los dos lados con un ``merge`` sobre ese entero, sin comparar cadenas,
+   y recupera las claves decodificando el entero.
+
+El resultado tiene una fila por combinación de claves con ``PAGADO`` y
+``FACTURADO`` en céntimos (como el cubo), el número de registros de cada
+libro y el ``ORIGEN`` de la fila. Las claves de texto se muestran con el
+nombre de los libros (el de PAGOS si ambos lo tienen), nunca con la clave.
+"""
+import numpy as np
+import pandas as pd
+
+from agregados import construir_cubo
+from montos import a_soles
+from nombres import clave_nombre, nombres_a_mostrar, renombrar_nombres
+
+# Nombres comunes de las claves del cruce
+COLUMNAS_CLAVE = ["ASESOR", "CARTERA", "CAMPANA", "RAZON_SOCIAL", "FECHA"]
+
+# Columnas de cada libro para cada clave común, en el orden de COLUMNAS_CLAVE
+CLAVES = {
+    "pagos": ["ASESOR", "CARTERA", "CAMPAÑA", "RAZON SOCIAL", "FECHA_DE_PAGO"],
+    "cierre_gastos": ["ASESOR", "CARTERA", "CAMPANA", "RAZON_SOCIAL", "FECHA_DE_PAGO"],
+}
+
+# Monto que se compara de cada libro: gastos pagados contra gastos facturados
+MONTOS = {"pagos": "PAGO GASTOS", "cierre_gastos": "MONTO"}
+
+# Columnas del resultado (montos en céntimos)
+PAGADO = "PAGADO"
+FACTURADO = "FACTURADO"
+REGISTROS_PAGOS = "REGISTROS_PAGOS"
+REGISTROS_CIERRE = "REGISTROS_CIERRE"
+ORIGEN = "ORIGEN"
+
+# Valores de ORIGEN
+AMBOS = "ambos"
+SOLO_PAGOS = "solo pagos"
+SOLO_CIERRE = "solo cierre"
+
+
+def normalizar_claves(serie, registros):
+    """``serie`` como categórica con una categoría por ``clave_nombre``.
+
+    Las categorías con la misma clave se funden en una, que se muestra con la
+    de más ``registros`` (a igualdad, la primera).
+    """
+    serie = serie.astype("category")
+    codigos = serie.cat.codes.to_numpy()
+    por_categoria = np.bincount(codigos[codigos >= 0], weights=np.asarray(registros)[codigos >= 0],
+                                minlength=len(serie.cat.categories))
+    ortografias = {}
+    for categoria, cantidad in zip(serie.cat.categories, por_categoria):
+        ortografias.setdefault(clave_nombre(categoria), {})[str(categoria)] = int(cantidad)
+    return renombrar_nombres(serie, nombres_a_mostrar(ortografias))
+
+
+def _claves(categorias, col):
+    # Valor por el que se unen los libros: la clave del nombre (la fecha, tal cual)
+    return categorias if col == "FECHA" else pd.Index([clave_nombre(valor) for valor in categorias])
+
+
+def lado_cruce(df, nombre_esquema):
+    """Un libro agregado al grano de las claves del cruce.
+
+    ``df`` es el DataFrame (o la vista SQL) del esquema. Devuelve las
+    ``COLUMNAS_CLAVE`` categóricas y normalizadas, el monto de ``MONTOS`` en
+    céntimos (columna ``CENTIMOS``) y ``CANTIDAD`` de registros.
+    """
+    columnas = CLAVES[nombre_esquema]
+    monto = MONTOS[nombre_esquema]
+    cubo = construir_cubo(df, columnas, [monto])
+    cubo = cubo.rename(columns=dict(zip(columnas, COLUMNAS_CLAVE), **{monto: "CENTIMOS"}))
+    for col in COLUMNAS_CLAVE:
+        cubo[col] = cubo[col].astype("category") if col == "FECHA" else normalizar_claves(cubo[col], cubo["CANTIDAD"])
+    # Claves que solo difieren en tildes o espacios caen en la misma celda
+    return cubo.groupby(COLUMNAS_CLAVE, observed=True, dropna=False, sort=False)[["CENTIMOS", "CANTIDAD"]].sum().reset_index()
+
+
+def _codificar(izquierda, derecha):
+    # Diccionario común por columna clave y códigos combinados en un int64 por fila.
+    # Los libros se unen por la clave; cada clave se muestra con la primera
+    # categoría que la tiene (PAGOS antes que CIERRE)
+    diccionarios, codigos_izq, codigos_der = [], [], []
+    for col in COLUMNAS_CLAVE:
+        categorias = izquierda[col].cat.categories.append(derecha[col].cat.categories)
+        claves = _claves(categorias, col)
+        primeras = ~claves.duplicated()
+        unicas, nombres = claves[primeras], categorias[primeras]
+        orden = unicas.argsort()
+        unicas, nombres = unicas[orden], nombres[orden]
+        diccionarios.append(nombres)
+        for lado, codigos in ((izquierda, codigos_izq), (derecha, codigos_der)):
+            propios = lado[col].cat.codes.to_numpy()
+            # 0 queda para los nulos
+            posiciones = unicas.get_indexer(_claves(lado[col].cat.categories, col))
+            codigos.append(np.where(propios >= 0, np.append(posiciones, -1)[propios] + 1, 0))
+    dimensiones = tuple(len(categorias) + 1 for categorias in diccionarios)
+    return (diccionarios, dimensiones,
+            np.ravel_multi_index(codigos_izq, dimensiones).astype("int64"),
+            np.ravel_multi_index(codigos_der, dimensiones).astype("int64"))
+
+
+def cruzar(pagos, cierre):
+    """Cruce de los lados ``lado_cruce`` de PAGOS y CIERRE por todas las claves.
+
+    Devuelve una fila por combinación de claves presente en algún libro con
+    ``PAGADO`` y ``FACTURADO`` (céntimos ``int64``, 0 si el libro no la
+    tiene), ``REGISTROS_PAGOS``, ``REGISTROS_CIERRE`` y ``ORIGEN``.
+    """
+    diccionarios, dimensiones, clave_pagos, clave_cierre = _codificar(pagos, cierre)
+    izquierda = pd.DataFrame({"_CLAVE": clave_pagos, PAGADO: pagos["CENTIMOS"].to_numpy(),
+                              REGISTROS_PAGOS: pagos["CANTIDAD"].to_numpy()})
+    derecha = pd.DataFrame({"_CLAVE": clave_cierre, FACTURADO: cierre["CENTIMOS"].to_numpy(),
+                            REGISTROS_CIERRE: cierre["CANTIDAD"].to_numpy()})
+    unidos = izquierda.merge(derecha, on="_CLAVE", how="outer", indicator=True, sort=True)
+
+    resultado = pd.DataFrame(index=unidos.index)
+    for col, categorias, codigos in zip(COLUMNAS_CLAVE, diccionarios,
+                                        np.unravel_index(unidos["_CLAVE"].to_numpy(), dimensiones)):
+        resultado[col] = pd.Categorical.from_codes(codigos - 1, categorias)
+    for col in (PAGADO, FACTURADO, REGISTROS_PAGOS, REGISTROS_CIERRE):
+        resultado[col] = unidos[col].fillna(0).astype("int64")
+    resultado[ORIGEN] = unidos["_merge"].map({"both": AMBOS, "left_only": SOLO_PAGOS, "right_only": SOLO_CIERRE}).astype("category")
+    return resultado
+
+
+def filtrar(cruce, firma, nombre_esquema="pagos", columna_periodo="PERIODO"):
+    """Filas del cruce que cumplen la ``firma`` de filtros de la barra lateral de ``nombre_esquema``.
+
+    Los valores elegidos se comparan por su ``clave_nombre`` con los del
+    cruce; el periodo y el rango de fechas se aplican sobre ``FECHA``. Las
+    columnas sin clave común se ignoran.
+    """
+    if firma is None:
+        return cruce
+    activos, rango_fechas = firma
+    comunes = dict(zip(CLAVES[nombre_esquema], COLUMNAS_CLAVE))
+    mascara = np.ones(len(cruce), dtype=bool)
+    for col, valores in activos:
+        if col == columna_periodo:
+            meses = cruce["FECHA"].astype("datetime64[ns]").dt.to_period("M").astype("string")
+            mascara &= meses.isin([str(valor) for valor in valores]).to_numpy()
+        elif col in comunes:
+            elegidas = {clave_nombre(valor) for valor in valores}
+            categorias = cruce[comunes[col]].cat.categories
+            mascara &= cruce[comunes[col]].isin(categorias[[clave_nombre(c) in elegidas for c in categorias]]).to_numpy()
+    if rango_fechas is not None:
+        fechas = cruce["FECHA"].astype("datetime64[ns]")
+        mascara &= ((fechas >= pd.Timestamp(rango_fechas[0]))
+                    & (fechas < pd.Timestamp(rango_fechas[1]) + pd.Timedelta(days=1))).to_numpy()
+    return cruce[mascara]
+
+
+def totales_cruce(cruce):
+    """``{PAGADO, FACTURADO, DIFERENCIA}`` en soles y las combinaciones de claves sin contraparte."""
+    pagado, facturado = int(cruce[PAGADO].sum()), int(cruce[FACTURADO].sum())
+    return {
+        PAGADO: a_soles(pagado),
+        FACTURADO: a_soles(facturado),
+        "DIFERENCIA": a_soles(pagado - facturado),
+        SOLO_PAGOS: int((cruce[ORIGEN] == SOLO_PAGOS).sum()),
+        SOLO_CIERRE: int((cruce[ORIGEN] == SOLO_CIERRE).sum()),
+    }
+
+
+def resumen_por(cruce, dimensiones, orden=FACTURADO, limite=None):
+    """Pagado, facturado y ``DIFERENCIA`` (pagado - facturado) en soles por ``dimensiones``.
+
+    Ordena de mayor a menor por ``orden`` (``"DIFERENCIA"`` ordena por su
+    valor absoluto) y recorta a ``limite`` filas. Las claves nulas se omiten.
+    """
+    resumen = cruce.groupby(dimensiones, observed=True)[[PAGADO, FACTURADO, REGISTROS_PAGOS, REGISTROS_CIERRE]].sum()
+    resumen["DIFERENCIA"] = resumen[PAGADO] - resumen[FACTURADO]
+    clave_orden = resumen["DIFERENCIA"].abs() if orden == "DIFERENCIA" else resumen[orden]
+    resumen = resumen.loc[clave_orden.sort_values(ascending=False, kind="stable").index].reset_index()
+    if limite is not None:
+        resumen = resumen.head(limite)
+    for col in (PAGADO, FACTURADO, "DIFERENCIA"):
+        resumen[col] = a_soles(resumen[col])
+    return resumen
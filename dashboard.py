@@ -5,60 +5,274 @@ import plotly.graph_objects as go
 import numpy as np
 from datetime import datetime
 
+from agregados import cantidad_por_fecha, describir, distintos, distintos_por, sumas_por, sumas_por_fecha, sumas_totales
+from almacen import AlmacenDatos
+from cruce import FACTURADO, PAGADO, SOLO_CIERRE, SOLO_PAGOS, cruzar, filtrar, lado_cruce, resumen_por, totales_cruce
+from ingesta import (HASH_FILA, PERIODO, cargar_periodos, describir_periodos, descubrir_libros, errores_como_tabla,
+                     huella_libros, kpis_resumen, resumen_libros, unificados_como_tabla)
+from filtros import barra_filtros, construir_indice, hay_filtros, seleccion_filtros, version_filtrada
+from motor_sql import usar_duckdb
+from progresivo import aislada, anticipar, en_segundo_plano, hueco
+from snapshot import cargar_snapshot, manifiesto_snapshot
+import graficos
+from graficos import mostrar
+import instrumentacion
+from instrumentacion import anotar_carga, contar_fallo, marcar_fallo, seccion, seccion_cacheada
+from tabla_paginada import mostrar_tabla_paginada
+from vigilante import Vigilante, vigilancia_activa
+
+# Perfil de este rerun (solo con DASHBOARD_PERFIL=1 o ?perfil=1)
+instrumentacion.iniciar("pagos")
+
+# Paquete precalculado (modo snapshot, con DASHBOARD_SNAPSHOT); None si se leen los Excel
+SNAPSHOT = manifiesto_snapshot("pagos")
+
+# Paquete precalculado del CIERRE GASTOS, para la pestaña del cruce
+SNAPSHOT_CIERRE = manifiesto_snapshot("cierre_gastos")
+
+# Meses disponibles: un libro "PAGOS <MES> <AÑO>.xlsx" por mes
+if SNAPSHOT is not None:
+    PERIODOS = describir_periodos([pd.Period(periodo) for periodo in SNAPSHOT["reporte"]["periodos"]])
+else:
+    PERIODOS = describir_periodos([periodo for periodo, _ in descubrir_libros("pagos")])
+
 # Configuración de la página
-st.set_page_config(page_title="Dashboard de Pagos Enero 2026", layout="wide", initial_sidebar_state="expanded")
+st.set_page_config(page_title=f"Dashboard de Pagos {PERIODOS}", layout="wide", initial_sidebar_state="expanded")
 
 # Título principal
-st.title("📊 Dashboard de Pagos - Enero 2026")
+st.title(f"📊 Dashboard de Pagos - {PERIODOS}")
 
 # Cargar datos
-@st.cache_data
-def cargar_datos():
-    excel_file = "PAGOS ENERO 2026.xlsx"
-    
-    # Leer la hoja
-    df_cierre = pd.read_excel(excel_file, sheet_name="Hoja1")
-    df_totales = df_cierre  # Usar los mismos datos para ambas vistas
-    
-    # Convertir columnas de fechas a strings para evitar problemas de serialización con Arrow
-    for col in df_cierre.columns:
-        if pd.api.types.is_datetime64_any_dtype(df_cierre[col]):
-            df_cierre[col] = df_cierre[col].dt.strftime('%Y-%m-%d')
-    
-    for col in df_totales.columns:
-        if pd.api.types.is_datetime64_any_dtype(df_totales[col]):
-            df_totales[col] = df_totales[col].dt.strftime('%Y-%m-%d')
-    
-    return df_cierre, df_totales
+@st.cache_resource
+def almacen_datos():
+    # Almacén único por proceso: cada versión de los datos se guarda una vez y
+    # todas las sesiones reciben la misma instancia, sin copias por sesión
+    return AlmacenDatos()
 
-try:
-    df_cierre, df_totales = cargar_datos()
+def cargar_datos(huella):
+    """``(df, reporte)`` del paquete snapshot o de los Excel en la versión ``huella``."""
+    if SNAPSHOT is not None:
+        df, reporte, _ = almacen_datos().obtener("pagos", SNAPSHOT["version"],
+                                                 contar_fallo(lambda: cargar_snapshot(SNAPSHOT)))
+        return df, reporte
+    # La huella (ruta, mtime, tamaño de cada libro) cambia cuando se modifica o
+    # aparece un mes; solo los libros nuevos o modificados se re-parsean
+    return almacen_datos().obtener("pagos", huella, contar_fallo(lambda: cargar_periodos("pagos")))
+
+@st.cache_resource
+def vigilante_libros():
+    # Hilo único por proceso: precarga cada versión nueva de PAGOS y del CIERRE
+    # (para el cruce) y solo entonces la publica (sin vigilante en modo
+    # snapshot o con DASHBOARD_VIGILAR=0)
+    if SNAPSHOT is not None or not vigilancia_activa():
+        return None
+    return Vigilante(["pagos", "cierre_gastos"], precargar).iniciar()
+
+def huella_vigente(nombre_esquema):
+    """Huella de los libros publicada por el vigilante (o la de disco si no vigila)."""
+    vigilante = vigilante_libros()
+    return vigilante.huella(nombre_esquema) if vigilante is not None else huella_libros(nombre_esquema)
+
+@st.cache_resource(max_entries=4)
+def consultas_sql(nombre_esquema, huella):
+    # Modo DASHBOARD_MOTOR=duckdb: una conexión por versión de los libros,
+    # compartida por las sesiones; los datos se quedan en los Parquet
+    from motor_sql import ConsultasDuckDB
+    marcar_fallo()
+    return ConsultasDuckDB(nombre_esquema)
+
+def cargar_cierre(huella):
+    """``(df, reporte)`` del CIERRE GASTOS en la versión ``huella`` para el cruce (vista SQL en modo DuckDB).
+
+    None si no hay libros.
+    """
+    if SNAPSHOT_CIERRE is not None and not usar_duckdb():
+        df, reporte, _ = almacen_datos().obtener("cierre_gastos", SNAPSHOT_CIERRE["version"],
+                                                 contar_fallo(lambda: cargar_snapshot(SNAPSHOT_CIERRE)))
+        return df, reporte
+    if not descubrir_libros("cierre_gastos"):
+        return None
+    if usar_duckdb():
+        consultas = consultas_sql("cierre_gastos", huella)
+        return consultas.vista(), consultas.reporte
+    # Misma entrada que usa el dashboard de finanzas (con sus precalculados vacíos),
+    # así ambos comparten los datos si corren en el mismo proceso
+    df, reporte, _ = almacen_datos().obtener("cierre_gastos", huella,
+                                             contar_fallo(lambda: cargar_periodos("cierre_gastos") + ({},)))
+    return df, reporte
+
+@st.cache_data(max_entries=4)
+def lado_cruce_cacheado(_df, nombre_esquema, version):
+    # Un libro agregado al grano de las claves del cruce, una vez por versión
+    marcar_fallo()
+    return lado_cruce(_df, nombre_esquema)
+
+@st.cache_data(max_entries=4)
+def cruce_libros(_pagos, _cierre, version_pagos, version_cierre):
+    # Join sobre claves enteras de ambos lados, una vez por par de versiones
+    marcar_fallo()
+    return cruzar(_pagos, _cierre)
+
+def cruce_completo(df, reporte, df_cierre, reporte_cierre):
+    """Cruce de los libros completos de PAGOS y CIERRE y su versión (antes de filtrar)."""
+    cruce = cruce_libros(lado_cruce_cacheado(df, "pagos", reporte["version"]),
+                         lado_cruce_cacheado(df_cierre, "cierre_gastos", reporte_cierre["version"]),
+                         reporte["version"], reporte_cierre["version"])
+    return cruce, f"{reporte['version']}-{reporte_cierre['version']}"
+
+@st.cache_resource(max_entries=4)
+def indice_filtros(_df, version):
+    # Índice invertido de solo lectura compartido por las sesiones (sin copias)
+    marcar_fallo()
+    return construir_indice(_df, list(ETIQUETAS_FILTROS), 'FECHA_DE_PAGO')
+
+@st.cache_data(max_entries=32)
+def resumen_estadistico(_df, version_vista):
+    # describe() recorre todas las filas: se calcula una vez por vista (datos + filtros)
+    marcar_fallo()
+    return describir(_df, ['Suma Total', 'Pago Planilla y Gastos'])
+
+ETIQUETAS_FILTROS = {
+    PERIODO: "🗓️ Periodo",
+    'ASESOR': "👥 Asesor",
+    'CARTERA': "📦 Cartera",
+    'CAMPAÑA': "🎯 Campaña",
+    'RAZON SOCIAL': "🏢 Razón Social",
+}
+
+def graficos_cierre(df_cierre, sumas):
+    """Gráficos de "Cierre de Pagos" por id, como funciones que los construyen (con sus groupbys)."""
+    return {
+        'pagos_planilla_asesor': lambda: graficos.barras(
+            sumas_por(df_cierre, 'ASESOR', ['PAGO PLANILLA'], orden='PAGO PLANILLA', limite=10), 'ASESOR', 'PAGO PLANILLA',
+            "Top 10 - Pago Planilla por Asesor", {'PAGO PLANILLA': 'Monto (S/)', 'ASESOR': 'Asesor'},
+            "Blues", tickangle=-45),
+        'pagos_proporcion_planilla_gastos': lambda: graficos.proporcion(
+            "Tipo de Pago", ["Pago Planilla", "Pago Gastos"], [sumas['PAGO PLANILLA'], sumas['PAGO GASTOS']],
+            "Proporción: Pago Planilla vs Pago Gastos"),
+        'pagos_gastos_asesor': lambda: graficos.barras(
+            sumas_por(df_cierre, 'ASESOR', ['PAGO GASTOS'], orden='PAGO GASTOS', limite=10), 'ASESOR', 'PAGO GASTOS',
+            "Top 10 - Pago Gastos por Asesor", {'PAGO GASTOS': 'Monto (S/)', 'ASESOR': 'Asesor'},
+            "Oranges", tickangle=-45),
+        'pagos_carteras_asesor': lambda: graficos.barras(
+            distintos_por(df_cierre, 'ASESOR', 'CARTERA', 'Cantidad_Cartera', limite=10), 'ASESOR', 'Cantidad_Cartera',
+            "Top 10 - Carteras por Asesor", {'Cantidad_Cartera': 'Cantidad', 'ASESOR': 'Asesor'},
+            "Greens", tickangle=-45),
+        'pagos_evolucion_cierre': lambda: graficos.evolucion_pagos(
+            sumas_por_fecha(df_cierre, 'FECHA_DE_PAGO', {'PAGO PLANILLA': 'Pago Planilla', 'PAGO GASTOS': 'Pago Gastos'}),
+            'Fecha', [('Pago Planilla', 'Pago Planilla', '#1f77b4'), ('Pago Gastos', 'Pago Gastos', '#ff7f0e')]),
+        'pagos_cantidad_fecha': lambda: graficos.cantidad_por_fecha(cantidad_por_fecha(df_cierre, 'FECHA_DE_PAGO')),
+    }
+
+def serie_totales(df_totales):
+    """Suma Total y Pago Planilla y Gastos por fecha de pago."""
+    return sumas_por_fecha(df_totales, 'Fecha de Pago', {'Suma Total': 'Suma Total',
+                                                         'Pago Planilla y Gastos': 'Pago Planilla y Gastos'})
+
+def graficos_totales(df_totales, sumas):
+    """Gráficos de "Pagos Total" por id, salvo la línea de tiempo (ver ``grafico_serie_totales``)."""
+    return {
+        'pagos_suma_campana': lambda: graficos.barras(
+            sumas_por(df_totales, 'CAMPAÑA', ['Suma Total'], orden='Suma Total'),
+            'CAMPAÑA', 'Suma Total', "Suma Total por Campaña",
+            {'Suma Total': 'Monto (S/)', 'CAMPAÑA': 'Campaña'}, "Blues"),
+        'pagos_proporcion_suma_pyg': lambda: graficos.proporcion(
+            "Tipo", ["Suma Total", "Pago P y G"], [sumas['Suma Total'], sumas['Pago Planilla y Gastos']],
+            "Proporción: Suma Total vs Pago P y G"),
+        'pagos_razon_social': lambda: graficos.comparacion_razon_social(
+            sumas_por(df_totales, 'RAZON SOCIAL', ['Suma Total', 'Pago Planilla y Gastos'], orden='Suma Total', limite=10)),
+    }
+
+def grafico_serie_totales(serie):
+    """Línea de tiempo de "Pagos Total" por id; vacío si ``serie`` no tiene fechas."""
+    if not len(serie):
+        return {}
+    return {'pagos_evolucion_totales': lambda: graficos.evolucion_pagos(
+        serie, 'Fecha', [('Suma Total', 'Suma Total', '#1f77b4'), ('Pago Planilla y Gastos', 'Pago P y G', '#ff7f0e')])}
+
+def graficos_cruce(cruce):
+    """Gráficos de "Pagos vs Cierre" por id a partir del cruce (ya filtrado)."""
+    return {
+        'cruce_asesor': lambda: graficos.pagado_vs_facturado(
+            resumen_por(cruce, 'ASESOR', limite=15), 'ASESOR', 'Asesor', "Top 15 - Pagado vs Facturado por Asesor"),
+        'cruce_cartera': lambda: graficos.pagado_vs_facturado(
+            resumen_por(cruce, 'CARTERA'), 'CARTERA', 'Cartera', "Pagado vs Facturado por Cartera"),
+    }
+
+def resumen_sin_cargar(huella):
+    """``resumen`` de los libros de PAGOS de la versión ``huella`` sin cargar los datos (None si no está disponible)."""
+    if SNAPSHOT is not None:
+        return SNAPSHOT["reporte"].get("resumen")
+    if huella != huella_libros("pagos"):
+        # El vigilante aún no publica la versión que hay en disco
+        return None
+    return resumen_libros("pagos")
+
+def precargar(huellas):
+    # Corre en el hilo del vigilante: deja en caché lo que usa el primer rerun
+    # de la versión nueva sin filtros (las tres pestañas), antes de publicarla
+    if usar_duckdb():
+        consultas = consultas_sql("pagos", huellas["pagos"])
+        df, reporte = consultas.vista(), consultas.reporte
+        consultas.opciones(list(ETIQUETAS_FILTROS))
+        consultas.extremos('FECHA_DE_PAGO')
+    else:
+        df, reporte = cargar_datos(huellas["pagos"])
+        indice_filtros(df, reporte["version"])
+    resumen_estadistico(df, reporte["version"])
+    figuras = graficos_cierre(df, sumas_totales(df, ['PAGO PLANILLA', 'PAGO GASTOS']))
+    figuras.update(graficos_totales(df, sumas_totales(df, ['Suma Total', 'Pago Planilla y Gastos'])))
+    figuras.update(grafico_serie_totales(serie_totales(df)))
+    for id_grafico, construir in figuras.items():
+        graficos.figura(id_grafico, reporte["version"], construir)
+    cierre = cargar_cierre(huellas["cierre_gastos"])
+    if cierre is not None:
+        cruce, version_cruce = cruce_completo(df, reporte, *cierre)
+        for id_grafico, construir in graficos_cruce(cruce).items():
+            graficos.figura(id_grafico, version_cruce, construir)
+
+def kpis_cierre(lugar, valores):
+    """Tarjetas de "Cierre de Pagos" en ``lugar`` (``valores`` con PAGO PLANILLA, PAGO GASTOS, CARTERA y ASESOR)."""
+    with lugar.container():
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("💰 Total Pago Planilla", f"S/ {valores['PAGO PLANILLA']:,.2f}")
+        col2.metric("💳 Total Pago Gastos", f"S/ {valores['PAGO GASTOS']:,.2f}")
+        col3.metric("📦 Total Carteras", f"{valores['CARTERA']}")
+        col4.metric("👥 Total Asesores", f"{valores['ASESOR']}")
+
+def kpis_totales(lugar, valores):
+    """Tarjetas de "Pagos Total" en ``lugar`` (``valores`` con Suma Total, Pago Planilla y Gastos y REGISTROS)."""
+    with lugar.container():
+        col1, col2, col3 = st.columns(3)
+        col1.metric("💰 Total Suma General", f"S/ {valores['Suma Total']:,.2f}")
+        col2.metric("💳 Total Pago P y G", f"S/ {valores['Pago Planilla y Gastos']:,.2f}")
+        col3.metric("📋 Total Registros", f"{valores['REGISTROS']}")
+
+@st.fragment
+def tabla_detalle(df, clave, version, columnas, columnas_monto):
+    # Fragmento: paginar, ordenar o filtrar la tabla solo re-ejecuta la tabla
+    with aislada("Datos Detallados"), seccion(f"tabla {clave}"):
+        mostrar_tabla_paginada(df, clave, version, columnas=columnas, columnas_monto=columnas_monto)
+
+def pestana_cierre(df_cierre, version_vista, lugar_kpis, valores):
+    # Contenido de "Cierre de Pagos"; solo se ejecuta con la pestaña abierta.
+    # ``valores`` son los KPIs ya pintados del resumen de los libros, o None
     
-    # Crear tabs
-    tab1, tab2 = st.tabs(["📋 Cierre de Pagos", "📊 Pagos Total"])
+    # Calcular totales (suma exacta en céntimos)
+    if valores is None:
+        with seccion("KPIs cierre"):
+            valores = dict(sumas_totales(df_cierre, ['PAGO PLANILLA', 'PAGO GASTOS']),
+                           CARTERA=distintos(df_cierre, 'CARTERA'), ASESOR=distintos(df_cierre, 'ASESOR'))
+        kpis_cierre(lugar_kpis, valores)
     
-    # TAB 1: CIERRE DE PAGOS
-    with tab1:
-        st.header("Cierre de Pagos")
-        
-        st.subheader("📊 Resumen de Datos - Cierre de Pagos")
-        
-        # Crear columnas para las métricas
-        col1, col2, col3, col4 = st.columns(4)
-        
-        # Calcular totales
-        total_pago_planilla = pd.to_numeric(df_cierre['PAGO PLANILLA'], errors='coerce').sum()
-        total_pago_gastos = pd.to_numeric(df_cierre['PAGO GASTOS'], errors='coerce').sum()
-        total_cartera = df_cierre['CARTERA'].nunique()
-        total_asesores = df_cierre['ASESOR'].nunique()
-        
-        # Mostrar métricas
-        col1.metric("💰 Total Pago Planilla", f"S/ {total_pago_planilla:,.2f}")
-        col2.metric("💳 Total Pago Gastos", f"S/ {total_pago_gastos:,.2f}")
-        col3.metric("📦 Total Carteras", f"{total_cartera}")
-        col4.metric("👥 Total Asesores", f"{total_asesores}")
-        
-        # Gráficos
+    # Las figuras (con sus groupbys) se construyen una vez por vista (datos +
+    # filtros), empezando en segundo plano; los reruns provocados por otros
+    # widgets las reutilizan y el vigilante deja listas las de la vista sin filtros
+    figuras = graficos_cierre(df_cierre, valores)
+    anticipar(figuras, version_vista)
+    
+    # Gráficos
+    with aislada("Visualizaciones"):
         st.subheader("📈 Visualizaciones")
         
         # Crear dos columnas para los gráficos
@@ -66,226 +280,251 @@ try:
         
         # Gráfico 1: Top 10 - Pago Planilla por Asesor
         with gf1:
-            df_por_asesor = df_cierre.groupby('ASESOR')['PAGO PLANILLA'].sum().reset_index()
-            df_por_asesor = df_por_asesor.sort_values('PAGO PLANILLA', ascending=False).head(10)
-            
-            fig = px.bar(df_por_asesor, x='ASESOR', y='PAGO PLANILLA', 
-                        title="Top 10 - Pago Planilla por Asesor",
-                        labels={'PAGO PLANILLA': 'Monto (S/)', 'ASESOR': 'Asesor'},
-                        color='PAGO PLANILLA', color_continuous_scale="Blues")
-            fig.update_layout(xaxis_tickangle=-45, height=400)
-            st.plotly_chart(fig, use_container_width=True)
+            mostrar('pagos_planilla_asesor', version_vista, figuras['pagos_planilla_asesor'])
         
         # Gráfico 2: Comparación Pago Planilla vs Pago Gastos
         with gf2:
-            totales_comparacion = {
-                "Tipo de Pago": ["Pago Planilla", "Pago Gastos"],
-                "Monto": [total_pago_planilla, total_pago_gastos]
-            }
-            df_comparacion = pd.DataFrame(totales_comparacion)
-            
-            fig = px.pie(df_comparacion, values="Monto", names="Tipo de Pago",
-                        title="Proporción: Pago Planilla vs Pago Gastos",
-                        color_discrete_sequence=["#1f77b4", "#ff7f0e"])
-            fig.update_layout(height=400)
-            st.plotly_chart(fig, use_container_width=True)
+            mostrar('pagos_proporcion_planilla_gastos', version_vista, figuras['pagos_proporcion_planilla_gastos'])
         
         # Gráfico 3: Pago Gastos por Asesor
         gf3, gf4 = st.columns(2)
         
         with gf3:
-            df_gastos_asesor = df_cierre.groupby('ASESOR')['PAGO GASTOS'].sum().reset_index()
-            df_gastos_asesor = df_gastos_asesor.sort_values('PAGO GASTOS', ascending=False).head(10)
-            
-            fig = px.bar(df_gastos_asesor, x='ASESOR', y='PAGO GASTOS', 
-                        title="Top 10 - Pago Gastos por Asesor",
-                        labels={'PAGO GASTOS': 'Monto (S/)', 'ASESOR': 'Asesor'},
-                        color='PAGO GASTOS', color_continuous_scale="Oranges")
-            fig.update_layout(xaxis_tickangle=-45, height=400)
-            st.plotly_chart(fig, use_container_width=True)
+            mostrar('pagos_gastos_asesor', version_vista, figuras['pagos_gastos_asesor'])
         
         # Gráfico 4: Cartera por Asesor
         with gf4:
-            df_cartera = df_cierre.groupby('ASESOR')['CARTERA'].nunique().reset_index()
-            df_cartera.columns = ['ASESOR', 'Cantidad_Cartera']
-            df_cartera = df_cartera.sort_values('Cantidad_Cartera', ascending=False).head(10)
-            
-            fig = px.bar(df_cartera, x='ASESOR', y='Cantidad_Cartera', 
-                        title="Top 10 - Carteras por Asesor",
-                        labels={'Cantidad_Cartera': 'Cantidad', 'ASESOR': 'Asesor'},
-                        color='Cantidad_Cartera', color_continuous_scale="Greens")
-            fig.update_layout(xaxis_tickangle=-45, height=400)
-            st.plotly_chart(fig, use_container_width=True)
-        
-        # Gráfico 5: Línea de Tiempo de Pagos
+            mostrar('pagos_carteras_asesor', version_vista, figuras['pagos_carteras_asesor'])
+    
+    # Gráfico 5: Línea de Tiempo de Pagos
+    with aislada("Línea de Tiempo de Pagos"):
         st.subheader("📅 Línea de Tiempo de Pagos")
         
-        # Crear DataFrame con datos de fecha y monto
-        df_timeline = df_cierre[['FECHA_DE_PAGO', 'PAGO PLANILLA', 'PAGO GASTOS']].copy()
-        df_timeline.columns = ['Fecha', 'Pago Planilla', 'Pago Gastos']
-        df_timeline['Fecha'] = pd.to_datetime(df_timeline['Fecha'], errors='coerce')
-        
-        # Agrupar por fecha y sumar
-        df_timeline_agg = df_timeline.groupby('Fecha').agg({
-            'Pago Planilla': 'sum',
-            'Pago Gastos': 'sum'
-        }).reset_index()
-        df_timeline_agg = df_timeline_agg.sort_values('Fecha')
-        
-        # Crear gráfico de línea
-        fig_timeline = go.Figure()
-        fig_timeline.add_trace(go.Scatter(
-            x=df_timeline_agg['Fecha'], 
-            y=df_timeline_agg['Pago Planilla'],
-            mode='lines+markers',
-            name='Pago Planilla',
-            line=dict(color='#1f77b4', width=3)
-        ))
-        fig_timeline.add_trace(go.Scatter(
-            x=df_timeline_agg['Fecha'], 
-            y=df_timeline_agg['Pago Gastos'],
-            mode='lines+markers',
-            name='Pago Gastos',
-            line=dict(color='#ff7f0e', width=3)
-        ))
-        fig_timeline.update_layout(
-            title='Evolución de Pagos por Fecha',
-            xaxis_title='Fecha',
-            yaxis_title='Monto (S/)',
-            hovermode='x unified',
-            height=400
-        )
-        st.plotly_chart(fig_timeline, use_container_width=True)
+        mostrar('pagos_evolucion_cierre', version_vista, figuras['pagos_evolucion_cierre'])
         
         # Gráfico 6: Cantidad de pagos por día
-        df_timeline['Cantidad'] = 1
-        df_cantidad = df_timeline.groupby('Fecha')['Cantidad'].sum().reset_index()
-        df_cantidad = df_cantidad.sort_values('Fecha')
-        
-        fig_cantidad = px.bar(df_cantidad, x='Fecha', y='Cantidad',
-                             title='Cantidad de Pagos por Fecha',
-                             labels={'Cantidad': 'Número de Pagos', 'Fecha': 'Fecha'},
-                             color='Cantidad', color_continuous_scale="Viridis")
-        fig_cantidad.update_layout(height=350)
-        st.plotly_chart(fig_cantidad, use_container_width=True)
-        
-        # Mostrar tabla de datos detallados
-        st.subheader("📋 Datos Detallados")
-        st.dataframe(df_cierre, width='stretch', height=400)
+        mostrar('pagos_cantidad_fecha', version_vista, figuras['pagos_cantidad_fecha'])
     
-    # TAB 2: PAGOS TOTAL
-    with tab2:
-        st.header("Pagos Total - Solo P y Pago P y G")
-        
-        st.subheader("📊 Resumen de Datos")
-        
-        # Crear columnas para las métricas
-        col1, col2, col3 = st.columns(3)
-        
-        # Calcular totales
-        total_suma = pd.to_numeric(df_totales['Suma Total'], errors='coerce').sum()
-        total_pago_planilla_gastos = pd.to_numeric(df_totales['Pago Planilla y Gastos'], errors='coerce').sum()
-        total_registros = len(df_totales)
-        
-        # Mostrar métricas
-        col1.metric("💰 Total Suma General", f"S/ {total_suma:,.2f}")
-        col2.metric("💳 Total Pago P y G", f"S/ {total_pago_planilla_gastos:,.2f}")
-        col3.metric("📋 Total Registros", f"{total_registros}")
-        
-        # Crear visualizaciones
+    # Mostrar tabla de datos detallados
+    st.subheader("📋 Datos Detallados")
+    tabla_detalle(df_cierre, 'cierre', version_vista, [col for col in df_cierre.columns if col != HASH_FILA],
+                  ['PAGO PLANILLA', 'PAGO GASTOS'])
+
+def pestana_totales(df_totales, version_vista, lugar_kpis, valores):
+    # Contenido de "Pagos Total"; solo se ejecuta con la pestaña abierta.
+    # ``valores`` son los KPIs ya pintados del resumen de los libros, o None
+    
+    # describe() y la serie por fecha recorren todas las filas: empiezan en
+    # segundo plano mientras se pintan los gráficos de barras
+    tarea_resumen = en_segundo_plano("resumen estadístico (segundo plano)", resumen_estadistico,
+                                     df_totales, version_vista, cacheada=True)
+    tarea_serie = en_segundo_plano("serie totales (segundo plano)", serie_totales, df_totales)
+    
+    # Calcular totales (suma exacta en céntimos)
+    if valores is None:
+        with seccion("KPIs totales"):
+            valores = dict(sumas_totales(df_totales, ['Suma Total', 'Pago Planilla y Gastos']),
+                           REGISTROS=len(df_totales))
+        kpis_totales(lugar_kpis, valores)
+    
+    figuras = graficos_totales(df_totales, valores)
+    anticipar(figuras, version_vista)
+    
+    # Crear visualizaciones
+    with aislada("Visualizaciones"):
         st.subheader("📈 Visualizaciones")
         
         # Gráfico 1: Top 10 - Suma Total por Campaña
         gf1, gf2 = st.columns(2)
         
         with gf1:
-            df_campana = df_totales.groupby('CAMPAÑA')['Suma Total'].sum().reset_index()
-            df_campana = df_campana.sort_values('Suma Total', ascending=False)
-            
-            fig = px.bar(df_campana, x='CAMPAÑA', y='Suma Total', 
-                        title="Suma Total por Campaña",
-                        labels={'Suma Total': 'Monto (S/)', 'CAMPAÑA': 'Campaña'},
-                        color='Suma Total', color_continuous_scale="Blues")
-            fig.update_layout(height=400)
-            st.plotly_chart(fig, use_container_width=True)
+            mostrar('pagos_suma_campana', version_vista, figuras['pagos_suma_campana'])
         
         # Gráfico 2: Comparación Suma Total vs Pago Planilla y Gastos
         with gf2:
-            totales = {
-                "Tipo": ["Suma Total", "Pago P y G"],
-                "Monto": [total_suma, total_pago_planilla_gastos]
-            }
-            df_tots = pd.DataFrame(totales)
-            
-            fig = px.pie(df_tots, values="Monto", names="Tipo",
-                        title="Proporción: Suma Total vs Pago P y G",
-                        color_discrete_sequence=["#1f77b4", "#ff7f0e"])
-            fig.update_layout(height=400)
-            st.plotly_chart(fig, use_container_width=True)
-        
-        # Gráfico 3: Top 10 - Pago Planilla y Gastos por Razón Social
+            mostrar('pagos_proporcion_suma_pyg', version_vista, figuras['pagos_proporcion_suma_pyg'])
+    
+    # Gráfico 3: Top 10 - Pago Planilla y Gastos por Razón Social
+    with aislada("Análisis por Razón Social"):
         st.subheader("🏢 Análisis por Razón Social")
-        df_razon = df_totales.groupby('RAZON SOCIAL').agg({
-            'Suma Total': 'sum',
-            'Pago Planilla y Gastos': 'sum'
-        }).reset_index()
-        df_razon = df_razon.sort_values('Suma Total', ascending=False).head(10)
-        
-        fig = px.bar(df_razon, x='RAZON SOCIAL', y=['Suma Total', 'Pago Planilla y Gastos'],
-                    title="Top 10 - Comparación de Montos por Razón Social",
-                    labels={'value': 'Monto (S/)', 'RAZON SOCIAL': 'Razón Social'},
-                    barmode='group')
-        fig.update_layout(xaxis_tickangle=-45, height=400)
-        st.plotly_chart(fig, use_container_width=True)
-        
-        # Gráfico 4: Línea de Tiempo de Pagos por Fecha
+        mostrar('pagos_razon_social', version_vista, figuras['pagos_razon_social'])
+    
+    # Gráfico 4: Línea de Tiempo de Pagos por Fecha
+    with aislada("Línea de Tiempo de Pagos"):
         st.subheader("📅 Línea de Tiempo de Pagos")
         
-        # Crear DataFrame con datos de fecha y monto
-        df_timeline2 = df_totales[['Fecha de Pago', 'Suma Total', 'Pago Planilla y Gastos']].copy()
-        df_timeline2['Fecha de Pago'] = pd.to_datetime(df_timeline2['Fecha de Pago'], errors='coerce')
-        
-        # Agrupar por fecha y sumar
-        df_timeline_agg2 = df_timeline2.dropna(subset=['Fecha de Pago']).groupby('Fecha de Pago').agg({
-            'Suma Total': 'sum',
-            'Pago Planilla y Gastos': 'sum'
-        }).reset_index()
-        df_timeline_agg2 = df_timeline_agg2.sort_values('Fecha de Pago')
-        
+        df_timeline_agg2 = tarea_serie.resultado()
         if len(df_timeline_agg2) > 0:
-            # Crear gráfico de línea
-            fig_timeline2 = go.Figure()
-            fig_timeline2.add_trace(go.Scatter(
-                x=df_timeline_agg2['Fecha de Pago'], 
-                y=df_timeline_agg2['Suma Total'],
-                mode='lines+markers',
-                name='Suma Total',
-                line=dict(color='#1f77b4', width=3)
-            ))
-            fig_timeline2.add_trace(go.Scatter(
-                x=df_timeline_agg2['Fecha de Pago'], 
-                y=df_timeline_agg2['Pago Planilla y Gastos'],
-                mode='lines+markers',
-                name='Pago P y G',
-                line=dict(color='#ff7f0e', width=3)
-            ))
-            fig_timeline2.update_layout(
-                title='Evolución de Pagos por Fecha',
-                xaxis_title='Fecha',
-                yaxis_title='Monto (S/)',
-                hovermode='x unified',
-                height=400
-            )
-            st.plotly_chart(fig_timeline2, use_container_width=True)
-        
-        # Mostrar tabla de datos detallados
-        st.subheader("📋 Datos Detallados")
-        st.dataframe(df_totales, width='stretch', height=400)
-        
-        # Resumen estadístico
+            mostrar('pagos_evolucion_totales', version_vista, grafico_serie_totales(df_timeline_agg2)['pagos_evolucion_totales'])
+    
+    # Mostrar tabla de datos detallados
+    st.subheader("📋 Datos Detallados")
+    tabla_detalle(df_totales, 'totales', version_vista, [col for col in df_totales.columns if col != HASH_FILA],
+                  ['Suma Total', 'Pago Planilla y Gastos'])
+    
+    # Resumen estadístico
+    with aislada("Resumen Estadístico"):
         st.subheader("📊 Resumen Estadístico")
-        st.dataframe(df_totales[['Suma Total', 'Pago Planilla y Gastos']].describe(), width='stretch')
+        with seccion_cacheada("resumen estadístico"):
+            resumen = tarea_resumen.resultado()
+            st.dataframe(resumen, width='stretch')
+            anotar_carga(resumen)
+
+def pestana_cruce(df, reporte, firma_filtros):
+    # Contenido de "Pagos vs Cierre"; el CIERRE GASTOS solo se carga con la pestaña abierta
+    with seccion_cacheada("cruce"):
+        cierre = cargar_cierre(huella_vigente("cierre_gastos"))
+        if cierre is None:
+            st.info("No se encontraron libros 'CIERRE GASTOS ADMINISTRATIVOS <MES> <AÑO>.xlsx' para cruzar.")
+            return
+        cruce, version_cruce = cruce_completo(df, reporte, *cierre)
+        # Los filtros de la barra lateral se aplican sobre las claves del cruce
+        cruce = filtrar(cruce, firma_filtros)
+        version_cruce = version_filtrada(version_cruce, firma_filtros)
+    
+    figuras = graficos_cruce(cruce)
+    anticipar(figuras, version_cruce)
+    
+    with seccion("KPIs cruce"):
+        kpis = totales_cruce(cruce)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("💳 Pagado (PAGOS)", f"S/ {kpis[PAGADO]:,.2f}")
+    col2.metric("🧾 Facturado (CIERRE)", f"S/ {kpis[FACTURADO]:,.2f}")
+    col3.metric("⚖️ Diferencia", f"S/ {kpis['DIFERENCIA']:,.2f}")
+    col4.metric("🔗 Sin contraparte", f"{kpis[SOLO_PAGOS] + kpis[SOLO_CIERRE]:,}",
+                help=f"Combinaciones de claves solo en PAGOS: {kpis[SOLO_PAGOS]:,} · solo en CIERRE: {kpis[SOLO_CIERRE]:,}")
+    
+    with aislada("Pagado vs Facturado"):
+        st.subheader("📈 Pagado vs Facturado")
+        mostrar('cruce_asesor', version_cruce, figuras['cruce_asesor'])
+        mostrar('cruce_cartera', version_cruce, figuras['cruce_cartera'])
+    
+    # Asesor y cartera con mayor diferencia primero
+    st.subheader("📋 Diferencias por Asesor y Cartera")
+    tabla_detalle(resumen_por(cruce, ['ASESOR', 'CARTERA'], orden='DIFERENCIA'), 'cruce', version_cruce, None,
+                  [PAGADO, FACTURADO, 'DIFERENCIA'])
+
+# Crear tabs antes de cargar los datos: con on_change="rerun" cada pestaña sabe
+# si está abierta y solo la visible agrega, construye figuras y envía tablas; al
+# volver a una pestaña sus figuras y resúmenes salen de la caché de la vista.
+# La pestaña abierta reserva sus lugares y muestra sus KPIs en cuanto los tiene
+tab1, tab2, tab3 = st.tabs(["📋 Cierre de Pagos", "📊 Pagos Total", "🔗 Pagos vs Cierre"], key="pestana_pagos",
+                           on_change="rerun")
+lugares_kpis = {}
+lugares = {}
+
+# TAB 1: CIERRE DE PAGOS
+with tab1:
+    if tab1.open:
+        st.header("Cierre de Pagos")
+        st.subheader("📊 Resumen de Datos - Cierre de Pagos")
+        lugares_kpis['cierre'] = hueco("⏳ Calculando los indicadores…")
+        lugares['cierre'] = hueco("⏳ Cargando los datos…")
+
+# TAB 2: PAGOS TOTAL
+with tab2:
+    if tab2.open:
+        st.header("Pagos Total - Solo P y Pago P y G")
+        st.subheader("📊 Resumen de Datos")
+        lugares_kpis['totales'] = hueco("⏳ Calculando los indicadores…")
+        lugares['totales'] = hueco("⏳ Cargando los datos…")
+
+# TAB 3: CRUCE CON EL CIERRE GASTOS (sobre los libros completos, filtrado por claves)
+with tab3:
+    if tab3.open:
+        st.header("Pagos vs Cierre de Gastos")
+        st.caption("Gastos pagados (PAGO GASTOS del libro PAGOS) contra gastos facturados (MONTO del CIERRE GASTOS "
+                   "ADMINISTRATIVOS), cruzados por asesor, cartera, campaña, razón social y fecha de pago.")
+        lugares['cruce'] = hueco("⏳ Cruzando los libros…")
+
+valores = None
+try:
+    huella = huella_vigente("pagos")
+    
+    # KPIs del resumen guardado con cada libro: no necesitan los datos, pero
+    # solo valen para la vista sin filtros
+    resumen = resumen_sin_cargar(huella)
+    if resumen is not None and not hay_filtros('pagos', resumen["fechas"]):
+        with seccion("KPIs (resumen de los libros)"):
+            valores = kpis_resumen(resumen)
+            if 'cierre' in lugares_kpis:
+                kpis_cierre(lugares_kpis['cierre'], valores)
+            if 'totales' in lugares_kpis:
+                kpis_totales(lugares_kpis['totales'], valores)
+    
+    # Las pestañas usan el mismo DataFrame (una sola instancia compartida)
+    with seccion_cacheada("carga de datos"):
+        if usar_duckdb():
+            # Vista SQL sobre los Parquet en lugar del DataFrame: sumas,
+            # conteos, filtros y tablas se resuelven en DuckDB
+            consultas = consultas_sql("pagos", huella)
+            df, reporte = consultas.vista(), consultas.reporte
+        else:
+            df, reporte = cargar_datos(huella)
+    df_cierre = df_totales = df
+    
+    # Avisar de valores que no se pudieron convertir al tipo declarado
+    if reporte["total_errores"]:
+        with st.sidebar.expander(f"⚠️ {reporte['total_errores']} valores no válidos en el Excel"):
+            st.dataframe(errores_como_tabla(reporte), hide_index=True)
+    
+    # Variantes de un mismo nombre (espacios, tildes, mayúsculas o alias) que se muestran como uno
+    if reporte.get("unificados"):
+        with st.sidebar.expander(f"🔤 {sum(map(len, reporte['unificados'].values()))} variantes de nombres unificadas"):
+            st.dataframe(unificados_como_tabla(reporte), hide_index=True)
+    
+    # Memoria del almacén compartido por todas las sesiones del proceso
+    with st.sidebar.expander("💾 Memoria de datos"):
+        if usar_duckdb():
+            st.caption(f"Consultas DuckDB sobre {len(reporte['periodos'])} libros Parquet (sin cargarlos en memoria)")
+        else:
+            st.caption(almacen_datos().resumen())
+        if vigilante_libros() is not None:
+            st.caption(vigilante_libros().resumen())
+    
+    # Filtros de la barra lateral: se aplican a todas las pestañas
+    etiquetas = dict(ETIQUETAS_FILTROS) if len(reporte["periodos"]) > 1 else {
+        col: etiqueta for col, etiqueta in ETIQUETAS_FILTROS.items() if col != PERIODO}
+    with seccion_cacheada("filtros"):
+        if usar_duckdb():
+            firma_filtros = seleccion_filtros(consultas.opciones(list(ETIQUETAS_FILTROS)),
+                                              consultas.extremos('FECHA_DE_PAGO'), 'pagos', etiquetas)
+            version_vista = version_filtrada(reporte["version"], firma_filtros)
+            if firma_filtros is not None:
+                df_cierre = df_totales = consultas.vista(firma_filtros, 'FECHA_DE_PAGO')
+        else:
+            posiciones_filtro, firma_filtros = barra_filtros(indice_filtros(df_cierre, reporte["version"]),
+                                                             reporte["version"], 'pagos', etiquetas)
+            version_vista = version_filtrada(reporte["version"], firma_filtros)
+            if posiciones_filtro is not None:
+                df_cierre = df_totales = df_cierre.iloc[posiciones_filtro]
+    if firma_filtros is not None:
+        st.sidebar.caption(f"Mostrando {len(df_cierre):,} de {reporte['filas']:,} registros")
+        # Con filtros los KPIs del resumen no valen: se calculan sobre la vista
+        valores = None
+    
+    # Cada pestaña abierta se pinta en su lugar; un fallo solo afecta a su sección
+    if 'cierre' in lugares:
+        with lugares['cierre'].container(), aislada("Cierre de Pagos"):
+            pestana_cierre(df_cierre, version_vista, lugares_kpis['cierre'], valores)
+    
+    if 'totales' in lugares:
+        with lugares['totales'].container(), aislada("Pagos Total"):
+            pestana_totales(df_totales, version_vista, lugares_kpis['totales'], valores)
+    
+    if 'cruce' in lugares:
+        with lugares['cruce'].container(), aislada("Pagos vs Cierre"):
+            pestana_cruce(df, reporte, firma_filtros)
 
 except Exception as e:
+    # Sin datos no hay pestañas que mostrar (los KPIs del resumen sí valen)
+    for lugar in lugares.values():
+        lugar.empty()
+    if valores is None:
+        for lugar in lugares_kpis.values():
+            lugar.empty()
     st.error(f"Error al cargar los datos: {e}")
-    st.info("Asegúrate de que el archivo 'PAGOS NOVIEMBRE 2025.xlsx' esté en el mismo directorio que este script.")
+    st.info("Asegúrate de que los archivos 'PAGOS <MES> <AÑO>.xlsx' estén en el mismo directorio que este script.")
+
+# Desglose de tiempos del rerun (solo con el perfil activo)
+instrumentacion.panel()
@@ -6,381 +6,447 @@ import numpy as np
 from datetime import datetime
 import io
 import os
+from contextlib import contextmanager
 from pathlib import Path
 
+from agregados import DIMENSIONES_CIERRE, MONTOS_CIERRE, CuboIncremental, construir_cubo, rebanar, serie_diaria, serie_semanal, totales
+from almacen import AlmacenDatos
+from exportar import FORMATOS, exportar_cacheado
+from filtros import barra_filtros, construir_indice, hay_filtros, seleccion_filtros, version_filtrada
+import graficos
+from graficos import mostrar
+import instrumentacion
+from instrumentacion import anotar_carga, contar_fallo, cronometrar, marcar_fallo, seccion, seccion_cacheada
+from ingesta import (PERIODO, cargar_periodos, describir_periodos, descubrir_libros, errores_como_tabla, huella_libros,
+                     kpis_resumen, resumen_libros, unificados_como_tabla)
+from montos import conciliar
+from motor_sql import usar_duckdb
+from progresivo import aislada, anticipar, en_segundo_plano, hueco
+from snapshot import cargar_snapshot, manifiesto_snapshot
+from tabla_paginada import filas_tabla, mostrar_tabla_paginada
+from vigilante import Vigilante, vigilancia_activa
+
+# Perfil de este rerun (solo con DASHBOARD_PERFIL=1 o ?perfil=1)
+instrumentacion.iniciar("finanzas")
+
+# Paquete precalculado (modo snapshot, con DASHBOARD_SNAPSHOT); None si se leen los Excel
+SNAPSHOT = manifiesto_snapshot("cierre_gastos")
+
+# Meses disponibles: un libro "CIERRE GASTOS ADMINISTRATIVOS <MES> <AÑO>.xlsx" por mes
+if SNAPSHOT is not None:
+    PERIODOS = describir_periodos([pd.Period(periodo) for periodo in SNAPSHOT["reporte"]["periodos"]])
+else:
+    PERIODOS = describir_periodos([periodo for periodo, _ in descubrir_libros("cierre_gastos")])
+
 # Configuración de la página
-st.set_page_config(page_title="Dashboard Finanzas - Enero 2026", layout="wide", initial_sidebar_state="expanded")
+st.set_page_config(page_title=f"Dashboard Finanzas - {PERIODOS}", layout="wide", initial_sidebar_state="expanded")
 
 # Título principal
-st.title("💰 Dashboard de Finanzas - Enero 2026")
+st.title(f"💰 Dashboard de Finanzas - {PERIODOS}")
 
 # Cargar datos
-@st.cache_data
-def cargar_datos():
-    # Obtener la ruta del archivo Excel
-    script_dir = Path(__file__).parent
-    excel_file = script_dir / "CIERRE GASTOS ADMINISTRATIVOS ENERO 2026.xlsx"
-    
-    # Verificar si el archivo existe
-    if not excel_file.exists():
-        raise FileNotFoundError(f"No se encontró el archivo: {excel_file}")
-    
-    # Leer la hoja
-    df = pd.read_excel(str(excel_file), sheet_name="Hoja1")
-    
-    # Excluir filas que no tengan ASESOR (son filas de totales)
-    df = df.dropna(subset=['ASESOR'])
-    
-    # Convertir columnas de fechas a strings para evitar problemas de serialización
-    for col in df.columns:
-        if pd.api.types.is_datetime64_any_dtype(df[col]):
-            df[col] = df[col].dt.strftime('%Y-%m-%d')
-    
-    return df
+@st.cache_resource
+def almacen_datos():
+    # Almacén único por proceso: cada versión de los datos se guarda una vez y
+    # todas las sesiones reciben la misma instancia, sin copias por sesión
+    return AlmacenDatos()
 
-try:
-    df = cargar_datos()
-    
-    # ============ ANÁLISIS PRINCIPAL: VALOR VENTA, IGV, MONTO ============
+def cargar_datos(huella):
+    """``(df, reporte, precalculados)`` del paquete snapshot o de los Excel en la versión ``huella``."""
+    if SNAPSHOT is not None:
+        # Datos, cubo y conciliación ya calculados: no se toca el Excel
+        return almacen_datos().obtener("cierre_gastos", SNAPSHOT["version"],
+                                       contar_fallo(lambda: cargar_snapshot(SNAPSHOT)))
+    # La huella (ruta, mtime, tamaño de cada libro) cambia cuando se modifica o
+    # aparece un mes; las columnas llegan ya tipadas y sin filas de totales
+    # (sin ASESOR), y solo los libros nuevos o modificados se re-parsean
+    return almacen_datos().obtener("cierre_gastos", huella,
+                                   contar_fallo(lambda: cargar_periodos("cierre_gastos") + ({},)))
+
+@st.cache_resource
+def vigilante_libros():
+    # Hilo único por proceso: precarga cada versión nueva de los libros y solo
+    # entonces la publica (sin vigilante en modo snapshot o con DASHBOARD_VIGILAR=0)
+    if SNAPSHOT is not None or not vigilancia_activa():
+        return None
+    return Vigilante(["cierre_gastos"], lambda huellas: precargar(huellas["cierre_gastos"])).iniciar()
+
+def huella_vigente():
+    """Huella de los libros publicada por el vigilante (o la de disco si no vigila)."""
+    vigilante = vigilante_libros()
+    return vigilante.huella("cierre_gastos") if vigilante is not None else huella_libros("cierre_gastos")
+
+@st.cache_resource(max_entries=2)
+def consultas_sql(huella):
+    # Modo DASHBOARD_MOTOR=duckdb: una conexión por versión de los libros,
+    # compartida por las sesiones; los datos se quedan en los Parquet
+    from motor_sql import ConsultasDuckDB
+    marcar_fallo()
+    return ConsultasDuckDB("cierre_gastos")
+
+@st.cache_resource
+def motor_cubo():
+    # Cubo compartido por todas las sesiones: una pasada groupby por versión de
+    # los datos y, cuando el libro se re-guarda, actualización solo por delta.
+    # Todos los gráficos re-agregan este cubo en lugar de recorrer el DataFrame
+    return CuboIncremental(DIMENSIONES_CIERRE, MONTOS_CIERRE)
+
+@st.cache_resource(max_entries=4)
+def indice_filtros(_df, version):
+    # Índice invertido de solo lectura compartido por las sesiones (sin copias)
+    marcar_fallo()
+    return construir_indice(_df, COLUMNAS_FILTROS, 'FECHA_DE_PAGO')
+
+@st.cache_data(max_entries=32)
+def cubo_filtrado(_df, version_vista):
+    # Cubo de una vista filtrada, memoizado por combinación de filtros
+    marcar_fallo()
+    return construir_cubo(_df, DIMENSIONES_CIERRE, MONTOS_CIERRE)
+
+@st.cache_data(max_entries=4)
+def filas_descuadradas(_df, version):
+    # Conciliación por fila (MONTO = VALOR VENTA + IGV, IGV = 18 %), una vez por versión
+    marcar_fallo()
+    return conciliar(_df)
+
+ETIQUETAS_FILTROS = {
+    PERIODO: "🗓️ Periodo",
+    'ASESOR': "👥 Asesor",
+    'CARTERA': "📦 Cartera",
+    'CAMPANA': "🎯 Campaña",
+    'RAZON_SOCIAL': "🏢 Razón Social",
+}
+
+COLUMNAS_FILTROS = [PERIODO, 'ASESOR', 'CARTERA', 'CAMPANA', 'RAZON_SOCIAL']
+
+def graficos_cubo(cubo, kpis):
+    """Gráficos de la página que salen del cubo de la vista, por id, como funciones que los construyen."""
+    return {
+        'monto_por_cartera': lambda: graficos.monto_por_cartera(
+            rebanar(cubo, 'CARTERA', ['MONTO'], orden='MONTO', ascendente=True), kpis['MONTO']),
+        'composicion_monto': lambda: graficos.composicion_monto(kpis['VALOR VENTA'], kpis['IGV']),
+        'descomposicion_cartera': lambda: graficos.descomposicion_cartera(
+            rebanar(cubo, 'CARTERA', ['VALOR VENTA', 'IGV'], orden='VALOR VENTA', ascendente=True)),
+        'top_asesores': lambda: graficos.top_asesores_monto(
+            rebanar(cubo, 'ASESOR', MONTOS_CIERRE, orden='MONTO', limite=15)),
+        'analisis_campana': lambda: graficos.analisis_campana(
+            rebanar(cubo, 'CAMPANA', MONTOS_CIERRE, orden='MONTO')),
+        'distribucion_estado': lambda: graficos.distribucion_estado(
+            rebanar(cubo, 'ESTADO_PLANILLA', ['MONTO'], orden='MONTO')),
+    }
+
+def graficos_fechas(serie, semanas, periodos):
+    """Líneas de tiempo de la página, por id (solo las que tienen fechas en la vista)."""
+    figuras = {}
+    if len(serie):
+        figuras['monto_diario'] = lambda: graficos.monto_diario(serie, periodos)
+        figuras['monto_acumulado'] = lambda: graficos.monto_acumulado(serie, periodos)
+    if len(semanas):
+        figuras['monto_semanal'] = lambda: graficos.monto_semanal(semanas)
+        figuras['composicion_semanal'] = lambda: graficos.composicion_semanal(semanas)
+    return figuras
+
+def series_vista(cubo):
+    """Montos por fecha (con acumulado) y por semana ISO, servidos desde el cubo de la vista."""
+    return (serie_diaria(cubo, 'FECHA_DE_PAGO', MONTOS_CIERRE, acumulado='MONTO'),
+            serie_semanal(cubo, 'FECHA_DE_PAGO', MONTOS_CIERRE))
+
+def resumen_sin_cargar(huella):
+    """``resumen`` de los libros de la versión ``huella`` sin cargar los datos (None si no está disponible)."""
+    if SNAPSHOT is not None:
+        return SNAPSHOT["reporte"].get("resumen")
+    if huella != huella_libros("cierre_gastos"):
+        # El vigilante aún no publica la versión que hay en disco
+        return None
+    return resumen_libros("cierre_gastos")
+
+def mostrar_kpis(lugar, kpis):
+    """Tarjetas de los KPIs principales en ``lugar``."""
+    with lugar.container():
+        col_kpi1, col_kpi2, col_kpi3, col_kpi4 = st.columns(4)
+        col_kpi1.metric("💰 Monto Total", f"S/ {kpis['MONTO']:,.2f}")
+        col_kpi2.metric("🧾 Valor Venta", f"S/ {kpis['VALOR VENTA']:,.2f}")
+        col_kpi3.metric("🏛️ IGV", f"S/ {kpis['IGV']:,.2f}")
+        col_kpi4.metric("📄 Registros", f"{kpis['REGISTROS']:,}")
+
+def precargar(huella):
+    # Corre en el hilo del vigilante: deja en caché lo que usa el primer rerun
+    # de la versión ``huella`` sin filtros, antes de publicarla
+    if usar_duckdb():
+        consultas = consultas_sql(huella)
+        df, reporte = consultas.vista(), consultas.reporte
+        cubo = cubo_filtrado(df, reporte["version"])
+        consultas.opciones(COLUMNAS_FILTROS)
+        consultas.extremos('FECHA_DE_PAGO')
+    else:
+        df, reporte, precalculados = cargar_datos(huella)
+        cubo = motor_cubo().obtener(df, reporte["version"], cubo=precalculados.get("cubo"))
+        indice_filtros(df, reporte["version"])
+    filas_descuadradas(df, reporte["version"])
+    figuras = graficos_cubo(cubo, totales(cubo, MONTOS_CIERRE))
+    figuras.update(graficos_fechas(*series_vista(cubo),
+                                   describir_periodos([pd.Period(periodo) for periodo in reporte["periodos"]])))
+    for id_grafico, construir in figuras.items():
+        graficos.figura(id_grafico, reporte["version"], construir)
+
+# Columnas importantes para la tabla y la exportación
+COLUMNAS_DETALLE = ['ASESOR', 'CAMPANA', 'CARTERA', 'RAZON_SOCIAL', 'FECHA_DE_PAGO',
+                    'VALOR VENTA', 'IGV', 'MONTO', 'ESTADO_PLANILLA', 'NUMERO_FACTURA']
+
+@st.fragment
+def datos_detallados(df, version_vista):
+    # Fragmento: paginar, ordenar o cambiar el formato solo re-ejecuta la tabla
+    with aislada("Datos Detallados"):
+        # Botón de descarga arriba de la tabla (se rellena después de conocer los filtros activos)
+        col_export1, col_export2, col_export3 = st.columns([2, 1, 1])
+        
+        # Solo la página visible se formatea y se envía al navegador
+        with seccion("tabla detalle"):
+            posiciones, firma_vista = mostrar_tabla_paginada(df, 'detalle', version_vista, columnas=COLUMNAS_DETALLE,
+                                                             columnas_monto=MONTOS_CIERRE)
+        
+        with col_export2:
+            formato_nombre = st.selectbox("Formato", list(FORMATOS), key="formato_exportacion",
+                                          label_visibility="collapsed")
+        with col_export3:
+            # El archivo se genera solo al pulsar el botón (en un hilo aparte) y se
+            # cachea por versión de datos, filtros activos y formato
+            formato, mime = FORMATOS[formato_nombre]
+            st.download_button(
+                label=f"📥 Descargar {formato_nombre.split(' ')[0]}",
+                data=cronometrar(f"exportación {formato}",
+                                 lambda: exportar_cacheado(filas_tabla(df, COLUMNAS_DETALLE, posiciones, firma_vista),
+                                                           formato, (version_vista, firma_vista))),
+                file_name=f"Datos_Finanzas_{PERIODOS.replace(' ', '_')}.{formato}",
+                mime=mime,
+                key="download_excel",
+                on_click="ignore"
+            )
+
+def encabezado(titulo):
+    """Título de sección entre separadores."""
     st.markdown("---")
-    st.subheader("💵 Indicadores Financieros Principales")
+    st.subheader(titulo)
     st.markdown("---")
+
+# ============ ANÁLISIS PRINCIPAL: VALOR VENTA, IGV, MONTO ============
+encabezado("💵 Indicadores Financieros Principales")
+
+# Cada sección tiene su lugar desde el principio y se pinta al estar lista:
+# primero los KPIs (del resumen de los libros, sin esperar la carga), luego lo
+# que sale del cubo y al final las líneas de tiempo y la tabla
+lugar_kpis = hueco("⏳ Calculando los indicadores…")
+SECCIONES = {
+    'principales': None,
+    'asesor': "👥 Análisis Detallado por Asesor",
+    'fechas': "📅 Evolución Financiera por Fecha",
+    'semanas': "📅 Análisis por Semana (Lunes a Domingo)",
+    'campana': "🎯 Análisis por Campaña",
+    'estado': "📋 Distribución por Estado de Planilla",
+    'detalle': "📊 Datos Detallados",
+}
+lugares = {nombre: hueco(f"⏳ {titulo or 'Gráficos principales'}…") for nombre, titulo in SECCIONES.items()}
+
+@contextmanager
+def seccion_pagina(nombre):
+    """Contexto que pinta la sección ``nombre`` (con su encabezado) en su lugar; un fallo se muestra solo ahí."""
+    titulo = SECCIONES[nombre]
+    with lugares[nombre].container(), aislada(titulo or "Gráficos principales"):
+        if titulo is not None:
+            encabezado(titulo)
+        yield
+
+usar_resumen = False
+try:
+    huella = huella_vigente()
+    
+    # KPIs del resumen guardado con cada libro: no necesitan los datos, pero
+    # solo valen para la vista sin filtros
+    resumen = resumen_sin_cargar(huella)
+    usar_resumen = resumen is not None and not hay_filtros('finanzas', resumen["fechas"])
+    if usar_resumen:
+        with seccion("KPIs (resumen de los libros)"):
+            mostrar_kpis(lugar_kpis, kpis_resumen(resumen))
+    
+    with seccion_cacheada("carga de datos"):
+        if usar_duckdb():
+            # Vista SQL sobre los Parquet en lugar del DataFrame: cubo,
+            # conciliación, filtros y tabla se resuelven en DuckDB
+            consultas = consultas_sql(huella)
+            df, reporte, precalculados = consultas.vista(), consultas.reporte, {}
+        else:
+            df, reporte, precalculados = cargar_datos(huella)
+    
+    # Avisar de valores que no se pudieron convertir al tipo declarado
+    if reporte["total_errores"]:
+        with st.sidebar.expander(f"⚠️ {reporte['total_errores']} valores no válidos en el Excel"):
+            st.dataframe(errores_como_tabla(reporte), hide_index=True)
+    
+    # Variantes de un mismo nombre (espacios, tildes, mayúsculas o alias) que se muestran como uno
+    if reporte.get("unificados"):
+        with st.sidebar.expander(f"🔤 {sum(map(len, reporte['unificados'].values()))} variantes de nombres unificadas"):
+            st.dataframe(unificados_como_tabla(reporte), hide_index=True)
+    
+    # Memoria del almacén compartido por todas las sesiones del proceso
+    with st.sidebar.expander("💾 Memoria de datos"):
+        if usar_duckdb():
+            st.caption(f"Consultas DuckDB sobre {len(reporte['periodos'])} libros Parquet (sin cargarlos en memoria)")
+        else:
+            st.caption(almacen_datos().resumen())
+        if vigilante_libros() is not None:
+            st.caption(vigilante_libros().resumen())
+    
+    # Avisar de filas cuyo MONTO no cuadra con VALOR VENTA + IGV o cuyo IGV no es el 18 %
+    with seccion_cacheada("conciliación"):
+        if "descuadres" in precalculados:
+            descuadradas = precalculados["descuadres"]
+        else:
+            descuadradas = filas_descuadradas(df, reporte["version"])
+        if len(descuadradas):
+            with st.sidebar.expander(f"🧮 {len(descuadradas)} filas no cuadran (MONTO / IGV)"):
+                tabla_descuadres = descuadradas[[col for col in [PERIODO, 'NUMERO_FACTURA', 'ASESOR', 'VALOR VENTA', 'IGV',
+                                                                 'MONTO', 'DIFERENCIA_MONTO', 'IGV_ESPERADO',
+                                                                 'DIFERENCIA_IGV']
+                                                 if col in descuadradas.columns]]
+                st.dataframe(tabla_descuadres, hide_index=True)
+                anotar_carga(tabla_descuadres)
+    
+    with seccion("cubo"):
+        if usar_duckdb():
+            # Un GROUP BY en DuckDB; el cubo resultante es pequeño
+            motor = None
+            cubo = cubo_filtrado(df, reporte["version"])
+        else:
+            motor = motor_cubo()
+            cubo = motor.obtener(df, reporte["version"], cubo=precalculados.get("cubo"))
+    if motor is not None and motor.ultima_actualizacion.get("modo") == "delta":
+        st.sidebar.caption(
+            f"🔄 Actualización incremental: +{motor.ultima_actualizacion['añadidas']} / "
+            f"-{motor.ultima_actualizacion['eliminadas']} filas"
+        )
     
-    # Calcular KPIs
-    total_valor_venta = pd.to_numeric(df['VALOR VENTA'], errors='coerce').sum()
-    total_igv = pd.to_numeric(df['IGV'], errors='coerce').sum()
-    total_monto = pd.to_numeric(df['MONTO'], errors='coerce').sum()
-    
-    # Gráficos principales en 3 columnas grandes
-    col1, col2, col3 = st.columns(3)
+    # Filtros de la barra lateral: se aplican a todos los gráficos y tablas
+    etiquetas = dict(ETIQUETAS_FILTROS) if len(reporte["periodos"]) > 1 else {
+        col: etiqueta for col, etiqueta in ETIQUETAS_FILTROS.items() if col != PERIODO}
+    with seccion_cacheada("filtros"):
+        if usar_duckdb():
+            firma_filtros = seleccion_filtros(consultas.opciones(COLUMNAS_FILTROS), consultas.extremos('FECHA_DE_PAGO'),
+                                              'finanzas', etiquetas)
+            version_vista = version_filtrada(reporte["version"], firma_filtros)
+            if firma_filtros is not None:
+                df = consultas.vista(firma_filtros, 'FECHA_DE_PAGO')
+                cubo = cubo_filtrado(df, version_vista)
+        else:
+            posiciones_filtro, firma_filtros = barra_filtros(indice_filtros(df, reporte["version"]),
+                                                             reporte["version"], 'finanzas', etiquetas)
+            version_vista = version_filtrada(reporte["version"], firma_filtros)
+            if posiciones_filtro is not None:
+                df = df.iloc[posiciones_filtro]
+                cubo = cubo_filtrado(df, version_vista)
+    if firma_filtros is not None:
+        st.sidebar.caption(f"Mostrando {len(df):,} de {reporte['filas']:,} registros")
     
-    with col1:
-        # Monto por Cartera - PRINCIPAL
-        df_cartera_monto = df.groupby('CARTERA')['MONTO'].sum().reset_index().sort_values('MONTO', ascending=True)
+    # Calcular KPIs
+    with seccion("KPIs"):
+        kpis = totales(cubo, MONTOS_CIERRE)
+        if not usar_resumen or firma_filtros is not None:
+            mostrar_kpis(lugar_kpis, dict(kpis, REGISTROS=len(df)))
+    
+    # Las series por fecha se calculan en segundo plano mientras se pintan los
+    # gráficos del cubo, que también empiezan a construirse en el pool. Cada
+    # figura se construye una vez por vista (datos + filtros) y los reruns de
+    # otros widgets la reutilizan; el vigilante deja listas las de la vista sin filtros
+    tarea_series = en_segundo_plano("series por fecha (segundo plano)", series_vista, cubo)
+    periodos_vista = describir_periodos([pd.Period(periodo) for periodo in reporte["periodos"]])
+    figuras = graficos_cubo(cubo, kpis)
+    anticipar(figuras, version_vista)
+    
+    with seccion_pagina('principales'):
+        # Gráficos principales en 3 columnas grandes
+        col1, col2, col3 = st.columns(3)
         
-        fig = px.bar(df_cartera_monto, x='MONTO', y='CARTERA',
-                     title=f"<b>MONTO TOTAL</b><br>S/ {total_monto:,.2f}",
-                     labels={'MONTO': 'Monto (S/)', 'CARTERA': 'Cartera'},
-                     color='MONTO', color_continuous_scale="Greens",
-                     orientation='h')
-        fig.update_layout(height=600, showlegend=False, template='plotly_white',
-                         font=dict(size=12),
-                         margin=dict(l=150))
-        fig.update_traces(textposition='auto', texttemplate='S/ %{x:,.0f}', textfont=dict(size=12))
-        st.plotly_chart(fig, use_container_width=True)
-    
-    with col2:
-        # Composición del MONTO: Valor Venta vs IGV
-        descomposicion = pd.DataFrame({
-            'Componente': ['Valor Venta', 'IGV'],
-            'Monto': [total_valor_venta, total_igv]
-        })
+        with col1:
+            # Monto por Cartera - PRINCIPAL
+            mostrar('monto_por_cartera', version_vista, figuras['monto_por_cartera'])
         
-        fig = px.pie(descomposicion, values='Monto', names='Componente',
-                     title=f"<b>COMPOSICIÓN DEL MONTO</b><br>Valor Venta: S/ {total_valor_venta:,.2f}<br>IGV: S/ {total_igv:,.2f}",
-                     color_discrete_map={'Valor Venta': '#1f77b4', 'IGV': '#ff7f0e'},
-                     hole=0.3)
-        fig.update_layout(height=600, showlegend=True, template='plotly_white', font=dict(size=12))
-        fig.update_traces(textposition='auto', texttemplate='<b>%{label}</b><br>S/ %{value:,.0f}<br>(%{percent})', 
-                         textfont=dict(size=11))
-        st.plotly_chart(fig, use_container_width=True)
-    
-    with col3:
-        # Descomposición por Cartera: Valor Venta e IGV apilados
-        df_cartera_comp = df.groupby('CARTERA').agg({
-            'VALOR VENTA': 'sum',
-            'IGV': 'sum'
-        }).reset_index().sort_values('VALOR VENTA', ascending=True)
+        with col2:
+            # Composición del MONTO: Valor Venta vs IGV
+            mostrar('composicion_monto', version_vista, figuras['composicion_monto'])
         
-        fig = px.bar(df_cartera_comp, x=['VALOR VENTA', 'IGV'], y='CARTERA',
-                     title="<b>DESCOMPOSICIÓN POR CARTERA</b><br>Valor Venta e IGV",
-                     labels={'value': 'Monto (S/)', 'CARTERA': 'Cartera'},
-                     barmode='stack',
-                     color_discrete_map={
-                        'VALOR VENTA': '#1f77b4',
-                        'IGV': '#ff7f0e'
-                    },
-                     orientation='h')
-        fig.update_layout(height=600, showlegend=True, template='plotly_white',
-                         font=dict(size=12),
-                         margin=dict(l=150))
-        fig.update_traces(textposition='auto', texttemplate='S/ %{x:,.0f}', textfont=dict(size=11))
-        st.plotly_chart(fig, use_container_width=True)
+        with col3:
+            # Descomposición por Cartera: Valor Venta e IGV apilados
+            mostrar('descomposicion_cartera', version_vista, figuras['descomposicion_cartera'])
     
     # ============ ANÁLISIS DETALLADO POR ASESOR ============
-    st.markdown("---")
-    st.subheader("👥 Análisis Detallado por Asesor")
-    st.markdown("---")
+    with seccion_pagina('asesor'):
+        # Top Asesores por Monto
+        mostrar('top_asesores', version_vista, figuras['top_asesores'])
     
-    # Top Asesores por Monto
-    df_asesor = df.groupby('ASESOR').agg({
-        'VALOR VENTA': 'sum',
-        'IGV': 'sum',
-        'MONTO': 'sum'
-    }).reset_index().sort_values('MONTO', ascending=False).head(15)
+    # ============ ANÁLISIS POR CAMPAÑA ============
+    with seccion_pagina('campana'):
+        mostrar('analisis_campana', version_vista, figuras['analisis_campana'])
     
-    fig = px.bar(df_asesor, y='ASESOR', x='MONTO',
-                title="<b>Top 15 Asesores - Monto</b>",
-                labels={'MONTO': 'Monto (S/)', 'ASESOR': 'Asesor'},
-                color='MONTO', color_continuous_scale="Blues",
-                orientation='h')
-    fig.update_layout(height=600, showlegend=False, template='plotly_white', 
-                     yaxis={'categoryorder': 'total ascending'},
-                     font=dict(size=11),
-                     margin=dict(l=150))
-    fig.update_traces(textposition='auto', texttemplate='S/ %{x:,.0f}', textfont=dict(size=11))
-    st.plotly_chart(fig, use_container_width=True)
+    # ============ ANÁLISIS POR ESTADO DE PLANILLA ============
+    with seccion_pagina('estado'):
+        # Monto por Estado de Planilla
+        mostrar('distribucion_estado', version_vista, figuras['distribucion_estado'])
     
     # ============ LÍNEA DE TIEMPO FINANCIERA ============
-    st.markdown("---")
-    st.subheader("📅 Evolución Financiera por Fecha")
-    st.markdown("---")
-    
-    # Preparar datos de línea de tiempo
-    df_timeline = df[['FECHA_DE_PAGO', 'VALOR VENTA', 'IGV', 'MONTO']].copy()
-    df_timeline['FECHA_DE_PAGO'] = pd.to_datetime(df_timeline['FECHA_DE_PAGO'], errors='coerce')
-    
-    # Agrupar por fecha
-    df_timeline_agg = df_timeline.dropna(subset=['FECHA_DE_PAGO']).groupby('FECHA_DE_PAGO').agg({
-        'VALOR VENTA': 'sum',
-        'IGV': 'sum',
-        'MONTO': 'sum'
-    }).reset_index().sort_values('FECHA_DE_PAGO')
-    
-    if len(df_timeline_agg) > 0:
-        col_timeline1, col_timeline2 = st.columns(2)
+    with seccion_pagina('fechas'):
+        df_timeline_agg, df_semanas = tarea_series.resultado()
+        figuras = graficos_fechas(df_timeline_agg, df_semanas, periodos_vista)
+        anticipar(figuras, version_vista)
         
-        with col_timeline1:
-            # Crear gráfico de línea mejorado - Solo Monto Total
-            fig_timeline = go.Figure()
+        if len(df_timeline_agg) > 0:
+            col_timeline1, col_timeline2 = st.columns(2)
             
-            fig_timeline.add_trace(go.Scatter(
-                x=df_timeline_agg['FECHA_DE_PAGO'], 
-                y=df_timeline_agg['MONTO'],
-                mode='lines+markers+text',
-                name='Monto Diario',
-                line=dict(color='#2ca02c', width=3),
-                marker=dict(size=10),
-                text=df_timeline_agg['MONTO'].apply(lambda x: f'S/ {x:,.0f}'),
-                textposition='top center',
-                textfont=dict(size=10),
-                fill='tozeroy',
-                fillcolor='rgba(44, 160, 44, 0.3)'
-            ))
+            with col_timeline1:
+                mostrar('monto_diario', version_vista, figuras['monto_diario'])
             
-            fig_timeline.update_layout(
-                title='<b>Monto Diario - Enero 2026</b>',
-                xaxis_title='Fecha',
-                yaxis_title='Monto (S/)',
-                hovermode='x unified',
-                height=550,
-                template='plotly_white',
-                showlegend=False,
-                font=dict(size=11)
-            )
-            st.plotly_chart(fig_timeline, use_container_width=True)
-        
-        with col_timeline2:
-            # Crear gráfico acumulado
-            df_timeline_agg['MONTO_ACUMULADO'] = df_timeline_agg['MONTO'].cumsum()
+            with col_timeline2:
+                mostrar('monto_acumulado', version_vista, figuras['monto_acumulado'])
+    
+    # ============ ANÁLISIS POR SEMANA ============
+    with seccion_pagina('semanas'):
+        df_timeline_agg, df_semanas = tarea_series.resultado()
+        figuras = graficos_fechas(df_timeline_agg, df_semanas, periodos_vista)
+        if len(df_semanas) > 0:
+            # Gráfico de barras agrupadas por semana
+            col_sem1, col_sem2 = st.columns(2)
             
-            fig_acumulado = go.Figure()
+            with col_sem1:
+                # Gráfico de barras: Monto por Semana
+                mostrar('monto_semanal', version_vista, figuras['monto_semanal'])
             
-            fig_acumulado.add_trace(go.Scatter(
-                x=df_timeline_agg['FECHA_DE_PAGO'], 
-                y=df_timeline_agg['MONTO_ACUMULADO'],
-                mode='lines+markers+text',
-                name='Acumulado',
-                line=dict(color='#d62728', width=3),
-                marker=dict(size=10),
-                text=df_timeline_agg['MONTO_ACUMULADO'].apply(lambda x: f'S/ {x:,.0f}'),
-                textposition='top center',
-                textfont=dict(size=10),
-                fill='tozeroy',
-                fillcolor='rgba(214, 39, 40, 0.3)'
-            ))
+            with col_sem2:
+                # Gráfico de comparación: Valor Venta vs IGV por semana
+                mostrar('composicion_semanal', version_vista, figuras['composicion_semanal'])
             
-            fig_acumulado.update_layout(
-                title='<b>Monto Acumulado - Progresión en Enero</b>',
-                xaxis_title='Fecha',
-                yaxis_title='Monto Acumulado (S/)',
-                hovermode='x unified',
-                height=550,
-                template='plotly_white',
-                showlegend=False,
-                font=dict(size=11)
-            )
-            st.plotly_chart(fig_acumulado, use_container_width=True)
-    
-    # ============ ANÁLISIS POR SEMANA ============
-    st.markdown("---")
-    st.subheader("📅 Análisis por Semana (Lunes a Domingo)")
-    st.markdown("---")
-    
-    # Preparar datos de semana
-    df_week = df[['FECHA_DE_PAGO', 'VALOR VENTA', 'IGV', 'MONTO']].copy()
-    df_week['FECHA_DE_PAGO'] = pd.to_datetime(df_week['FECHA_DE_PAGO'], errors='coerce')
-    
-    # Definir las semanas comenzando en lunes (incluyendo 29 dic del año pasado)
-    semanas = {
-        'Semana 1 (29 Dic - 4 Ene)': (pd.Timestamp('2025-12-29'), pd.Timestamp('2026-01-04')),
-        'Semana 2 (5 - 11 Ene)': (pd.Timestamp('2026-01-05'), pd.Timestamp('2026-01-11')),
-        'Semana 3 (12 - 18 Ene)': (pd.Timestamp('2026-01-12'), pd.Timestamp('2026-01-18')),
-        'Semana 4 (19 - 25 Ene)': (pd.Timestamp('2026-01-19'), pd.Timestamp('2026-01-25')),
-        'Semana 5 (26 - 31 Ene)': (pd.Timestamp('2026-01-26'), pd.Timestamp('2026-01-31')),
-        'Semana 6 (2 - 7 Feb)': (pd.Timestamp('2026-02-02'), pd.Timestamp('2026-02-07'))
-    }
-    
-    # Calcular montos por semana
-    datos_semana = []
-    for semana, (fecha_inicio, fecha_fin) in semanas.items():
-        df_semana_temp = df_week[(df_week['FECHA_DE_PAGO'] >= fecha_inicio) & 
-                                  (df_week['FECHA_DE_PAGO'] <= fecha_fin)]
-        
-        if len(df_semana_temp) > 0:
-            total_valor_venta_semana = pd.to_numeric(df_semana_temp['VALOR VENTA'], errors='coerce').sum()
-            total_igv_semana = pd.to_numeric(df_semana_temp['IGV'], errors='coerce').sum()
-            total_monto_semana = pd.to_numeric(df_semana_temp['MONTO'], errors='coerce').sum()
+            # Tabla resumen de semanas
+            st.markdown("---")
+            st.subheader("📊 Resumen Semanal")
             
-            datos_semana.append({
-                'Semana': semana,
-                'VALOR VENTA': total_valor_venta_semana,
-                'IGV': total_igv_semana,
-                'MONTO': total_monto_semana
-            })
-    
-    if datos_semana:
-        df_semanas = pd.DataFrame(datos_semana)
-        
-        # Gráfico de barras agrupadas por semana
-        col_sem1, col_sem2 = st.columns(2)
-        
-        with col_sem1:
-            # Gráfico de barras: Monto por Semana
-            fig_semana = px.bar(df_semanas, x='Semana', y='MONTO',
-                               title='<b>Dinero Ingresado por Semana</b>',
-                               labels={'MONTO': 'Monto (S/)', 'Semana': 'Semana'},
-                               color='MONTO', color_continuous_scale='Viridis',
-                               text='MONTO')
-            fig_semana.update_layout(xaxis_tickangle=-45, height=600, template='plotly_white',
-                                    font=dict(size=11),
-                                    margin=dict(b=100))
-            fig_semana.update_traces(texttemplate='S/ %{value:,.0f}', textposition='auto', textfont=dict(size=12))
-            st.plotly_chart(fig_semana, use_container_width=True)
-        
-        with col_sem2:
-            # Gráfico de comparación: Valor Venta vs IGV por semana
-            fig_comp_semana = px.bar(df_semanas, x='Semana', y=['VALOR VENTA', 'IGV'],
-                                    title='<b>Composición por Semana</b><br>Valor Venta e IGV',
-                                    labels={'value': 'Monto (S/)', 'Semana': 'Semana'},
-                                    barmode='group',
-                                    color_discrete_map={
-                                        'VALOR VENTA': '#1f77b4',
-                                        'IGV': '#ff7f0e'
-                                    })
-            fig_comp_semana.update_layout(xaxis_tickangle=-45, height=600, template='plotly_white',
-                                         font=dict(size=11),
-                                         margin=dict(b=100))
-            fig_comp_semana.update_traces(textposition='auto', texttemplate='S/ %{y:,.0f}', textfont=dict(size=11))
-            st.plotly_chart(fig_comp_semana, use_container_width=True)
-        
-        # Tabla resumen de semanas
-        st.markdown("---")
-        st.subheader("📊 Resumen Semanal")
-        
-        df_semanas_display = df_semanas.copy()
-        df_semanas_display['VALOR VENTA'] = df_semanas_display['VALOR VENTA'].apply(lambda x: f"S/ {x:,.2f}")
-        df_semanas_display['IGV'] = df_semanas_display['IGV'].apply(lambda x: f"S/ {x:,.2f}")
-        df_semanas_display['MONTO'] = df_semanas_display['MONTO'].apply(lambda x: f"S/ {x:,.2f}")
-        
-        st.dataframe(df_semanas_display, use_container_width=True, hide_index=True)
-    
-    # ============ ANÁLISIS POR CAMPAÑA ============
-    st.markdown("---")
-    st.subheader("🎯 Análisis por Campaña")
-    st.markdown("---")
-    
-    df_campana = df.groupby('CAMPANA').agg({
-        'VALOR VENTA': 'sum',
-        'IGV': 'sum',
-        'MONTO': 'sum'
-    }).reset_index().sort_values('MONTO', ascending=False)
-    
-    fig = px.bar(df_campana, x='CAMPANA', y=['VALOR VENTA', 'IGV', 'MONTO'],
-                title="<b>Análisis Financiero por Campaña</b>",
-                labels={'value': 'Monto (S/)', 'CAMPANA': 'Campaña'},
-                barmode='group',
-                color_discrete_map={
-                    'VALOR VENTA': '#1f77b4',
-                    'IGV': '#ff7f0e',
-                    'MONTO': '#2ca02c'
-                })
-    fig.update_layout(xaxis_tickangle=-45, height=700, template='plotly_white', 
-                     font=dict(size=12),
-                     margin=dict(t=100, b=100))
-    fig.update_traces(textposition='auto', texttemplate='S/ %{y:,.0f}', textfont=dict(size=14, color='black'))
-    st.plotly_chart(fig, use_container_width=True)
-    
-    # ============ ANÁLISIS POR ESTADO DE PLANILLA ============
-    st.markdown("---")
-    st.subheader("📋 Distribución por Estado de Planilla")
-    st.markdown("---")
-    
-    # Monto por Estado de Planilla
-    df_estado = df.groupby('ESTADO_PLANILLA').agg({
-        'MONTO': 'sum'
-    }).reset_index().sort_values('MONTO', ascending=False)
-    
-    fig = px.pie(df_estado, values='MONTO', names='ESTADO_PLANILLA',
-                title='<b>Distribución de Monto por Estado de Planilla</b>',
-                color_discrete_sequence=px.colors.qualitative.Set2,
-                hole=0.3)
-    fig.update_layout(height=600, template='plotly_white', font=dict(size=12))
-    fig.update_traces(textposition='auto', texttemplate='<b>%{label}</b><br>S/ %{value:,.0f}<br>(%{percent})',
-                     textfont=dict(size=11))
-    st.plotly_chart(fig, use_container_width=True)
+            df_semanas_display = df_semanas[['Semana', 'VALOR VENTA', 'IGV', 'MONTO']].copy()
+            df_semanas_display['VALOR VENTA'] = df_semanas_display['VALOR VENTA'].apply(lambda x: f"S/ {x:,.2f}")
+            df_semanas_display['IGV'] = df_semanas_display['IGV'].apply(lambda x: f"S/ {x:,.2f}")
+            df_semanas_display['MONTO'] = df_semanas_display['MONTO'].apply(lambda x: f"S/ {x:,.2f}")
+            
+            with seccion("tabla resumen semanal"):
+                st.dataframe(df_semanas_display, use_container_width=True, hide_index=True)
+                anotar_carga(df_semanas_display)
     
     # ============ TABLA DE DATOS DETALLADOS ============
-    st.markdown("---")
-    st.subheader("📊 Datos Detallados")
-    st.markdown("---")
-    
-    # Crear una copia para mostrar - Seleccionar solo columnas importantes
-    df_display = df[['ASESOR', 'CAMPANA', 'CARTERA', 'RAZON_SOCIAL', 'FECHA_DE_PAGO', 
-                     'VALOR VENTA', 'IGV', 'MONTO', 'ESTADO_PLANILLA', 'NUMERO_FACTURA']].copy()
-    
-    # Crear versión sin formato para exportar a Excel
-    df_export = df_display.copy()
-    for col in ['VALOR VENTA', 'IGV', 'MONTO']:
-        if col in df_export.columns:
-            df_export[col] = pd.to_numeric(df_export[col], errors='coerce')
+    with seccion_pagina('detalle'):
+        datos_detallados(df, version_vista)
     
-    # Formatear columnas numéricas para mostrar
-    for col in ['VALOR VENTA', 'IGV', 'MONTO']:
-        if col in df_display.columns:
-            df_display[col] = pd.to_numeric(df_display[col], errors='coerce').apply(lambda x: f"S/ {x:,.2f}" if pd.notna(x) else "")
-    
-    # Botón para descargar Excel
-    col_export1, col_export2 = st.columns([3, 1])
-    
-    with col_export2:
-        # Crear archivo Excel en memoria
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df_export.to_excel(writer, sheet_name='Datos', index=False)
-        output.seek(0)
-        
-        st.download_button(
-            label="📥 Descargar Excel",
-            data=output.getvalue(),
-            file_name="Datos_Finanzas_Enero_2026.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            key="download_excel"
-        )
-    
-    st.dataframe(df_display, use_container_width=True, height=400)
-
 except Exception as e:
+    # Sin datos no hay secciones que mostrar (los KPIs del resumen sí valen)
+    for lugar in lugares.values():
+        lugar.empty()
+    if not usar_resumen:
+        lugar_kpis.empty()
     st.error(f"Error al cargar los datos: {e}")
-    st.info("Asegúrate de que el archivo 'CIERRE GASTOS ADMINISTRATIVOS ENERO 2026.xlsx' esté en el mismo directorio que este script.")
+    st.info("Asegúrate de que los archivos 'CIERRE GASTOS ADMINISTRATIVOS <MES> <AÑO>.xlsx' estén en el mismo directorio que este script.")
 
+# Desglose de tiempos del rerun (solo con el perfil activo)
+instrumentacion.panel()
@@ -0,0 +1,74 @@
+"""Exportación de los datos detallados a xlsx, CSV o Parquet.
+
+Los archivos se generan solo cuando el usuario pulsa el botón de descarga y
+se guardan en una caché LRU por (versión de datos, filtros activos, formato),
+así que ningún rerun de la página construye un libro que nadie va a bajar.
+"""
+import io
+import threading
+from collections import OrderedDict
+
+import openpyxl
+import pandas as pd
+
+from instrumentacion import marcar_fallo
+
+FORMATOS = {
+    "Excel (.xlsx)": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+# Exportaciones guardadas en memoria (las más recientes)
+MAX_EXPORTACIONES = 8
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def _a_xlsx(df, hoja="Datos"):
+    # Libro en modo write_only: las filas se escriben en streaming y la memoria
+    # no crece con un árbol de celdas como en pd.ExcelWriter
+    libro = openpyxl.Workbook(write_only=True)
+    ws = libro.create_sheet(hoja)
+    ws.append([str(col) for col in df.columns])
+    columnas = [df[col].astype(object).where(df[col].notna(), None) for col in df.columns]
+    for fila in zip(*columnas):
+        ws.append(fila)
+    salida = io.BytesIO()
+    libro.save(salida)
+    return salida.getvalue()
+
+
+def exportar(df, formato):
+    """Contenido de ``df`` como bytes en ``formato`` ("xlsx", "csv" o "parquet")."""
+    if formato == "xlsx":
+        return _a_xlsx(df)
+    if formato == "csv":
+        # utf-8-sig para que Excel reconozca tildes y eñes al abrir el CSV
+        return df.to_csv(index=False).encode("utf-8-sig")
+    if formato == "parquet":
+        salida = io.BytesIO()
+        df.to_parquet(salida, index=False)
+        return salida.getvalue()
+    raise ValueError(f"Formato de exportación desconocido: {formato}")
+
+
+def exportar_cacheado(df, formato, clave):
+    """Como ``exportar`` pero reutilizando el resultado para la misma ``clave``.
+
+    ``clave`` debe identificar los datos exportados (versión y filtros activos).
+    Es seguro llamarlo desde el hilo del botón de descarga de Streamlit.
+    """
+    clave = (clave, formato)
+    with _lock:
+        if clave in _cache:
+            _cache.move_to_end(clave)
+            return _cache[clave]
+    marcar_fallo()
+    contenido = exportar(df, formato)
+    with _lock:
+        _cache[clave] = contenido
+        while len(_cache) > MAX_EXPORTACIONES:
+            _cache.popitem(last=False)
+    return contenido
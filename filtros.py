@@ -0,0 +1,158 @@
+"""Filtros de la barra lateral resueltos con un índice invertido.
+
+El índice se construye una vez por versión de los datos:
+
+- por cada columna categórica, ``categoría -> posiciones de fila`` (ordenadas)
+- para la fecha, las fechas ordenadas y su permutación, para consultas por rango
+
+Un cambio de filtro se resuelve uniendo las posiciones de los valores elegidos
+dentro de cada columna e intersecando entre columnas, sin recorrer el
+DataFrame. El resultado se memoiza por combinación de filtros.
+
+``seleccion_filtros`` solo pinta los widgets y devuelve la firma de los
+filtros; en el modo SQL (``motor_sql``) esa firma se aplica como ``WHERE``.
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+_VACIO = np.array([], dtype=np.int64)
+
+
+def construir_indice(df, columnas, columna_fecha=None):
+    """Índice invertido de ``df`` para las ``columnas`` categóricas y la ``columna_fecha``."""
+    indice = {"filas": len(df), "categorias": {}, "fechas": None}
+    for col in columnas:
+        if col not in df.columns:
+            continue
+        serie = df[col]
+        if not isinstance(serie.dtype, pd.CategoricalDtype):
+            serie = serie.astype("category")
+        codigos = serie.cat.codes.to_numpy()
+        # Ordenar por código agrupa las filas de cada categoría; los nulos (-1) quedan al principio
+        orden = np.argsort(codigos, kind="stable")
+        conteos = np.bincount(codigos[codigos >= 0], minlength=len(serie.cat.categories))
+        grupos = np.split(orden[(codigos < 0).sum():], np.cumsum(conteos)[:-1])
+        indice["categorias"][col] = {
+            categoria: posiciones
+            for categoria, posiciones, conteo in zip(serie.cat.categories, grupos, conteos)
+            if conteo > 0
+        }
+
+    if columna_fecha is not None and columna_fecha in df.columns:
+        fechas = df[columna_fecha].to_numpy()
+        validas = np.flatnonzero(~pd.isna(fechas))
+        orden = validas[np.argsort(fechas[validas], kind="stable")]
+        indice["fechas"] = (fechas[orden], orden)
+    return indice
+
+
+def resolver(indice, seleccion, rango_fechas=None):
+    """Posiciones (ordenadas) de las filas que cumplen todos los filtros.
+
+    ``seleccion`` es ``{columna: [valores]}`` (OR dentro de una columna, AND
+    entre columnas) y ``rango_fechas`` un par ``(inicio, fin)`` inclusivo.
+    Devuelve None si no hay ningún filtro activo.
+    """
+    conjuntos = []
+    for col, valores in seleccion.items():
+        if not valores:
+            continue
+        por_valor = indice["categorias"][col]
+        conjuntos.append(np.sort(np.concatenate([por_valor.get(valor, _VACIO) for valor in valores])))
+
+    if rango_fechas is not None and indice["fechas"] is not None:
+        fechas, orden = indice["fechas"]
+        inicio = pd.Timestamp(rango_fechas[0]).to_datetime64().astype(fechas.dtype)
+        fin = (pd.Timestamp(rango_fechas[1]) + pd.Timedelta(days=1)).to_datetime64().astype(fechas.dtype)
+        desde, hasta = np.searchsorted(fechas, [inicio, fin], side="left")
+        conjuntos.append(np.sort(orden[desde:hasta]))
+
+    if not conjuntos:
+        return None
+    # Intersecar empezando por el conjunto más pequeño
+    conjuntos.sort(key=len)
+    resultado = conjuntos[0]
+    for conjunto in conjuntos[1:]:
+        resultado = np.intersect1d(resultado, conjunto, assume_unique=True)
+    return resultado
+
+
+def version_filtrada(version, firma):
+    """Identificador de la vista filtrada (versión de datos + filtros activos)."""
+    if firma is None:
+        return version
+    return f"{version}-{hashlib.sha1(repr(firma).encode('utf-8')).hexdigest()[:12]}"
+
+
+@st.cache_data(max_entries=64)
+def _filas_filtradas(_indice, version, firma):
+    seleccion, rango_fechas = firma
+    return resolver(_indice, dict(seleccion), rango_fechas)
+
+
+def seleccion_filtros(opciones, extremos_fecha, clave, etiquetas, etiqueta_fecha="📅 Rango de fechas"):
+    """Widgets de filtro en la barra lateral; devuelve la ``firma`` de los filtros activos o None.
+
+    ``opciones`` es ``{columna: [valores]}`` y ``extremos_fecha`` el par
+    ``(mínimo, máximo)`` de la fecha o None. ``firma`` es
+    ``(((columna, (valores...)), ...), (inicio, fin) o None)``, hashable.
+    """
+    st.sidebar.header("🔎 Filtros")
+    seleccion = {}
+    for col, etiqueta in etiquetas.items():
+        if col in opciones:
+            seleccion[col] = tuple(st.sidebar.multiselect(etiqueta, opciones[col], key=f"{clave}_filtro_{col}"))
+
+    rango_fechas = None
+    if extremos_fecha is not None:
+        minimo, maximo = pd.Timestamp(extremos_fecha[0]).date(), pd.Timestamp(extremos_fecha[1]).date()
+        valor = st.sidebar.date_input(etiqueta_fecha, value=(minimo, maximo), min_value=minimo,
+                                      max_value=maximo, key=f"{clave}_filtro_fechas")
+        if len(valor) == 2 and (valor[0] > minimo or valor[1] < maximo):
+            rango_fechas = (valor[0], valor[1])
+
+    activos = tuple(sorted((col, valores) for col, valores in seleccion.items() if valores))
+    if not activos and rango_fechas is None:
+        return None
+    return (activos, rango_fechas)
+
+
+def hay_filtros(clave, extremos_fecha=None):
+    """True si la sesión tiene filtros activos en los widgets de ``seleccion_filtros`` con esa ``clave``.
+
+    Mira el estado de la sesión, así que sirve antes de pintar los widgets (y
+    de cargar los datos). ``extremos_fecha`` es el rango completo de la fecha;
+    sin él, cualquier rango elegido cuenta como filtro.
+    """
+    prefijo = f"{clave}_filtro_"
+    for nombre, valor in st.session_state.items():
+        if not str(nombre).startswith(prefijo):
+            continue
+        if nombre != f"{prefijo}fechas":
+            if valor:
+                return True
+        elif len(valor) == 2 and (extremos_fecha is None or (valor[0], valor[1]) != tuple(
+                pd.Timestamp(extremo).date() for extremo in extremos_fecha)):
+            return True
+    return False
+
+
+def barra_filtros(indice, version, clave, etiquetas, etiqueta_fecha="📅 Rango de fechas"):
+    """Filtros en la barra lateral; devuelve ``(posiciones, firma)``.
+
+    ``etiquetas`` es ``{columna: etiqueta}`` de las columnas categóricas del
+    índice a mostrar. ``posiciones`` y ``firma`` son None si no hay filtros
+    activos; si no, ``firma`` es una tupla hashable que describe los filtros.
+    """
+    opciones = {col: sorted(indice["categorias"][col], key=str) for col in etiquetas if col in indice["categorias"]}
+    extremos_fecha = None
+    if indice["fechas"] is not None and len(indice["fechas"][0]) > 0:
+        fechas = indice["fechas"][0]
+        extremos_fecha = (fechas[0], fechas[-1])
+    firma = seleccion_filtros(opciones, extremos_fecha, clave, etiquetas, etiqueta_fecha)
+    if firma is None:
+        return None, None
+    return _filas_filtradas(indice, version, firma), firma
@@ -0,0 +1,363 @@
+"""Gráficos de los dashboards, construidos una vez por versión de la vista.
+
+Cada función arma una figura a partir de datos ya agregados. ``figura`` las
+guarda por (id del gráfico, versión de la vista): la versión de la vista
+incluye la versión de los datos y los filtros activos, así que un rerun
+provocado por otro widget reutiliza las figuras sin re-agregar ni
+reconstruirlas. Las etiquetas de montos se formatean en el navegador con
+``texttemplate`` en lugar de generar un texto por punto en Python.
+
+Las líneas de tiempo no envían un punto por fecha sin límite: las series de
+montos por periodo se re-agregan por día, semana o mes según el rango
+(``agregados.por_resolucion``), las series continuas se reducen con LTTB a
+``MAX_PUNTOS_LINEA`` puntos, las largas se dibujan con WebGL (``Scattergl``)
+y solo ``MAX_ETIQUETAS`` puntos llevan etiqueta.
+"""
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import streamlit as st
+
+from agregados import por_resolucion
+from instrumentacion import anotar_carga, contar_fallo, seccion_cacheada
+
+COLORES_MONTOS = {'VALOR VENTA': '#1f77b4', 'IGV': '#ff7f0e', 'MONTO': '#2ca02c'}
+
+# Puntos máximos por línea enviados al navegador (el resto se descarta con LTTB)
+MAX_PUNTOS_LINEA = 1000
+
+# A partir de cuántos puntos una línea se dibuja con WebGL y sin marcadores
+UMBRAL_WEBGL = 300
+
+# Puntos con etiqueta de monto por línea (repartidos, más el máximo y el último)
+MAX_ETIQUETAS = 31
+
+# Título de los gráficos de montos por periodo según la resolución
+TITULOS_RESOLUCION = {"Día": "Monto Diario", "Semana": "Monto Semanal", "Mes": "Monto Mensual"}
+
+
+@st.cache_resource(max_entries=256, show_spinner=False)
+def _figura_cacheada(id_grafico, version, _construir):
+    return _construir()
+
+
+def figura(id_grafico, version, construir):
+    """Figura ``id_grafico`` de la vista ``version``, construida con ``construir()`` si no está en caché.
+
+    ``construir`` debe agregar y dibujar a partir de los datos de esa versión.
+    La figura se comparte entre sesiones, así que no debe modificarse después.
+    """
+    return _figura_cacheada(id_grafico, version, contar_fallo(construir))
+
+
+def mostrar(id_grafico, version, construir):
+    """Muestra la figura de ``figura(id_grafico, version, construir)`` con ``st.plotly_chart``.
+
+    Con el perfil activo, el gráfico se mide como una sección (construcción,
+    acierto de caché y tamaño del JSON enviado).
+    """
+    with seccion_cacheada(f"gráfico {id_grafico}"):
+        fig = figura(id_grafico, version, construir)
+        st.plotly_chart(fig, use_container_width=True)
+        anotar_carga(fig)
+    return fig
+
+
+# ============ DASHBOARD DE FINANZAS ============
+
+def monto_por_cartera(df_cartera_monto, total_monto):
+    """Barras horizontales del MONTO por cartera."""
+    fig = px.bar(df_cartera_monto, x='MONTO', y='CARTERA',
+                 title=f"<b>MONTO TOTAL</b><br>S/ {total_monto:,.2f}",
+                 labels={'MONTO': 'Monto (S/)', 'CARTERA': 'Cartera'},
+                 color='MONTO', color_continuous_scale="Greens",
+                 orientation='h')
+    fig.update_layout(height=600, showlegend=False, template='plotly_white',
+                      font=dict(size=12),
+                      margin=dict(l=150))
+    fig.update_traces(textposition='auto', texttemplate='S/ %{x:,.0f}', textfont=dict(size=12))
+    return fig
+
+
+def composicion_monto(total_valor_venta, total_igv):
+    """Dona Valor Venta vs IGV."""
+    descomposicion = pd.DataFrame({
+        'Componente': ['Valor Venta', 'IGV'],
+        'Monto': [total_valor_venta, total_igv]
+    })
+    fig = px.pie(descomposicion, values='Monto', names='Componente',
+                 title=f"<b>COMPOSICIÓN DEL MONTO</b><br>Valor Venta: S/ {total_valor_venta:,.2f}<br>IGV: S/ {total_igv:,.2f}",
+                 color_discrete_map={'Valor Venta': '#1f77b4', 'IGV': '#ff7f0e'},
+                 hole=0.3)
+    fig.update_layout(height=600, showlegend=True, template='plotly_white', font=dict(size=12))
+    fig.update_traces(textposition='auto', texttemplate='<b>%{label}</b><br>S/ %{value:,.0f}<br>(%{percent})',
+                      textfont=dict(size=11))
+    return fig
+
+
+def descomposicion_cartera(df_cartera_comp):
+    """Barras apiladas de Valor Venta e IGV por cartera."""
+    fig = px.bar(df_cartera_comp, x=['VALOR VENTA', 'IGV'], y='CARTERA',
+                 title="<b>DESCOMPOSICIÓN POR CARTERA</b><br>Valor Venta e IGV",
+                 labels={'value': 'Monto (S/)', 'CARTERA': 'Cartera'},
+                 barmode='stack',
+                 color_discrete_map=COLORES_MONTOS,
+                 orientation='h')
+    fig.update_layout(height=600, showlegend=True, template='plotly_white',
+                      font=dict(size=12),
+                      margin=dict(l=150))
+    fig.update_traces(textposition='auto', texttemplate='S/ %{x:,.0f}', textfont=dict(size=11))
+    return fig
+
+
+def top_asesores_monto(df_asesor):
+    """Barras horizontales de los asesores con mayor MONTO."""
+    fig = px.bar(df_asesor, y='ASESOR', x='MONTO',
+                 title="<b>Top 15 Asesores - Monto</b>",
+                 labels={'MONTO': 'Monto (S/)', 'ASESOR': 'Asesor'},
+                 color='MONTO', color_continuous_scale="Blues",
+                 orientation='h')
+    fig.update_layout(height=600, showlegend=False, template='plotly_white',
+                      yaxis={'categoryorder': 'total ascending'},
+                      font=dict(size=11),
+                      margin=dict(l=150))
+    fig.update_traces(textposition='auto', texttemplate='S/ %{x:,.0f}', textfont=dict(size=11))
+    return fig
+
+
+# ============ LÍNEAS DE TIEMPO ============
+
+def lttb(x, y, n):
+    """Posiciones de ``n`` puntos de la serie ``(x, y)`` elegidos con Largest-Triangle-Three-Buckets.
+
+    Conserva el primer y el último punto; del resto, reparte los puntos en
+    ``n - 2`` tramos y de cada uno toma el que forma el triángulo de mayor área
+    con el punto elegido antes y el promedio del tramo siguiente, así la
+    forma de la línea (picos incluidos) se mantiene con muchos menos puntos.
+    """
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype("datetime64[ns]").astype("int64")
+    x = x.astype("float64")
+    y = np.asarray(y, dtype="float64")
+    total = len(x)
+    if n >= total or n < 3:
+        return np.arange(total)
+
+    bordes = np.linspace(1, total - 1, n - 1).astype(int)
+    elegidos = [0]
+    for i in range(n - 2):
+        inicio, fin = bordes[i], bordes[i + 1]
+        siguiente = slice(fin, bordes[i + 2]) if i + 2 < len(bordes) else slice(total - 1, total)
+        x_medio, y_medio = x[siguiente].mean(), y[siguiente].mean()
+        a = elegidos[-1]
+        areas = np.abs((x[a] - x_medio) * (y[inicio:fin] - y[a]) - (x[a] - x[inicio:fin]) * (y_medio - y[a]))
+        elegidos.append(inicio + int(np.argmax(areas)))
+    elegidos.append(total - 1)
+    return np.array(elegidos)
+
+
+def _etiquetas_acotadas(y, formato):
+    # texttemplate por punto: solo MAX_ETIQUETAS puntos repartidos (más el
+    # máximo y el último) muestran el monto
+    if len(y) <= MAX_ETIQUETAS:
+        return formato
+    con_etiqueta = set(np.linspace(0, len(y) - 1, MAX_ETIQUETAS - 2).round().astype(int))
+    con_etiqueta.update([int(np.nanargmax(y)), len(y) - 1])
+    return [formato if i in con_etiqueta else '' for i in range(len(y))]
+
+
+def _linea(x, y, continua=False, **propiedades):
+    # Traza de línea acotada: las series continuas (p.ej. acumulados) se
+    # reducen con LTTB y las largas se dibujan con WebGL y sin marcadores
+    if continua and len(x) > MAX_PUNTOS_LINEA:
+        posiciones = lttb(x, y, MAX_PUNTOS_LINEA)
+        x, y = np.asarray(x)[posiciones], np.asarray(y)[posiciones]
+    if len(x) > UMBRAL_WEBGL:
+        propiedades['mode'] = propiedades['mode'].replace('+markers', '')
+        return go.Scattergl(x=x, y=y, **propiedades)
+    return go.Scatter(x=x, y=y, **propiedades)
+
+
+def _linea_con_area(x, y, nombre, color, relleno, titulo, titulo_y, continua=False, titulo_x='Fecha'):
+    fig = go.Figure()
+    fig.add_trace(_linea(
+        x, y, continua,
+        mode='lines+markers+text',
+        name=nombre,
+        line=dict(color=color, width=3),
+        marker=dict(size=10),
+        texttemplate='S/ %{y:,.0f}',
+        textposition='top center',
+        textfont=dict(size=10),
+        fill='tozeroy',
+        fillcolor=relleno
+    ))
+    # Etiquetas solo en un subconjunto acotado de los puntos enviados
+    fig.update_traces(texttemplate=_etiquetas_acotadas(fig.data[0].y, 'S/ %{y:,.0f}'))
+    fig.update_layout(
+        title=titulo,
+        xaxis_title=titulo_x,
+        yaxis_title=titulo_y,
+        hovermode='x unified',
+        height=550,
+        template='plotly_white',
+        showlegend=False,
+        font=dict(size=11)
+    )
+    return fig
+
+
+def _titulo_x(resolucion):
+    return 'Fecha' if resolucion == "Día" else f'Fecha (inicio de cada {resolucion.lower()})'
+
+
+def monto_diario(df_timeline_agg, periodos):
+    """Línea del MONTO por día (por semana o mes si el rango de fechas es largo)."""
+    serie, resolucion = por_resolucion(df_timeline_agg, 'FECHA_DE_PAGO', ['MONTO'])
+    titulo = TITULOS_RESOLUCION[resolucion]
+    return _linea_con_area(serie['FECHA_DE_PAGO'], serie['MONTO'], titulo,
+                           '#2ca02c', 'rgba(44, 160, 44, 0.3)', f'<b>{titulo} - {periodos}</b>', 'Monto (S/)',
+                           titulo_x=_titulo_x(resolucion))
+
+
+def monto_acumulado(df_timeline_agg, periodos):
+    """Línea del MONTO acumulado por día (reducida con LTTB si tiene muchos puntos)."""
+    return _linea_con_area(df_timeline_agg['FECHA_DE_PAGO'], df_timeline_agg['MONTO_ACUMULADO'], 'Acumulado',
+                           '#d62728', 'rgba(214, 39, 40, 0.3)', f'<b>Monto Acumulado - Progresión {periodos}</b>',
+                           'Monto Acumulado (S/)', continua=True)
+
+
+def monto_semanal(df_semanas):
+    """Barras del MONTO por semana."""
+    fig = px.bar(df_semanas, x='Semana', y='MONTO',
+                 title='<b>Dinero Ingresado por Semana</b>',
+                 labels={'MONTO': 'Monto (S/)', 'Semana': 'Semana'},
+                 color='MONTO', color_continuous_scale='Viridis',
+                 text='MONTO')
+    fig.update_layout(xaxis_tickangle=-45, height=600, template='plotly_white',
+                      font=dict(size=11),
+                      margin=dict(b=100))
+    fig.update_traces(texttemplate='S/ %{value:,.0f}', textposition='auto', textfont=dict(size=12))
+    return fig
+
+
+def composicion_semanal(df_semanas):
+    """Barras agrupadas de Valor Venta e IGV por semana."""
+    fig = px.bar(df_semanas, x='Semana', y=['VALOR VENTA', 'IGV'],
+                 title='<b>Composición por Semana</b><br>Valor Venta e IGV',
+                 labels={'value': 'Monto (S/)', 'Semana': 'Semana'},
+                 barmode='group',
+                 color_discrete_map=COLORES_MONTOS)
+    fig.update_layout(xaxis_tickangle=-45, height=600, template='plotly_white',
+                      font=dict(size=11),
+                      margin=dict(b=100))
+    fig.update_traces(textposition='auto', texttemplate='S/ %{y:,.0f}', textfont=dict(size=11))
+    return fig
+
+
+def analisis_campana(df_campana):
+    """Barras agrupadas de Valor Venta, IGV y MONTO por campaña."""
+    fig = px.bar(df_campana, x='CAMPANA', y=['VALOR VENTA', 'IGV', 'MONTO'],
+                 title="<b>Análisis Financiero por Campaña</b>",
+                 labels={'value': 'Monto (S/)', 'CAMPANA': 'Campaña'},
+                 barmode='group',
+                 color_discrete_map=COLORES_MONTOS)
+    fig.update_layout(xaxis_tickangle=-45, height=700, template='plotly_white',
+                      font=dict(size=12),
+                      margin=dict(t=100, b=100))
+    fig.update_traces(textposition='auto', texttemplate='S/ %{y:,.0f}', textfont=dict(size=14, color='black'))
+    return fig
+
+
+def distribucion_estado(df_estado):
+    """Dona del MONTO por estado de planilla."""
+    fig = px.pie(df_estado, values='MONTO', names='ESTADO_PLANILLA',
+                 title='<b>Distribución de Monto por Estado de Planilla</b>',
+                 color_discrete_sequence=px.colors.qualitative.Set2,
+                 hole=0.3)
+    fig.update_layout(height=600, template='plotly_white', font=dict(size=12))
+    fig.update_traces(textposition='auto', texttemplate='<b>%{label}</b><br>S/ %{value:,.0f}<br>(%{percent})',
+                      textfont=dict(size=11))
+    return fig
+
+
+# ============ DASHBOARD DE PAGOS ============
+
+def barras(df, x, y, titulo, etiquetas, escala, tickangle=None):
+    """Barras verticales de ``y`` por ``x`` coloreadas por valor."""
+    fig = px.bar(df, x=x, y=y, title=titulo, labels=etiquetas,
+                 color=y, color_continuous_scale=escala)
+    if tickangle is not None:
+        fig.update_layout(xaxis_tickangle=tickangle)
+    fig.update_layout(height=400)
+    return fig
+
+
+def proporcion(columna_nombres, nombres, valores, titulo):
+    """Torta con la proporción entre dos montos."""
+    df = pd.DataFrame({columna_nombres: nombres, "Monto": valores})
+    fig = px.pie(df, values="Monto", names=columna_nombres, title=titulo,
+                 color_discrete_sequence=["#1f77b4", "#ff7f0e"])
+    fig.update_layout(height=400)
+    return fig
+
+
+def evolucion_pagos(df, x, series):
+    """Líneas por fecha (o semana/mes si el rango es largo); ``series`` es ``[(columna, nombre, color)]``."""
+    df, resolucion = por_resolucion(df, x, [columna for columna, _, _ in series])
+    fig = go.Figure()
+    for columna, nombre, color in series:
+        fig.add_trace(_linea(
+            df[x],
+            df[columna],
+            mode='lines+markers',
+            name=nombre,
+            line=dict(color=color, width=3)
+        ))
+    fig.update_layout(
+        title='Evolución de Pagos por Fecha' if resolucion == "Día" else f'Evolución de Pagos por {resolucion}',
+        xaxis_title=_titulo_x(resolucion),
+        yaxis_title='Monto (S/)',
+        hovermode='x unified',
+        height=400
+    )
+    return fig
+
+
+def cantidad_por_fecha(df_cantidad):
+    """Barras del número de pagos por fecha (o semana/mes si el rango es largo)."""
+    df_cantidad, resolucion = por_resolucion(df_cantidad, 'Fecha', ['Cantidad'])
+    fig = px.bar(df_cantidad, x='Fecha', y='Cantidad',
+                 title='Cantidad de Pagos por Fecha' if resolucion == "Día" else f'Cantidad de Pagos por {resolucion}',
+                 labels={'Cantidad': 'Número de Pagos', 'Fecha': _titulo_x(resolucion)},
+                 color='Cantidad', color_continuous_scale="Viridis")
+    fig.update_layout(height=350)
+    return fig
+
+
+def comparacion_razon_social(df_razon):
+    """Barras agrupadas de Suma Total y Pago P y G por razón social."""
+    fig = px.bar(df_razon, x='RAZON SOCIAL', y=['Suma Total', 'Pago Planilla y Gastos'],
+                 title="Top 10 - Comparación de Montos por Razón Social",
+                 labels={'value': 'Monto (S/)', 'RAZON SOCIAL': 'Razón Social'},
+                 barmode='group')
+    fig.update_layout(xaxis_tickangle=-45, height=400)
+    return fig
+
+
+# ============ CRUCE PAGOS / CIERRE ============
+
+def pagado_vs_facturado(df_resumen, dimension, etiqueta, titulo):
+    """Barras agrupadas de lo pagado (PAGOS) y lo facturado (CIERRE) por ``dimension``."""
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=df_resumen[dimension], y=df_resumen['PAGADO'], name='Pagado (PAGOS)',
+                         marker_color='#1f77b4'))
+    fig.add_trace(go.Bar(x=df_resumen[dimension], y=df_resumen['FACTURADO'], name='Facturado (CIERRE)',
+                         marker_color='#2ca02c'))
+    fig.update_traces(customdata=df_resumen['DIFERENCIA'],
+                      hovertemplate='%{x}<br>S/ %{y:,.2f}<br>Diferencia: S/ %{customdata:,.2f}<extra></extra>')
+    fig.update_layout(title=titulo, barmode='group', xaxis_title=etiqueta, yaxis_title='Monto (S/)',
+                      xaxis_tickangle=-45, height=450, hovermode='x unified')
+    return fig
@@ -0,0 +1,568 @@
+"""Ingesta tipada de los libros Excel de los dashboards.
+
+Cada libro tiene un esquema declarado (columna -> tipo). Las columnas se
+convierten una sola vez al cargar, a un tipo compacto:
+
+- ``categoria``: dimensiones de agrupación (ASESOR, CARTERA, ...)
+- ``monto``: importes en soles, float64
+- ``fecha``: datetime64
+- ``entero``: identificadores numéricos, Int64 (admite nulos)
+- ``texto``: cadenas libres
+
+Las columnas de ``"nombres"`` (asesor, razón social) se normalizan además a
+un nombre canónico por persona o empresa (ver ``nombres``). El reporte guarda
+cuántas filas tiene cada ortografía (``ortografias``); al juntar bloques o
+meses se suman y se vuelve a elegir el nombre a mostrar con el conjunto.
+
+Cada libro guarda en el reporte (y así en el manifiesto de su caché) un
+``resumen`` con los KPIs de ``"resumen"`` del esquema: montos en céntimos,
+valores distintos, filas y rango de fechas. ``resumen_libros`` lo combina sin
+cargar los datos, para pintar los KPIs antes que el resto de la página.
+
+El DataFrame tipado es lo que se guarda en la caché Parquet, así que los
+dashboards no vuelven a ejecutar ``pd.to_numeric`` ni ``pd.to_datetime``.
+"""
+import hashlib
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from cache_datos import cache_vigente, cargar_con_cache, huella_archivo, parquet_vigente
+from lector_xlsx import iterar_bloques
+from montos import a_centimos, a_soles
+from nombres import (cargar_alias, clave_nombre, combinar_ortografias, nombres_a_mostrar, normalizar_nombres,
+                     renombrar_nombres, ruta_alias, variantes_unificadas, version_alias)
+
+# Subir este número cuando cambie un esquema o la lógica de conversión
+VERSION_INGESTA = 6
+
+# Máximo de valores fallidos que se guardan en el reporte (el conteo es exacto)
+MAX_ERRORES_REPORTE = 1000
+
+MESES = {
+    "ENERO": 1, "FEBRERO": 2, "MARZO": 3, "ABRIL": 4, "MAYO": 5, "JUNIO": 6, "JULIO": 7,
+    "AGOSTO": 8, "SETIEMBRE": 9, "SEPTIEMBRE": 9, "OCTUBRE": 10, "NOVIEMBRE": 11, "DICIEMBRE": 12,
+}
+NOMBRES_MESES = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", "Julio",
+                 "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
+
+# Columna añadida a cada fila con el mes del libro de origen ("2026-01")
+PERIODO = "PERIODO"
+
+# Hash (uint64) del contenido tipado de cada fila; permite detectar filas
+# añadidas, eliminadas o modificadas entre dos versiones de un libro
+HASH_FILA = "_HASH_FILA"
+
+ESQUEMA_PAGOS = {
+    "archivo": "PAGOS ENERO 2026.xlsx",
+    # Un libro por mes: "PAGOS <MES> <AÑO>.xlsx"
+    "patron": r"PAGOS (?P<mes>[A-Z]+) (?P<anio>\d{4})\.xlsx",
+    "hoja": "Hoja1",
+    "descartar_sin": [],
+    # Columnas de nombres que se normalizan (ver nombres.py)
+    "nombres": ["ASESOR", "RAZON SOCIAL"],
+    # KPIs precalculados por libro (ver resumen_libros)
+    "resumen": {"montos": ["PAGO PLANILLA", "PAGO GASTOS", "Suma Total", "Pago Planilla y Gastos"],
+                "distintos": ["CARTERA", "ASESOR"], "fecha": "FECHA_DE_PAGO"},
+    "columnas": {
+        "ASESOR": "categoria",
+        "CARTERA": "categoria",
+        "CAMPAÑA": "categoria",
+        "RAZON SOCIAL": "categoria",
+        "FECHA_DE_PAGO": "fecha",
+        "Fecha de Pago": "fecha",
+        "PAGO PLANILLA": "monto",
+        "PAGO GASTOS": "monto",
+        "Suma Total": "monto",
+        "Pago Planilla y Gastos": "monto",
+    },
+    "requeridas": [
+        "ASESOR", "CARTERA", "FECHA_DE_PAGO", "PAGO PLANILLA", "PAGO GASTOS",
+        "CAMPAÑA", "RAZON SOCIAL", "Fecha de Pago", "Suma Total", "Pago Planilla y Gastos",
+    ],
+}
+
+ESQUEMA_CIERRE_GASTOS = {
+    "archivo": "CIERRE GASTOS ADMINISTRATIVOS ENERO 2026.xlsx",
+    "patron": r"CIERRE GASTOS ADMINISTRATIVOS (?P<mes>[A-Z]+) (?P<anio>\d{4})\.xlsx",
+    "hoja": "Hoja1",
+    # Las filas sin ASESOR son filas de totales del libro
+    "descartar_sin": ["ASESOR"],
+    "nombres": ["ASESOR", "RAZON_SOCIAL"],
+    "resumen": {"montos": ["VALOR VENTA", "IGV", "MONTO"], "distintos": [], "fecha": "FECHA_DE_PAGO"},
+    "columnas": {
+        "ID_OBLIGACION": "entero",
+        "ASESOR": "categoria",
+        "CAMPANA": "categoria",
+        "CARTERA": "categoria",
+        "SUBCARTERA": "categoria",
+        "RUC_DNI": "entero",
+        "RAZON_SOCIAL": "categoria",
+        "OPERACION": "entero",
+        "FECHA_DE_PAGO": "fecha",
+        "VALOR VENTA": "monto",
+        "IGV": "monto",
+        "MONTO": "monto",
+        "ESTADO_PLANILLA": "categoria",
+        "PLANILLAS_PAGADAS": "texto",
+        "PLANILLAS_VIGENTES": "texto",
+        "CORREO_FACTURA": "texto",
+        "NUMERO_FACTURA": "texto",
+    },
+    "requeridas": [
+        "ASESOR", "CAMPANA", "CARTERA", "RAZON_SOCIAL", "FECHA_DE_PAGO",
+        "VALOR VENTA", "IGV", "MONTO", "ESTADO_PLANILLA", "NUMERO_FACTURA",
+    ],
+}
+
+ESQUEMAS = {
+    "pagos": ESQUEMA_PAGOS,
+    "cierre_gastos": ESQUEMA_CIERRE_GASTOS,
+}
+
+
+def _como_texto(serie):
+    # Texto uniforme sin perder los nulos (el Excel mezcla números y cadenas)
+    return serie.map(lambda x: x if pd.isna(x) else str(x).strip()).astype("string")
+
+
+def _convertir(serie, tipo):
+    if tipo == "monto":
+        return pd.to_numeric(serie, errors="coerce").astype("float64")
+    if tipo == "entero":
+        numeros = pd.to_numeric(serie, errors="coerce")
+        # Un identificador con decimales no es un entero válido
+        numeros = numeros.where(numeros.isna() | (numeros % 1 == 0))
+        return numeros.astype("Int64")
+    if tipo == "fecha":
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            return serie
+        return pd.to_datetime(serie, errors="coerce", dayfirst=True)
+    if tipo == "categoria":
+        return _como_texto(serie).astype("category")
+    if tipo == "texto":
+        return _como_texto(serie)
+    raise ValueError(f"Tipo de columna desconocido en el esquema: {tipo}")
+
+
+def _resumir(df, esquema):
+    # KPIs de "resumen" del esquema para df (fechas en ISO, None si no hay)
+    config = esquema.get("resumen", {})
+    # Los nombres se cuentan por su clave: el nombre a mostrar puede cambiar
+    # al juntar bloques o meses
+    nombres = set(esquema.get("nombres", []))
+    fechas = df[config["fecha"]].dropna() if config.get("fecha") in df.columns else pd.Series([], dtype="datetime64[ns]")
+    return {
+        "filas": len(df),
+        "centimos": {col: int(a_centimos(df[col]).sum()) for col in config.get("montos", []) if col in df.columns},
+        "distintos": {col: sorted({clave_nombre(valor) if col in nombres else str(valor)
+                                   for valor in df[col].dropna().unique()})
+                      for col in config.get("distintos", []) if col in df.columns},
+        "fechas": [fechas.min().date().isoformat(), fechas.max().date().isoformat()] if len(fechas) else None,
+    }
+
+
+def combinar_resumenes(resumenes):
+    """Un solo ``resumen`` a partir del de cada bloque o libro (None si falta alguno)."""
+    if not resumenes or any(resumen is None for resumen in resumenes):
+        return None
+    fechas = [resumen["fechas"] for resumen in resumenes if resumen["fechas"]]
+    return {
+        "filas": sum(resumen["filas"] for resumen in resumenes),
+        "centimos": {col: sum(resumen["centimos"][col] for resumen in resumenes) for col in resumenes[0]["centimos"]},
+        "distintos": {col: sorted(set().union(*(resumen["distintos"][col] for resumen in resumenes)))
+                      for col in resumenes[0]["distintos"]},
+        "fechas": [min(inicio for inicio, _ in fechas), max(fin for _, fin in fechas)] if fechas else None,
+    }
+
+
+def kpis_resumen(resumen):
+    """KPIs de un ``resumen``: montos en soles y cantidad de distintos por columna, más ``REGISTROS``."""
+    kpis = {col: a_soles(centimos) for col, centimos in resumen["centimos"].items()}
+    kpis.update({col: len(valores) for col, valores in resumen["distintos"].items()})
+    kpis["REGISTROS"] = resumen["filas"]
+    return kpis
+
+
+def tipar(df, esquema):
+    """Convierte ``df`` según ``esquema`` en una sola pasada.
+
+    Devuelve ``(df_tipado, reporte)``. El reporte indica las columnas del
+    esquema que faltan en el libro, los valores que no se pudieron convertir
+    (no nulos en el Excel, nulos tras la conversión), con su fila de Excel,
+    en ``ortografias`` las filas de cada ortografía de los nombres
+    (``{columna: {clave: {ortografía: filas}}}``), en ``unificados`` las
+    variantes que se funden con otra ortografía o por un alias y se muestran
+    con otro nombre (``{columna: {variante: nombre}}``) y el ``resumen`` de KPIs.
+    """
+    faltantes = [col for col in esquema["columnas"] if col not in df.columns]
+    requeridas_faltantes = [col for col in esquema["requeridas"] if col in faltantes]
+    if requeridas_faltantes:
+        raise ValueError(
+            f"Faltan columnas requeridas en {esquema['archivo']}: {', '.join(requeridas_faltantes)}"
+        )
+
+    descartar_sin = [col for col in esquema["descartar_sin"] if col in df.columns]
+    if descartar_sin:
+        df = df.dropna(subset=descartar_sin)
+
+    df = df.copy()
+    # Índice = posición de la fila de datos en la hoja (también en bloques)
+    errores = []
+    total_errores = 0
+    for col, tipo in esquema["columnas"].items():
+        if col not in df.columns:
+            continue
+        original = df[col]
+        df[col] = _convertir(original, tipo)
+        fallidos = original.notna() & df[col].isna()
+        if fallidos.any():
+            total_errores += int(fallidos.sum())
+            for fila, valor in original[fallidos].head(MAX_ERRORES_REPORTE - len(errores)).items():
+                # +2: encabezado en la fila 1 y filas de Excel numeradas desde 1
+                errores.append({"fila": int(fila) + 2, "columna": col, "valor": str(valor)})
+
+    # El hash usa los nombres tal como vienen: no depende del nombre a mostrar
+    presentes = [col for col in esquema["columnas"] if col in df.columns]
+    df[HASH_FILA] = pd.util.hash_pandas_object(df[presentes], index=False).to_numpy()
+
+    ortografias = {}
+    alias = cargar_alias()
+    for col in esquema.get("nombres", []):
+        if col in df.columns:
+            df[col], ortografias[col] = normalizar_nombres(df[col], alias.get(col))
+
+    reporte = {
+        "filas": len(df),
+        "faltantes": faltantes,
+        "total_errores": total_errores,
+        "errores": errores,
+        "ortografias": ortografias,
+        "unificados": _unificados(ortografias, alias),
+        "resumen": _resumir(df, esquema),
+    }
+    return df.reset_index(drop=True), reporte
+
+
+def _combinar_ortografias(reportes):
+    # Ortografías de varios bloques o libros (en su orden), por columna
+    columnas = dict.fromkeys(col for reporte in reportes for col in reporte.get("ortografias", {}))
+    return {col: combinar_ortografias([reporte["ortografias"][col] for reporte in reportes
+                                       if col in reporte.get("ortografias", {})])
+            for col in columnas}
+
+
+def _unificados(ortografias, alias):
+    unificados = {col: variantes_unificadas(por_clave, alias.get(col)) for col, por_clave in ortografias.items()}
+    return {col: cambios for col, cambios in unificados.items() if cambios}
+
+
+def _renombrar(df, ortografias, alias):
+    # Un solo nombre a mostrar por clave en todo df, según las ortografías del conjunto
+    for col, por_clave in ortografias.items():
+        if col in df.columns:
+            df[col] = renombrar_nombres(df[col], nombres_a_mostrar(por_clave, alias.get(col)), alias.get(col))
+    return df
+
+
+def leer_tipado(ruta, esquema, tamano_bloque=None):
+    """Lee la hoja del esquema en streaming y tipa cada bloque al vuelo.
+
+    Los objetos crudos de un bloque se liberan antes de leer el siguiente, así
+    que la memoria pico queda cerca del tamaño del DataFrame tipado final.
+    Devuelve ``(df, reporte)`` como ``tipar``.
+    """
+    bloques = []
+    parciales = []
+    reporte = {"filas": 0, "faltantes": [], "total_errores": 0, "errores": []}
+    for crudo in iterar_bloques(ruta, esquema["hoja"], tamano_bloque):
+        # Las filas totalmente vacías (p.ej. al final de la hoja) no aportan datos
+        crudo = crudo[crudo.notna().any(axis=1)]
+        tipado, parcial = tipar(crudo, esquema)
+        bloques.append(tipado)
+        reporte["filas"] += parcial["filas"]
+        reporte["faltantes"] = parcial["faltantes"]
+        reporte["total_errores"] += parcial["total_errores"]
+        reporte["errores"].extend(parcial["errores"][:MAX_ERRORES_REPORTE - len(reporte["errores"])])
+        parciales.append({"ortografias": parcial["ortografias"], "resumen": parcial["resumen"]})
+    alias = cargar_alias()
+    reporte["ortografias"] = _combinar_ortografias(parciales)
+    reporte["unificados"] = _unificados(reporte["ortografias"], alias)
+    reporte["resumen"] = combinar_resumenes([parcial["resumen"] for parcial in parciales])
+    return _renombrar(_concatenar(bloques), reporte["ortografias"], alias), reporte
+
+
+def _version_cache(nombre_esquema):
+    # La tabla de alias cambia los datos tipados: invalida la caché Parquet
+    alias = version_alias()
+    return f"ingesta-{VERSION_INGESTA}-{nombre_esquema}" + (f"-alias-{alias}" if alias else "")
+
+
+def _version_datos(manifiesto):
+    # Hash del libro, combinado con el de la tabla de alias si la hay
+    alias = version_alias()
+    if not alias:
+        return manifiesto["sha256"]
+    return hashlib.sha256(f"{manifiesto['sha256']}|{alias}".encode("utf-8")).hexdigest()
+
+
+def cargar_libro(nombre_esquema, directorio=None, archivo=None, tamano_bloque=None):
+    """Carga un libro tipado según el esquema ``nombre_esquema``.
+
+    Si la caché no está vigente, el libro se lee en streaming por bloques de
+    ``tamano_bloque`` filas (ver ``lector_xlsx``).
+
+    Devuelve ``(df, reporte)``; ``reporte["version"]`` es el hash del contenido
+    del libro y sirve como identificador de la versión de los datos.
+    """
+    esquema = ESQUEMAS[nombre_esquema]
+    directorio = Path(directorio) if directorio is not None else Path(__file__).parent
+    ruta = directorio / (archivo or esquema["archivo"])
+
+    df, manifiesto = cargar_con_cache(
+        ruta,
+        hoja=esquema["hoja"],
+        leer=lambda ruta, hoja: leer_tipado(ruta, esquema, tamano_bloque),
+        version=_version_cache(nombre_esquema),
+    )
+    reporte = dict(manifiesto["metadatos"], version=_version_datos(manifiesto))
+    return df, reporte
+
+
+def errores_como_tabla(reporte):
+    """Valores no convertidos del reporte como DataFrame (fila, columna, valor)."""
+    columnas = ["fila", "columna", "valor"]
+    if any("archivo" in error for error in reporte["errores"]):
+        columnas = ["archivo"] + columnas
+    return pd.DataFrame(reporte["errores"], columns=columnas)
+
+
+def unificados_como_tabla(reporte):
+    """Variantes de nombres unificadas del reporte como DataFrame (columna, variante, nombre)."""
+    return pd.DataFrame([(col, variante, nombre) for col, cambios in reporte.get("unificados", {}).items()
+                         for variante, nombre in sorted(cambios.items())],
+                        columns=["columna", "variante", "nombre"])
+
+
+def descubrir_libros(nombre_esquema, directorio=None):
+    """Libros mensuales del esquema en ``directorio`` como lista ``[(periodo, ruta)]``.
+
+    El periodo es un ``pd.Period`` mensual; la lista sale en orden cronológico.
+    """
+    esquema = ESQUEMAS[nombre_esquema]
+    directorio = Path(directorio) if directorio is not None else Path(__file__).parent
+    patron = re.compile(esquema["patron"])
+
+    libros = []
+    for ruta in directorio.glob("*.xlsx"):
+        coincidencia = patron.fullmatch(ruta.name)
+        if coincidencia is None or coincidencia["mes"] not in MESES:
+            continue
+        periodo = pd.Period(year=int(coincidencia["anio"]), month=MESES[coincidencia["mes"]], freq="M")
+        libros.append((periodo, ruta))
+    return sorted(libros)
+
+
+def huella_libros(nombre_esquema, directorio=None):
+    """Huella de todos los libros del esquema (y de la tabla de alias), para usar como clave de st.cache_data."""
+    huella = tuple(huella_archivo(ruta) for _, ruta in descubrir_libros(nombre_esquema, directorio))
+    alias = ruta_alias()
+    return huella + (huella_archivo(alias),) if alias is not None else huella
+
+
+def describir_periodos(periodos):
+    """Texto para títulos: ``Enero 2026``, ``Enero - Marzo 2026`` o ``Diciembre 2025 - Enero 2026``."""
+    if len(periodos) == 0:
+        return ""
+    inicio, fin = min(periodos), max(periodos)
+    if inicio == fin:
+        return f"{NOMBRES_MESES[inicio.month - 1]} {inicio.year}"
+    if inicio.year == fin.year:
+        return f"{NOMBRES_MESES[inicio.month - 1]} - {NOMBRES_MESES[fin.month - 1]} {fin.year}"
+    return f"{NOMBRES_MESES[inicio.month - 1]} {inicio.year} - {NOMBRES_MESES[fin.month - 1]} {fin.year}"
+
+
+def _concatenar(frames):
+    # pd.concat convierte a object las categorías que difieren entre meses:
+    # se unifican antes para conservar el tipo category
+    frames = [df.copy() for df in frames]
+    for col in frames[0].columns:
+        if all(isinstance(df[col].dtype, pd.CategoricalDtype) for df in frames if col in df.columns):
+            # Un libro recién parseado y uno leído del Parquet pueden traer las
+            # categorías con distinto tipo de texto ("string" / "str")
+            tipo = frames[0][col].cat.categories.dtype
+            for df in frames:
+                if col in df.columns and df[col].cat.categories.dtype != tipo:
+                    df[col] = df[col].cat.rename_categories(df[col].cat.categories.astype(tipo))
+            categorias = union_categoricals([df[col] for df in frames if col in df.columns]).categories
+            for df in frames:
+                if col in df.columns:
+                    df[col] = df[col].cat.set_categories(categorias)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _libros_o_error(nombre_esquema, directorio):
+    libros = descubrir_libros(nombre_esquema, directorio)
+    if not libros:
+        raise FileNotFoundError(
+            f"No se encontraron libros con el patrón '{ESQUEMAS[nombre_esquema]['patron']}' "
+            f"en {directorio or Path(__file__).parent}"
+        )
+    return libros
+
+
+def _reporte_periodos(libros, reportes):
+    # Reporte conjunto de los libros [(periodo, ruta)] a partir del de cada uno
+    errores = [dict(error, archivo=ruta.name) for _, ruta in libros for error in reportes[ruta]["errores"]]
+    versiones = "|".join(reportes[ruta]["version"] for _, ruta in libros)
+    ortografias = _combinar_ortografias([reportes[ruta] for _, ruta in libros])
+    return {
+        "periodos": [str(p) for p, _ in libros],
+        "faltantes": sorted({col for ruta in reportes for col in reportes[ruta]["faltantes"]}),
+        "total_errores": sum(reportes[ruta]["total_errores"] for ruta in reportes),
+        "errores": errores[:MAX_ERRORES_REPORTE],
+        "unificados": _unificados(ortografias, cargar_alias()),
+        "resumen": combinar_resumenes([reportes[ruta].get("resumen") for _, ruta in libros]),
+        "version": hashlib.sha256(versiones.encode("utf-8")).hexdigest(),
+    }
+
+
+def cargar_periodos(nombre_esquema, directorio=None, max_procesos=None, tamano_bloque=None):
+    """Carga y concatena todos los libros mensuales del esquema.
+
+    Los libros con caché vigente se leen del Parquet; los nuevos o modificados se
+    parsean en paralelo en un pool de procesos (openpyxl es CPU y GIL). Cada fila
+    lleva la columna ``PERIODO`` ("2026-01") con el mes de su libro.
+
+    Devuelve ``(df, reporte)`` como ``cargar_libro``; el reporte añade
+    ``periodos`` y los errores incluyen el ``archivo`` de origen.
+    """
+    esquema = ESQUEMAS[nombre_esquema]
+    libros = _libros_o_error(nombre_esquema, directorio)
+
+    pendientes = [ruta for _, ruta in libros
+                  if not cache_vigente(ruta, esquema["hoja"], _version_cache(nombre_esquema))]
+    resultados = {}
+    if len(pendientes) > 1:
+        with ProcessPoolExecutor(max_workers=max_procesos) as pool:
+            futuros = {ruta: pool.submit(cargar_libro, nombre_esquema, ruta.parent, ruta.name, tamano_bloque) for ruta in pendientes}
+            resultados = {ruta: futuro.result() for ruta, futuro in futuros.items()}
+    for _, ruta in libros:
+        if ruta not in resultados:
+            resultados[ruta] = cargar_libro(nombre_esquema, ruta.parent, ruta.name, tamano_bloque)
+
+    frames = [resultados[ruta][0].assign(**{PERIODO: str(periodo)}) for periodo, ruta in libros]
+    df = _concatenar(frames)
+    df[PERIODO] = pd.Categorical(df[PERIODO], categories=[str(p) for p, _ in libros], ordered=True)
+    # Cada libro trae el nombre a mostrar según sus propias filas: se elige de nuevo con todos los meses
+    reportes = {ruta: resultados[ruta][1] for _, ruta in libros}
+    _renombrar(df, _combinar_ortografias([reportes[ruta] for _, ruta in libros]), cargar_alias())
+
+    reporte = dict(filas=len(df), **_reporte_periodos(libros, reportes))
+    return df, reporte
+
+
+def resumen_libros(nombre_esquema, directorio=None):
+    """``resumen`` de todos los libros del esquema leído de los manifiestos de su caché, sin cargar los datos.
+
+    None si no hay libros o alguno no tiene la caché vigente (nuevo o modificado).
+    """
+    esquema = ESQUEMAS[nombre_esquema]
+    version = _version_cache(nombre_esquema)
+    resumenes = []
+    for _, ruta in descubrir_libros(nombre_esquema, directorio):
+        _, manifiesto = parquet_vigente(ruta, esquema["hoja"], version)
+        if manifiesto is None:
+            return None
+        resumenes.append(manifiesto["metadatos"].get("resumen"))
+    return combinar_resumenes(resumenes)
+
+
+def _cachear_libro(nombre_esquema, directorio, archivo, tamano_bloque):
+    # Parsea el libro para dejar su caché Parquet; solo el reporte vuelve del pool
+    return cargar_libro(nombre_esquema, directorio, archivo, tamano_bloque)[1]
+
+
+def preparar_cache(nombre_esquema, directorio=None, max_procesos=None, tamano_bloque=None):
+    """Deja vigente la caché Parquet de todos los libros del esquema sin cargarlos juntos en memoria.
+
+    Los libros nuevos o modificados se parsean (en paralelo si son varios) y
+    se liberan al escribir su Parquet. Devuelve ``(archivos, reporte)``:
+    ``archivos`` es ``[(periodo, ruta del Parquet, renombres)]`` en orden
+    cronológico y ``reporte`` es como el de ``cargar_periodos`` sin ``filas``
+    (la misma ``version``, así que las cachés por versión sirven para ambos
+    caminos). ``renombres`` es ``{columna: {nombre en el Parquet: nombre a
+    mostrar}}`` de los nombres que el libro muestra distinto que el conjunto
+    de los meses (como los renombra ``cargar_periodos``).
+    """
+    esquema = ESQUEMAS[nombre_esquema]
+    version = _version_cache(nombre_esquema)
+    libros = _libros_o_error(nombre_esquema, directorio)
+
+    pendientes = [ruta for _, ruta in libros if not cache_vigente(ruta, esquema["hoja"], version)]
+    if len(pendientes) > 1:
+        with ProcessPoolExecutor(max_workers=max_procesos) as pool:
+            list(pool.map(_cachear_libro, *zip(*[(nombre_esquema, ruta.parent, ruta.name, tamano_bloque)
+                                                 for ruta in pendientes])))
+    elif pendientes:
+        _cachear_libro(nombre_esquema, pendientes[0].parent, pendientes[0].name, tamano_bloque)
+
+    parquets = {}
+    reportes = {}
+    for _, ruta in libros:
+        parquets[ruta], manifiesto = parquet_vigente(ruta, esquema["hoja"], version)
+        if parquets[ruta] is None:
+            raise OSError(f"No se pudo escribir la caché Parquet de {ruta.name} (revisa DASHBOARD_CACHE_DIR)")
+        reportes[ruta] = dict(manifiesto["metadatos"], version=_version_datos(manifiesto))
+    ortografias = _combinar_ortografias([reportes[ruta] for _, ruta in libros])
+    alias = cargar_alias()
+    archivos = [(periodo, parquets[ruta], _renombres(reportes[ruta].get("ortografias", {}), ortografias, alias))
+                for periodo, ruta in libros]
+    return archivos, _reporte_periodos(libros, reportes)
+
+
+def _renombres(propias, comunes, alias):
+    # {columna: {nombre del libro: nombre del conjunto}} de los nombres que cambian
+    renombres = {}
+    for col, por_clave in propias.items():
+        del_libro = nombres_a_mostrar(por_clave, alias.get(col))
+        del_conjunto = nombres_a_mostrar(comunes[col], alias.get(col))
+        cambios = {nombre: del_conjunto[clave] for clave, nombre in del_libro.items() if nombre != del_conjunto[clave]}
+        if cambios:
+            renombres[col] = cambios
+    return renombres
+
+
+def huella_filas(df, columnas):
+    """Lo que ``calcular_delta`` necesita de una versión de los datos, sin conservar el DataFrame.
+
+    Devuelve ``{"conteos", "filas"}``: cuántas filas hay de cada ``HASH_FILA``
+    y una fila por hash con ``columnas`` (las filas con el mismo hash son
+    iguales). ``filas`` es una copia y mantiene las categorías de ``df``.
+    """
+    unicas = ~df[HASH_FILA].duplicated().to_numpy()
+    return {
+        "conteos": df[HASH_FILA].value_counts(),
+        "filas": df.loc[unicas, [HASH_FILA] + list(columnas)].set_index(HASH_FILA),
+    }
+
+
+def _repetir(filas, conteos):
+    # Filas de cada hash de conteos, tantas veces como indique el conteo
+    return filas.loc[conteos.index.repeat(conteos.to_numpy())].reset_index()
+
+
+def calcular_delta(anterior, nuevo):
+    """Filas añadidas y eliminadas entre dos versiones de los datos (cada una como ``huella_filas``).
+
+    Compara por ``HASH_FILA`` respetando duplicados: una fila modificada aparece
+    como eliminada (versión anterior) y añadida (versión nueva). Devuelve
+    ``(añadidas, eliminadas)`` con ``HASH_FILA`` y las columnas de las huellas.
+    """
+    diferencia = nuevo["conteos"].sub(anterior["conteos"], fill_value=0)
+    añadir = diferencia[diferencia > 0].astype("int64")
+    quitar = (-diferencia[diferencia < 0]).astype("int64")
+    return _repetir(nuevo["filas"], añadir), _repetir(anterior["filas"], quitar)
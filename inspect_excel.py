@@ -1,8 +1,101 @@
+"""Inspección rápida de un libro Excel antes de subirlo a los dashboards.
+
+Lee solo el encabezado y las primeras filas de cada hoja (en streaming), muestra
+las dimensiones de las hojas, el tipo inferido, nulos y cardinalidad de cada
+columna sobre la muestra, y valida las columnas que exige cada dashboard.
+
+Uso:
+    python inspect_excel.py ["CIERRE GASTOS ADMINISTRATIVOS ENERO 2026.xlsx"] [--filas 1000]
+        [--hoja Hoja1] [--esquema cierre_gastos|pagos] [--mostrar 5]
+
+Termina con código 1 si faltan columnas requeridas (sirve como control previo a la subida).
+"""
+import argparse
+import re
+import sys
+
+import openpyxl
 import pandas as pd
 
-df = pd.read_excel('CIERRE GASTOS ADMINISTRATIVOS ENERO 2026.xlsx', sheet_name='Hoja1')
-print('COLUMNAS DISPONIBLES:')
-print(df.columns.tolist())
-print(f'\n\nPRIMERAS 5 FILAS COMPLETAS:')
-print(df.head(5))
+from ingesta import ESQUEMAS
+from lector_xlsx import iterar_bloques
+
+ARCHIVO_POR_DEFECTO = "CIERRE GASTOS ADMINISTRATIVOS ENERO 2026.xlsx"
+
+
+def dimensiones_hojas(ruta):
+    """``[(hoja, filas, columnas)]`` según la dimensión declarada en el libro (sin leer celdas)."""
+    libro = openpyxl.load_workbook(ruta, read_only=True, data_only=True, keep_links=False)
+    try:
+        return [(hoja.title, hoja.max_row, hoja.max_column) for hoja in libro.worksheets]
+    finally:
+        libro.close()
+
+
+def perfil_columnas(muestra):
+    """Tipo inferido, nulos y cardinalidad de cada columna de la muestra."""
+    filas = []
+    for col in muestra.columns:
+        serie = muestra[col]
+        filas.append({
+            "columna": col,
+            "tipo": pd.api.types.infer_dtype(serie, skipna=True),
+            "nulos": int(serie.isna().sum()),
+            "distintos": int(serie.nunique(dropna=True)),
+            "ejemplo": serie.dropna().iloc[0] if serie.notna().any() else None,
+        })
+    return pd.DataFrame(filas)
+
+
+def esquemas_aplicables(ruta, nombre_esquema=None):
+    """Esquemas contra los que validar: el indicado, el que coincide con el nombre del archivo o todos."""
+    if nombre_esquema:
+        return [nombre_esquema]
+    nombre_archivo = re.split(r"[\\/]", str(ruta))[-1]
+    coincidentes = [nombre for nombre, esquema in ESQUEMAS.items() if re.fullmatch(esquema["patron"], nombre_archivo)]
+    return coincidentes or list(ESQUEMAS)
+
+
+def validar_columnas(columnas, nombre_esquema):
+    """Columnas requeridas por el esquema que no están en el libro."""
+    return [col for col in ESQUEMAS[nombre_esquema]["requeridas"] if col not in columnas]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspección rápida de un libro Excel de pagos/gastos.")
+    parser.add_argument("ruta", nargs="?", default=ARCHIVO_POR_DEFECTO, help="Ruta del libro .xlsx")
+    parser.add_argument("--hoja", default=None, help="Hoja a perfilar (por defecto, la del esquema o Hoja1)")
+    parser.add_argument("--filas", type=int, default=1000, help="Filas de muestra para inferir tipos (por defecto 1000)")
+    parser.add_argument("--mostrar", type=int, default=5, help="Filas a imprimir (por defecto 5)")
+    parser.add_argument("--esquema", choices=sorted(ESQUEMAS), default=None,
+                        help="Esquema a validar (por defecto se deduce del nombre del archivo)")
+    args = parser.parse_args(argv)
+
+    print("HOJAS:")
+    for hoja, filas, columnas in dimensiones_hojas(args.ruta):
+        print(f"  {hoja}: {filas if filas is not None else '?'} filas x {columnas if columnas is not None else '?'} columnas")
+
+    esquemas = esquemas_aplicables(args.ruta, args.esquema)
+    hoja = args.hoja or ESQUEMAS[esquemas[0]]["hoja"]
+    muestra = next(iterar_bloques(args.ruta, hoja=hoja, tamano_bloque=args.filas, max_filas=args.filas)).infer_objects()
+
+    print(f"\nCOLUMNAS DISPONIBLES ({hoja}, muestra de {len(muestra)} filas):")
+    with pd.option_context("display.max_rows", None, "display.width", 200, "display.max_colwidth", 40):
+        print(perfil_columnas(muestra).to_string(index=False))
+        print(f"\nPRIMERAS {args.mostrar} FILAS COMPLETAS:")
+        print(muestra.head(args.mostrar))
+
+    print("\nVALIDACIÓN:")
+    valido = False
+    for nombre in esquemas:
+        faltantes = validar_columnas(muestra.columns, nombre)
+        if faltantes:
+            print(f"  ✗ {nombre}: faltan {', '.join(faltantes)}")
+        else:
+            print(f"  ✓ {nombre}: todas las columnas requeridas están presentes")
+            valido = True
+    return 0 if valido else 1
+
 
+if __name__ == "__main__":
+    sys.exit(main())
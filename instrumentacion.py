@@ -0,0 +1,261 @@
+"""Perfil opcional de cada rerun de los dashboards.
+
+Se activa con ``DASHBOARD_PERFIL=1`` o con ``?perfil=1`` en la URL. Cada
+sección con nombre (carga, KPIs, gráficos, tablas, exportación) se mide con
+``with seccion("nombre"):`` y anota su tiempo, el tamaño de lo que se envía
+al navegador (``anotar_carga``) y si su caché acertó o falló
+(``marcar_fallo``, llamado desde el código que solo corre en un fallo).
+
+``panel()`` muestra el desglose del rerun en la barra lateral, con los
+últimos reruns de la sesión y un botón para descargar las trazas. Con
+``DASHBOARD_TRAZAS=<carpeta>`` cada rerun se añade además como una línea JSON
+a ``<carpeta>/<pagina>.jsonl``.
+
+Desactivado, ``seccion`` devuelve un contexto vacío y no se mide nada.
+"""
+import copy
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+# Perfil siempre activo (DASHBOARD_PERFIL=1); si no, se pide con ?perfil=1
+ACTIVO_POR_ENTORNO = os.environ.get("DASHBOARD_PERFIL", "") not in ("", "0")
+
+# Carpeta donde se añade una línea JSON por rerun; None para no escribir trazas
+DIRECTORIO_TRAZAS = os.environ.get("DASHBOARD_TRAZAS")
+
+# Reruns de la sesión que se conservan para el panel y la descarga
+RERUNS_CONSERVADOS = 20
+
+# Perfil del rerun en curso en este hilo (cada sesión ejecuta su script en su hilo)
+_local = threading.local()
+
+
+def tamano_carga(valor):
+    """Bytes aproximados que ``valor`` ocupa al enviarse al navegador."""
+    if isinstance(valor, pd.DataFrame):
+        return pa.Table.from_pandas(valor).nbytes
+    if hasattr(valor, "to_json"):
+        # Figuras de Plotly: st.plotly_chart envía su JSON
+        return len(valor.to_json())
+    if isinstance(valor, (bytes, str)):
+        return len(valor)
+    return None
+
+
+class _Medicion:
+    def __init__(self, perfil, nombre, nivel):
+        self.perfil = perfil
+        self.registro = {"seccion": nombre, "nivel": nivel, "ms": None, "bytes": None, "cache": None}
+        self._cargas = []
+
+    def __enter__(self):
+        self.perfil._abiertas.append(self)
+        self._inicio = time.perf_counter()
+        self.registro["inicio_ms"] = round((self._inicio - self.perfil.inicio) * 1000, 2)
+        return self
+
+    def __exit__(self, *exc):
+        self.registro["ms"] = round((time.perf_counter() - self._inicio) * 1000, 2)
+        self.perfil._abiertas.remove(self)
+        # El tamaño se mide fuera del tiempo de la sección
+        tamanos = [t for t in map(tamano_carga, self._cargas) if t is not None]
+        if tamanos:
+            self.registro["bytes"] = sum(tamanos)
+        if exc[0] is not None:
+            self.registro["error"] = exc[0].__name__
+
+    def carga(self, valor):
+        """Anota ``valor`` como enviado al navegador por esta sección."""
+        self._cargas.append(valor)
+
+
+class _SinMedicion:
+    # Contexto vacío cuando el perfil está desactivado
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def carga(self, valor):
+        pass
+
+
+_SIN_MEDICION = _SinMedicion()
+
+
+class Perfil:
+    """Secciones medidas de un rerun de ``pagina``."""
+
+    def __init__(self, pagina):
+        self.pagina = pagina
+        self.inicio = time.perf_counter()
+        self.fecha = datetime.now().isoformat(timespec="milliseconds")
+        self.secciones = []
+        self._abiertas = []
+
+    def seccion(self, nombre):
+        medicion = _Medicion(self, nombre, len(self._abiertas))
+        self.secciones.append(medicion.registro)
+        return medicion
+
+    def total_ms(self):
+        return round((time.perf_counter() - self.inicio) * 1000, 2)
+
+    def traza(self):
+        return {"pagina": self.pagina, "fecha": self.fecha, "total_ms": self.total_ms(), "secciones": self.secciones}
+
+
+def _activo():
+    if ACTIVO_POR_ENTORNO:
+        return True
+    return st.query_params.get("perfil", "0") not in ("", "0")
+
+
+def iniciar(pagina):
+    """Empieza el perfil del rerun (al principio del script); devuelve el Perfil o None si está desactivado."""
+    _local.perfil = Perfil(pagina) if _activo() else None
+    return _local.perfil
+
+
+def perfil_actual():
+    """Perfil del rerun en curso en este hilo, o None."""
+    return getattr(_local, "perfil", None)
+
+
+def seccion(nombre):
+    """Contexto que mide la sección ``nombre`` del rerun; sin perfil activo no hace nada."""
+    perfil = perfil_actual()
+    return perfil.seccion(nombre) if perfil is not None else _SIN_MEDICION
+
+
+def anotar_carga(valor):
+    """Suma ``valor`` a la carga enviada por la sección abierta más interna."""
+    perfil = perfil_actual()
+    if perfil is not None and perfil._abiertas:
+        perfil._abiertas[-1].carga(valor)
+
+
+def marcar_fallo():
+    """Marca un fallo de caché en la sección abierta más interna.
+
+    Se llama desde el código que solo se ejecuta cuando la caché falla; las
+    secciones de ``seccion_cacheada`` sin fallo cuentan como acierto.
+    """
+    perfil = perfil_actual()
+    if perfil is not None and perfil._abiertas:
+        perfil._abiertas[-1].registro["cache"] = "fallo"
+
+
+def contar_fallo(funcion):
+    """``funcion`` envuelta para marcar un fallo de caché (``marcar_fallo``) cada vez que se ejecute.
+
+    Para pasar como cargador a una caché que solo lo llama cuando no tiene el valor.
+    """
+    def cargar(*args, **kwargs):
+        marcar_fallo()
+        return funcion(*args, **kwargs)
+    return cargar
+
+
+def seccion_cacheada(nombre):
+    """Como ``seccion``, pero la sección cuenta como acierto de caché salvo que se llame a ``marcar_fallo``."""
+    medicion = seccion(nombre)
+    if isinstance(medicion, _Medicion):
+        medicion.registro["cache"] = "acierto"
+    return medicion
+
+
+def cronometrar(nombre, funcion):
+    """``funcion`` envuelta para medirse como sección del rerun actual cuando se llame.
+
+    Sirve para los callables diferidos (p.ej. ``data`` de ``st.download_button``),
+    que Streamlit puede ejecutar en otro hilo después de pintar el panel: la
+    medición queda en la traza del rerun que los creó.
+    """
+    perfil = perfil_actual()
+    if perfil is None:
+        return funcion
+
+    def medida(*args, **kwargs):
+        anterior = perfil_actual()
+        _local.perfil = perfil
+        try:
+            with perfil.seccion(nombre) as medicion:
+                medicion.registro["cache"] = "acierto"
+                resultado = funcion(*args, **kwargs)
+                medicion.carga(resultado)
+            return resultado
+        finally:
+            _local.perfil = anterior
+    return medida
+
+
+def en_otro_hilo(nombre, funcion, cacheada=False):
+    """``funcion`` envuelta para medirse como sección ``nombre`` del rerun actual desde otro hilo.
+
+    Como ``cronometrar``, pero para cálculos que corren a la vez que el script
+    (``progresivo.en_segundo_plano``): la sección lleva sus propias secciones
+    abiertas, así que sus fallos de caché no se mezclan con las del script.
+    Con ``cacheada`` cuenta como acierto salvo ``marcar_fallo``.
+    """
+    perfil = perfil_actual()
+    if perfil is None:
+        return funcion
+
+    def medida(*args, **kwargs):
+        # Copia del perfil que comparte el inicio y la lista de secciones
+        en_hilo = copy.copy(perfil)
+        en_hilo._abiertas = []
+        anterior = perfil_actual()
+        _local.perfil = en_hilo
+        try:
+            with (seccion_cacheada if cacheada else seccion)(nombre):
+                return funcion(*args, **kwargs)
+        finally:
+            _local.perfil = anterior
+    return medida
+
+
+def _escribir_traza(traza):
+    carpeta = Path(DIRECTORIO_TRAZAS)
+    carpeta.mkdir(parents=True, exist_ok=True)
+    with open(carpeta / f"{traza['pagina']}.jsonl", "a", encoding="utf-8") as f:
+        f.write(json.dumps(traza, ensure_ascii=False) + "\n")
+
+
+def panel():
+    """Desglose del rerun en la barra lateral (al final del script); no hace nada sin perfil activo."""
+    perfil = perfil_actual()
+    if perfil is None:
+        return
+    traza = perfil.traza()
+    historial = st.session_state.setdefault("_trazas_perfil", deque(maxlen=RERUNS_CONSERVADOS))
+    historial.append(traza)
+    if DIRECTORIO_TRAZAS:
+        _escribir_traza(traza)
+
+    with st.sidebar.expander(f"⏱️ Perfil del rerun: {traza['total_ms']:,.0f} ms"):
+        tabla = pd.DataFrame([{
+            "Sección": "  " * registro["nivel"] + registro["seccion"],
+            "ms": registro["ms"],
+            "%": round(100 * (registro["ms"] or 0) / traza["total_ms"], 1) if traza["total_ms"] else None,
+            "KB": round(registro["bytes"] / 1024, 1) if registro["bytes"] is not None else None,
+            "Caché": registro["cache"] or "",
+        } for registro in traza["secciones"]])
+        if len(tabla):
+            st.dataframe(tabla, hide_index=True)
+        st.caption("Últimos reruns (ms): " + " · ".join(f"{t['total_ms']:,.0f}" for t in historial))
+        st.download_button("📥 Descargar trazas (JSON)",
+                           data=json.dumps(list(historial), ensure_ascii=False, indent=2),
+                           file_name=f"trazas_{perfil.pagina}.json", mime="application/json",
+                           key="descargar_trazas_perfil", on_click="ignore")
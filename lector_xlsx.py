@@ -0,0 +1,72 @@
+"""Lectura en streaming de hojas .xlsx con memoria acotada.
+
+``pd.read_excel`` materializa todas las filas como objetos Python antes de
+construir el DataFrame. Aquí la hoja se recorre con openpyxl en modo
+``read_only`` y se entrega en bloques de ``tamano_bloque`` filas, de modo que
+el llamador puede tipar cada bloque y descartar los objetos crudos antes de
+leer el siguiente.
+"""
+import os
+from itertools import islice
+
+import openpyxl
+import pandas as pd
+
+# Filas por bloque (configurable con DASHBOARD_TAMANO_BLOQUE)
+TAMANO_BLOQUE = int(os.environ.get("DASHBOARD_TAMANO_BLOQUE", 50_000))
+
+
+def _nombres_columnas(encabezado):
+    # Mismo criterio que pd.read_excel para encabezados vacíos
+    return [str(valor) if valor is not None else f"Unnamed: {i}" for i, valor in enumerate(encabezado)]
+
+
+def iterar_bloques(ruta, hoja="Hoja1", tamano_bloque=None, max_filas=None):
+    """Genera DataFrames crudos de hasta ``tamano_bloque`` filas de la hoja.
+
+    El índice de cada bloque es la posición de la fila de datos en la hoja
+    (0 = primera fila tras el encabezado), continuo entre bloques. Siempre se
+    genera al menos un bloque (vacío si la hoja no tiene datos). ``max_filas``
+    corta la lectura tras ese número de filas de datos.
+    """
+    tamano_bloque = tamano_bloque or TAMANO_BLOQUE
+    libro = openpyxl.load_workbook(ruta, read_only=True, data_only=True, keep_links=False)
+    try:
+        if hoja not in libro.sheetnames:
+            raise ValueError(f"La hoja '{hoja}' no existe en {ruta}")
+        filas = libro[hoja].iter_rows(values_only=True)
+        encabezado = next(filas, ())
+        columnas = _nombres_columnas(encabezado)
+        ancho = len(columnas)
+        if max_filas is not None:
+            filas = islice(filas, max_filas)
+
+        inicio = 0
+        emitido = False
+        while True:
+            # Las filas en modo read_only pueden venir más cortas o más largas que el encabezado
+            bloque = [tuple(fila[:ancho]) + (None,) * (ancho - len(fila)) for fila in islice(filas, tamano_bloque)]
+            if not bloque and emitido:
+                break
+            # dtype=object conserva los valores tal cual (sin pasar enteros con nulos a float);
+            # el tipado final lo decide el llamador
+            yield pd.DataFrame(bloque, columns=columnas, index=pd.RangeIndex(inicio, inicio + len(bloque)), dtype=object)
+            emitido = True
+            inicio += len(bloque)
+            if len(bloque) < tamano_bloque:
+                break
+    finally:
+        libro.close()
+
+
+def leer_hoja(ruta, hoja="Hoja1", tamano_bloque=None, max_filas=None):
+    """Hoja completa como DataFrame, leída por bloques y con tipos inferidos.
+
+    Las filas vacías al final de la hoja se descartan, como hace ``pd.read_excel``.
+    """
+    df = pd.concat(list(iterar_bloques(ruta, hoja, tamano_bloque, max_filas))).infer_objects()
+    no_vacias = df.notna().any(axis=1).to_numpy()
+    if not no_vacias.all():
+        ultima = no_vacias.nonzero()[0].max() + 1 if no_vacias.any() else 0
+        df = df.iloc[:ultima]
+    return df
@@ -0,0 +1,66 @@
+"""Montos exactos en céntimos enteros.
+
+Los importes se leen del Excel como float64 (soles), donde ``0.1 + 0.2`` no es
+``0.3`` y el orden de la suma cambia los últimos decimales. Para totales y
+agregados se pasan a céntimos en ``int64``: la suma entera es exacta (y más
+rápida) y solo se vuelve a soles al mostrar.
+
+También incluye la conciliación por fila del CIERRE: ``MONTO`` debe ser
+``VALOR VENTA + IGV`` y el ``IGV`` el 18 % del ``VALOR VENTA``.
+"""
+import numpy as np
+import pandas as pd
+
+# IGV vigente, en por ciento
+TASA_IGV = 18
+
+# Diferencia admitida (en céntimos) por el redondeo del Excel
+TOLERANCIA_CENTIMOS = 1
+
+
+def a_centimos(valores):
+    """Montos en soles (Series o array) como céntimos ``int64``; los nulos cuentan como 0."""
+    soles = np.asarray(valores, dtype="float64")
+    return np.nan_to_num(np.rint(soles * 100)).astype("int64")
+
+
+def a_soles(centimos):
+    """Céntimos enteros (escalar, array o Series) de vuelta a soles."""
+    return centimos / 100
+
+
+def sumar(valores):
+    """Suma exacta de montos en soles (redondeados al céntimo)."""
+    return a_soles(int(a_centimos(valores).sum()))
+
+
+def conciliar(df, monto="MONTO", valor_venta="VALOR VENTA", igv="IGV", tasa=TASA_IGV,
+              tolerancia=TOLERANCIA_CENTIMOS):
+    """Filas de ``df`` cuyo monto no cuadra, con las diferencias en soles.
+
+    Compara en céntimos enteros ``monto`` contra ``valor_venta + igv`` y el
+    ``igv`` contra ``tasa`` % del ``valor_venta`` (redondeado al céntimo), con
+    ``tolerancia`` céntimos de margen. Las filas con algún monto nulo no se
+    comparan. Devuelve las filas que fallan con las columnas
+    ``DIFERENCIA_MONTO``, ``IGV_ESPERADO`` y ``DIFERENCIA_IGV`` añadidas.
+
+    ``df`` puede ser una ``motor_sql.Vista``: la comparación se hace en SQL.
+    """
+    if not isinstance(df, pd.DataFrame):
+        return df.conciliar(monto, valor_venta, igv, tasa, tolerancia)
+    completas = df[[monto, valor_venta, igv]].notna().all(axis=1).to_numpy()
+    monto_c = a_centimos(df[monto])
+    venta_c = a_centimos(df[valor_venta])
+    igv_c = a_centimos(df[igv])
+
+    diferencia_monto = monto_c - (venta_c + igv_c)
+    # Redondeo al céntimo más cercano (mitades hacia arriba) en aritmética entera
+    igv_esperado = (venta_c * tasa + 50) // 100
+    diferencia_igv = igv_c - igv_esperado
+
+    fallan = completas & ((np.abs(diferencia_monto) > tolerancia) | (np.abs(diferencia_igv) > tolerancia))
+    resultado = df[fallan].copy()
+    resultado["DIFERENCIA_MONTO"] = a_soles(diferencia_monto[fallan])
+    resultado["IGV_ESPERADO"] = a_soles(igv_esperado[fallan])
+    resultado["DIFERENCIA_IGV"] = a_soles(diferencia_igv[fallan])
+    return resultado
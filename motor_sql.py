@@ -0,0 +1,268 @@
+"""Motor de consultas DuckDB sobre la caché Parquet de los libros.
+
+Con ``DASHBOARD_MOTOR=duckdb`` los dashboards no concatenan todos los meses en
+un DataFrame: cada libro mensual queda en su Parquet de ``cache_datos`` y una
+vista SQL (``datos``) los une con su ``PERIODO``. Filtros, sumas y ``GROUP BY``
+se resuelven en DuckDB (vectorizado, en el proceso, sin red), que lee solo las
+columnas que pide cada consulta; a pandas solo llegan los resultados
+agregados y la página visible de la tabla.
+
+``Vista`` expone las mismas operaciones que ``agregados`` hace sobre un
+DataFrame (cubo, sumas por dimensión o fecha, conteos, resumen, conciliación
+y filas): las funciones de ``agregados`` y ``montos`` reciben una vista en
+lugar del DataFrame y le delegan la consulta. Las sumas se hacen en céntimos
+enteros redondeados como ``montos.a_centimos`` (mitades al par), así que los
+resultados coinciden con los del camino pandas.
+
+``duckdb`` solo hace falta en este modo (``pip install duckdb``).
+"""
+import os
+import threading
+
+import pandas as pd
+
+from ingesta import HASH_FILA, PERIODO, preparar_cache
+from montos import TASA_IGV, TOLERANCIA_CENTIMOS, a_soles
+
+# Motor de los dashboards: "pandas" (DataFrame en memoria) o "duckdb"
+MOTOR = os.environ.get("DASHBOARD_MOTOR", "pandas").lower()
+
+# Memoria máxima de DuckDB; lo que no cabe se resuelve en disco
+MEMORIA_DUCKDB = os.environ.get("DASHBOARD_DUCKDB_MEMORIA", "1GB")
+
+# Columna interna de la vista con la posición de cada fila en los datos
+# concatenados (la misma que el índice del DataFrame de cargar_periodos)
+FILA = "_FILA"
+
+
+def usar_duckdb():
+    """True si los dashboards deben consultar con DuckDB en lugar de pandas."""
+    return MOTOR == "duckdb"
+
+
+def _id(columna):
+    # Identificador SQL entre comillas (las columnas tienen espacios y eñes)
+    return '"' + str(columna).replace('"', '""') + '"'
+
+
+def _centimos(columna):
+    # Igual que montos.a_centimos: redondeo al céntimo con mitades al par
+    return f"CAST(round_even({_id(columna)} * 100, 0) AS BIGINT)"
+
+
+def _suma_centimos(columna):
+    return f"CAST(COALESCE(SUM({_centimos(columna)}), 0) AS BIGINT) AS {_id(columna)}"
+
+
+def _literal(texto):
+    return "'" + str(texto).replace("'", "''") + "'"
+
+
+def _reemplazar(renombres):
+    # Cláusula REPLACE que muestra los nombres del libro como en el conjunto
+    # de los meses (ver ingesta.preparar_cache); vacía si no cambia ninguno
+    if not renombres:
+        return ""
+    columnas = []
+    for col, cambios in renombres.items():
+        casos = " ".join(f"WHEN {_literal(de)} THEN {_literal(a)}" for de, a in cambios.items())
+        columnas.append(f"CASE {_id(col)} {casos} ELSE {_id(col)} END AS {_id(col)}")
+    return f" REPLACE ({', '.join(columnas)})"
+
+
+class ConsultasDuckDB:
+    """Conexión DuckDB con la vista ``datos`` de todos los libros del esquema.
+
+    Al crearse deja vigente la caché Parquet de cada libro (ver
+    ``ingesta.preparar_cache``); ``reporte`` es como el de
+    ``ingesta.cargar_periodos``, con la misma ``version``. Se comparte entre
+    sesiones: cada consulta usa su propio cursor.
+    """
+
+    def __init__(self, nombre_esquema, directorio=None, memoria=None):
+        try:
+            import duckdb
+        except ImportError:
+            raise ImportError("El modo DASHBOARD_MOTOR=duckdb requiere 'duckdb' (pip install duckdb)") from None
+        self.nombre_esquema = nombre_esquema
+        archivos, reporte = preparar_cache(nombre_esquema, directorio)
+        self._conexion = duckdb.connect()
+        self._conexion.execute(f"SET memory_limit = {_literal(memoria or MEMORIA_DUCKDB)}")
+        # Un SELECT por libro con su PERIODO; UNION ALL BY NAME admite meses
+        # a los que les falta alguna columna opcional
+        selects = []
+        desplazamiento = 0
+        for periodo, ruta, renombres in archivos:
+            origen = f"read_parquet({_literal(ruta.as_posix())}, file_row_number = true)"
+            selects.append(f"SELECT * EXCLUDE (file_row_number, {_id(HASH_FILA)}){_reemplazar(renombres)}, "
+                           f"{_literal(periodo)} AS {_id(PERIODO)}, file_row_number + {desplazamiento} AS {FILA} "
+                           f"FROM {origen}")
+            # Las filas de cada Parquet están en sus metadatos: contar no lee los datos
+            desplazamiento += self._conexion.execute(f"SELECT COUNT(*) FROM {origen}").fetchone()[0]
+        self._conexion.execute("CREATE VIEW datos AS " + " UNION ALL BY NAME ".join(selects))
+        self.columnas = [col for col in self._conexion.execute("SELECT * FROM datos LIMIT 0").fetchdf().columns
+                         if col != FILA]
+        self._lock = threading.Lock()
+        self._opciones = {}
+        self.reporte = dict(filas=len(self.vista()), **reporte)
+
+    def consultar(self, sql, parametros=()):
+        """Resultado de ``sql`` como DataFrame (con un cursor propio, seguro entre hilos)."""
+        with self._lock:
+            cursor = self._conexion.cursor()
+        try:
+            return cursor.execute(sql, list(parametros)).fetchdf()
+        finally:
+            cursor.close()
+
+    def opciones(self, columnas):
+        """Valores distintos (no nulos, ordenados) de cada columna: ``{columna: [valores]}``.
+
+        Se consultan una vez por columna; los datos de la conexión no cambian.
+        """
+        for col in columnas:
+            if col in self.columnas and col not in self._opciones:
+                self._opciones[col] = self.consultar(f"SELECT DISTINCT {_id(col)} AS v FROM datos "
+                                                     f"WHERE {_id(col)} IS NOT NULL ORDER BY 1")["v"].tolist()
+        return {col: self._opciones[col] for col in columnas if col in self._opciones}
+
+    def extremos(self, columna_fecha):
+        """``(mínimo, máximo)`` de la columna de fecha, o None si no tiene valores."""
+        if columna_fecha not in self.columnas:
+            return None
+        minimo, maximo = self.consultar(
+            f"SELECT MIN({_id(columna_fecha)}) AS a, MAX({_id(columna_fecha)}) AS b FROM datos").iloc[0]
+        return None if pd.isna(minimo) else (pd.Timestamp(minimo), pd.Timestamp(maximo))
+
+    def vista(self, firma=None, columna_fecha=None):
+        """``Vista`` de los datos con los filtros de ``firma`` (ver ``filtros.seleccion_filtros``)."""
+        return Vista(self, firma, columna_fecha)
+
+
+class Vista:
+    """Filas de ``consultas`` que cumplen los filtros de ``firma``, consultadas en SQL.
+
+    ``firma`` es ``(((columna, (valores...)), ...), (inicio, fin) o None)``;
+    el rango es inclusivo y se aplica a ``columna_fecha``.
+    """
+
+    def __init__(self, consultas, firma=None, columna_fecha=None):
+        self.consultas = consultas
+        self.firma = firma
+        condiciones, self._parametros = [], []
+        if firma is not None:
+            activos, rango_fechas = firma
+            for col, valores in activos:
+                condiciones.append(f"{_id(col)} IN ({', '.join('?' * len(valores))})")
+                self._parametros.extend(valores)
+            if rango_fechas is not None and columna_fecha is not None:
+                condiciones.append(f"{_id(columna_fecha)} >= ? AND {_id(columna_fecha)} < ?")
+                self._parametros.extend([pd.Timestamp(rango_fechas[0]),
+                                         pd.Timestamp(rango_fechas[1]) + pd.Timedelta(days=1)])
+        self._donde = " AND ".join(condiciones) or "TRUE"
+
+    @property
+    def columns(self):
+        return pd.Index(self.consultas.columnas)
+
+    def _consultar(self, sql, condicion="TRUE"):
+        # ``sql`` usa {donde} donde van los filtros de la vista
+        return self.consultas.consultar(sql.format(donde=f"({self._donde}) AND ({condicion})"), self._parametros)
+
+    def _filas(self, sql, condicion="TRUE"):
+        # Filas con su posición original como índice, como df.iloc[posiciones]
+        return self._consultar(sql, condicion).set_index(FILA).rename_axis(None)
+
+    def __len__(self):
+        return int(self._consultar("SELECT COUNT(*) AS n FROM datos WHERE {donde}")["n"].iloc[0])
+
+    def construir_cubo(self, dimensiones, montos):
+        """Como ``agregados.construir_cubo`` (montos en céntimos, celdas con nulos incluidas)."""
+        dims = ", ".join(map(_id, dimensiones))
+        sumas = ", ".join(map(_suma_centimos, montos))
+        return self._consultar(f"SELECT {dims}, {sumas}, COUNT(*) AS CANTIDAD FROM datos WHERE {{donde}} "
+                               f"GROUP BY {dims}")
+
+    def sumas_por(self, dimension, columnas, orden=None, limite=None):
+        """Como ``agregados.sumas_por``."""
+        sql = (f"SELECT {_id(dimension)}, {', '.join(map(_suma_centimos, columnas))} FROM datos "
+               f"WHERE {{donde}} GROUP BY 1")
+        if orden is not None:
+            sql += f" ORDER BY {_id(orden)} DESC, 1"
+        if limite is not None:
+            sql += f" LIMIT {int(limite)}"
+        resultado = self._consultar(sql, f"{_id(dimension)} IS NOT NULL")
+        for col in columnas:
+            resultado[col] = a_soles(resultado[col])
+        return resultado
+
+    def distintos_por(self, dimension, columna, nombre, limite=None):
+        """Como ``agregados.distintos_por``."""
+        sql = (f"SELECT {_id(dimension)}, COUNT(DISTINCT {_id(columna)}) AS {_id(nombre)} FROM datos "
+               f"WHERE {{donde}} GROUP BY 1 ORDER BY 2 DESC, 1")
+        if limite is not None:
+            sql += f" LIMIT {int(limite)}"
+        return self._consultar(sql, f"{_id(dimension)} IS NOT NULL")
+
+    def sumas_por_fecha(self, columna_fecha, columnas):
+        """Como ``agregados.sumas_por_fecha``."""
+        sumas = ", ".join(f"CAST(COALESCE(SUM({_centimos(col)}), 0) AS BIGINT) AS {_id(nombre)}"
+                          for col, nombre in columnas.items())
+        resultado = self._consultar(f"SELECT {_id(columna_fecha)} AS Fecha, {sumas} FROM datos WHERE {{donde}} "
+                                    f"GROUP BY 1 ORDER BY 1", f"{_id(columna_fecha)} IS NOT NULL")
+        for nombre in columnas.values():
+            resultado[nombre] = a_soles(resultado[nombre])
+        return resultado
+
+    def cantidad_por_fecha(self, columna_fecha):
+        """Como ``agregados.cantidad_por_fecha``."""
+        return self._consultar(f"SELECT {_id(columna_fecha)} AS Fecha, COUNT(*) AS Cantidad FROM datos "
+                               f"WHERE {{donde}} GROUP BY 1 ORDER BY 1", f"{_id(columna_fecha)} IS NOT NULL")
+
+    def sumas(self, columnas):
+        """Suma exacta de cada monto: ``{columna: soles}``."""
+        fila = self._consultar(f"SELECT {', '.join(map(_suma_centimos, columnas))} FROM datos WHERE {{donde}}")
+        return {col: a_soles(int(fila[col].iloc[0])) for col in columnas}
+
+    def distintos(self, columna):
+        """Número de valores distintos (no nulos) de ``columna``."""
+        return int(self._consultar(f"SELECT COUNT(DISTINCT {_id(columna)}) AS n FROM datos "
+                                   f"WHERE {{donde}}")["n"].iloc[0])
+
+    def describir(self, columnas):
+        """Como ``DataFrame.describe()`` de las columnas numéricas ``columnas``."""
+        partes = []
+        for col in columnas:
+            c = _id(col)
+            partes.append(f"COUNT({c}), AVG({c}), STDDEV_SAMP({c}), MIN({c}), QUANTILE_CONT({c}, 0.25), "
+                          f"QUANTILE_CONT({c}, 0.5), QUANTILE_CONT({c}, 0.75), MAX({c})")
+        fila = self._consultar(f"SELECT {', '.join(partes)} FROM datos WHERE {{donde}}").iloc[0].to_numpy()
+        estadisticos = ["count", "mean", "std", "min", "25%", "50%", "75%", "max"]
+        return pd.DataFrame(fila.reshape(len(columnas), len(estadisticos)).T.astype("float64"),
+                            index=estadisticos, columns=columnas)
+
+    def conciliar(self, monto="MONTO", valor_venta="VALOR VENTA", igv="IGV", tasa=TASA_IGV,
+                  tolerancia=TOLERANCIA_CENTIMOS):
+        """Como ``montos.conciliar``: filas que no cuadran, con las diferencias en soles."""
+        igv_esperado = f"CAST(floor(({_centimos(valor_venta)} * {int(tasa)} + 50) / 100) AS BIGINT)"
+        diferencia_monto = f"({_centimos(monto)} - ({_centimos(valor_venta)} + {_centimos(igv)}))"
+        diferencia_igv = f"({_centimos(igv)} - {igv_esperado})"
+        completas = " AND ".join(f"{_id(col)} IS NOT NULL" for col in (monto, valor_venta, igv))
+        return self._filas(
+            f"SELECT *, {diferencia_monto} / 100 AS DIFERENCIA_MONTO, "
+            f"{igv_esperado} / 100 AS IGV_ESPERADO, {diferencia_igv} / 100 AS DIFERENCIA_IGV "
+            f"FROM datos WHERE {{donde}} ORDER BY {FILA}",
+            f"{completas} AND (abs({diferencia_monto}) > {int(tolerancia)} OR abs({diferencia_igv}) > {int(tolerancia)})")
+
+    def filas(self, columnas, orden=None, ascendente=True, limite=None, desplazamiento=0):
+        """Filas de la vista con ``columnas``, ordenadas por ``orden`` (o en el orden original).
+
+        Con ``limite`` solo se traen esas filas a partir de ``desplazamiento``.
+        """
+        orden_sql = FILA
+        if orden is not None:
+            orden_sql = f"{_id(orden)} {'ASC' if ascendente else 'DESC'} NULLS LAST, {FILA}"
+        sql = f"SELECT {FILA}, {', '.join(map(_id, columnas))} FROM datos WHERE {{donde}} ORDER BY {orden_sql}"
+        if limite is not None:
+            sql += f" LIMIT {int(limite)} OFFSET {int(desplazamiento)}"
+        return self._filas(sql)
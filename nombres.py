@@ -0,0 +1,183 @@
+"""Nombres canónicos de asesores y razones sociales.
+
+Los libros escriben un mismo asesor con espacios de más, con o sin tildes o
+con mayúsculas distintas, y cada variante acabaría como una barra aparte y
+un valor más en ``nunique()``. Al ingerir, las columnas de nombres del
+esquema (``"nombres"`` en ``ingesta.ESQUEMAS``) se normalizan una vez por
+categoría, no por fila:
+
+- la clave de un nombre es el texto sin tildes (``NFD``), en minúsculas
+  (``casefold``) y con los espacios colapsados. Solo sirve para agrupar
+  variantes: nunca se muestra;
+- se cuentan las filas de cada ortografía original por clave
+  (``contar_ortografias``) y todas las variantes de una clave se muestran
+  con un solo nombre: el de la tabla de alias o, si no está, la ortografía
+  más frecuente (a igualdad, la que aparece primero), con los espacios
+  colapsados. Los conteos se suman entre bloques y meses
+  (``combinar_ortografias``), así que el nombre a mostrar es el mismo en
+  todos los datos que se cargan juntos.
+
+La columna queda categórica: códigos enteros por fila y las categorías como
+diccionario de nombres a mostrar.
+
+La tabla de alias es opcional: ``alias_nombres.csv`` junto a los scripts (o
+la ruta de ``DASHBOARD_ALIAS``) con las columnas ``COLUMNA``, ``VARIANTE`` y
+``NOMBRE``. Sirve para unir variantes que la normalización no detecta (p.ej.
+un apellido abreviado) o para fijar el nombre a mostrar.
+"""
+import hashlib
+import os
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Tabla de alias por defecto (si existe)
+ARCHIVO_ALIAS = "alias_nombres.csv"
+
+
+def clave_nombre(valor):
+    """Clave de comparación de un nombre: sin tildes, ``casefold`` y espacios colapsados.
+
+    ``NFD`` solo separa las tildes; ``NFKD`` convertiría además signos como
+    ``´`` (``CANTONE´S``) en espacios.
+    """
+    descompuesto = unicodedata.normalize("NFD", str(valor))
+    sin_tildes = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return " ".join(sin_tildes.casefold().split())
+
+
+def _clave_canonica(valor, alias):
+    # Las variantes de un alias comparten la clave de su nombre
+    clave = clave_nombre(valor)
+    return clave_nombre(alias[clave]) if clave in alias else clave
+
+
+def ruta_alias():
+    """Ruta de la tabla de alias vigente, o None si no hay."""
+    ruta = Path(os.environ.get("DASHBOARD_ALIAS") or Path(__file__).parent / ARCHIVO_ALIAS)
+    return ruta if ruta.is_file() else None
+
+
+@lru_cache(maxsize=4)
+def _leer_alias(ruta, mtime_ns):
+    tabla = pd.read_csv(ruta, dtype="string", encoding="utf-8-sig").dropna()
+    alias = {}
+    for columna, variante, nombre in tabla[["COLUMNA", "VARIANTE", "NOMBRE"]].itertuples(index=False):
+        nombre = " ".join(nombre.split())
+        por_columna = alias.setdefault(columna.strip(), {})
+        # El propio nombre y todas sus variantes se muestran como ``nombre``
+        por_columna[clave_nombre(variante)] = nombre
+        por_columna[clave_nombre(nombre)] = nombre
+    return alias
+
+
+def cargar_alias(ruta=None):
+    """Tabla de alias como ``{columna: {clave: nombre}}`` (vacía si no hay tabla)."""
+    ruta = ruta or ruta_alias()
+    if ruta is None:
+        return {}
+    return _leer_alias(str(ruta), Path(ruta).stat().st_mtime_ns)
+
+
+def version_alias(ruta=None):
+    """Hash corto del contenido de la tabla de alias, o "" si no hay tabla.
+
+    Forma parte de la versión de los datos: al cambiar los alias cambian los nombres.
+    """
+    ruta = ruta or ruta_alias()
+    if ruta is None:
+        return ""
+    return hashlib.sha256(Path(ruta).read_bytes()).hexdigest()[:12]
+
+
+def contar_ortografias(serie, alias=None):
+    """Filas de cada ortografía original de ``serie`` por clave: ``{clave: {ortografía: filas}}``.
+
+    ``alias`` es ``{clave: nombre}`` de la columna: las variantes de un alias
+    cuentan bajo la clave de su nombre. Las ortografías de cada clave quedan
+    en el orden en que aparecen en ``serie``; los nombres vacíos se omiten.
+    """
+    alias = alias or {}
+    serie = serie.astype("category")
+    categorias = serie.cat.categories
+    codigos = serie.cat.codes.to_numpy()
+    codigos = codigos[codigos >= 0]
+    filas = np.bincount(codigos, minlength=len(categorias))
+    usados, primeras = np.unique(codigos, return_index=True)
+    ortografias = {}
+    for codigo in usados[np.argsort(primeras, kind="stable")]:
+        original = str(categorias[codigo])
+        clave = _clave_canonica(original, alias)
+        if clave:
+            ortografias.setdefault(clave, {})[original] = int(filas[codigo])
+    return ortografias
+
+
+def combinar_ortografias(lista):
+    """Suma los conteos de ``contar_ortografias`` de varios bloques o meses, en orden."""
+    combinadas = {}
+    for ortografias in lista:
+        for clave, conteos in ortografias.items():
+            destino = combinadas.setdefault(clave, {})
+            for original, filas in conteos.items():
+                destino[original] = destino.get(original, 0) + filas
+    return combinadas
+
+
+def nombres_a_mostrar(ortografias, alias=None):
+    """Nombre a mostrar por clave: ``{clave: nombre}``.
+
+    Es el nombre del alias o, si no hay, la ortografía con más filas (a
+    igualdad, la primera en aparecer) con los espacios colapsados.
+    """
+    alias = alias or {}
+    return {clave: alias.get(clave) or " ".join(max(conteos, key=conteos.get).split())
+            for clave, conteos in ortografias.items()}
+
+
+def renombrar_nombres(serie, nombres, alias=None):
+    """``serie`` como categórica con el nombre de ``nombres`` (``{clave: nombre}``) de cada categoría.
+
+    Las categorías de una misma clave se funden en una; las que no están en
+    ``nombres`` se muestran con sus espacios colapsados y los nombres vacíos
+    quedan nulos.
+    """
+    alias = alias or {}
+    serie = serie.astype("category")
+    mostrados = []
+    for original in serie.cat.categories:
+        clave = _clave_canonica(original, alias)
+        mostrados.append(nombres.get(clave, " ".join(str(original).split())) if clave else None)
+    mostrados = pd.Index(mostrados, dtype="object")
+    unicos = pd.Index(mostrados.dropna().unique(), dtype=serie.cat.categories.dtype)
+    # -1 al final: los códigos nulos (-1) siguen nulos
+    nuevos = np.append(unicos.get_indexer(mostrados), -1)
+    codigos = nuevos[serie.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codigos, unicos), index=serie.index, name=serie.name)
+
+
+def normalizar_nombres(serie, alias=None):
+    """``serie`` como categórica de nombres canónicos según sus propias ortografías.
+
+    ``alias`` es ``{clave: nombre}`` de la columna. Devuelve ``(serie,
+    ortografias)`` con los conteos de ``contar_ortografias``, para combinarlos
+    con los de otros bloques o meses y volver a renombrar el conjunto.
+    """
+    ortografias = contar_ortografias(serie, alias)
+    return renombrar_nombres(serie, nombres_a_mostrar(ortografias, alias), alias), ortografias
+
+
+def variantes_unificadas(ortografias, alias=None):
+    """``{ortografía original: nombre}`` de las variantes que se muestran con otro nombre.
+
+    Solo cuentan las claves que de verdad unen algo: con dos o más
+    ortografías distintas o con una entrada en ``alias``.
+    """
+    alias = alias or {}
+    nombres = nombres_a_mostrar(ortografias, alias)
+    return {original: nombres[clave] for clave, conteos in ortografias.items()
+            if len(conteos) > 1 or clave in alias
+            for original in conteos if original != nombres[clave]}
@@ -0,0 +1,117 @@
+"""Render progresivo de los dashboards.
+
+Las páginas no esperan a la sección más lenta para mostrarse:
+
+- los KPIs se pintan primero, del resumen precalculado de los libros
+  (``ingesta.resumen_libros``) cuando no hay filtros, sin esperar la carga;
+- cada sección tiene su lugar en la página desde el principio (``hueco``) y
+  se llena al terminar; las baratas (las que salen del cubo) van primero;
+- los cálculos de las secciones pesadas empiezan antes en hilos del pool
+  (``en_segundo_plano``) mientras se pintan las demás;
+- un fallo en una sección se muestra en su lugar y el resto de la página
+  sigue (``aislada``).
+
+Las tablas paginadas son fragmentos (``st.fragment``): paginar u ordenar solo
+re-ejecuta la tabla.
+"""
+import logging
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+
+import streamlit as st
+
+import graficos
+from instrumentacion import en_otro_hilo
+
+# Hilos para los cálculos en segundo plano, compartidos por todas las sesiones
+HILOS = int(os.environ.get("DASHBOARD_HILOS", 4))
+
+_pool = ThreadPoolExecutor(max_workers=HILOS, thread_name_prefix="segundo_plano")
+
+
+class _SinAvisoDeContexto(logging.Filter):
+    # Las cachés de Streamlit avisan de que el hilo no tiene ScriptRunContext;
+    # en los hilos propios, que no pertenecen a ninguna sesión, es lo esperado
+    def __init__(self):
+        super().__init__()
+        self.prefijos = {"segundo_plano"}
+
+    def filter(self, registro):
+        return not registro.threadName.startswith(tuple(self.prefijos))
+
+
+_filtro = _SinAvisoDeContexto()
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(_filtro)
+
+
+def hilos_sin_sesion(prefijo):
+    """Silencia el aviso de Streamlit al usar sus cachés desde los hilos ``prefijo*`` (sin sesión)."""
+    _filtro.prefijos.add(prefijo)
+
+
+class Tarea:
+    """Cálculo lanzado con ``en_segundo_plano``; ``resultado()`` espera a que termine."""
+
+    def __init__(self, futuro, calcular):
+        self._futuro = futuro
+        self._calcular = calcular
+
+    def resultado(self):
+        """Resultado del cálculo (o su excepción).
+
+        Si el pool aún no lo empezó (está ocupado con otras sesiones), se
+        cancela y se calcula en el hilo del script en lugar de esperar turno.
+        """
+        if self._futuro.cancel():
+            self._futuro = Future()
+            try:
+                self._futuro.set_result(self._calcular())
+            except Exception as e:
+                self._futuro.set_exception(e)
+        return self._futuro.result()
+
+
+def en_segundo_plano(nombre, funcion, *args, cacheada=False):
+    """Empieza ``funcion(*args)`` en un hilo del pool; devuelve su ``Tarea``.
+
+    ``nombre`` es la sección del perfil del rerun que lo mide (``cacheada`` si
+    ``funcion`` es una caché). ``funcion`` no debe pintar nada (``st.*``); las
+    funciones cacheadas sí pueden llamarse: si el script las pide antes de que
+    terminen, espera al mismo cálculo en lugar de repetirlo.
+    """
+    medida = en_otro_hilo(nombre, funcion, cacheada)
+    return Tarea(_pool.submit(medida, *args), lambda: medida(*args))
+
+
+def anticipar(figuras, version):
+    """Empieza a construir en segundo plano las ``figuras`` (``{id: construir}``) de la vista ``version``.
+
+    Quedan en la caché de ``graficos.figura``; ``graficos.mostrar`` las toma
+    de ahí (o espera a que terminen) en el orden de la página.
+    """
+    for id_grafico, construir in figuras.items():
+        en_segundo_plano(f"gráfico {id_grafico} (segundo plano)", graficos.figura, id_grafico, version, construir,
+                         cacheada=True)
+
+
+def hueco(texto="⏳ Calculando…"):
+    """Lugar reservado para una sección que se pinta más tarde, con ``texto`` mientras tanto.
+
+    Devuelve un ``st.empty()``: la sección se pinta dentro de ``hueco.container()``.
+    """
+    lugar = st.empty()
+    lugar.caption(texto)
+    return lugar
+
+
+@contextmanager
+def aislada(nombre):
+    """Sección de la página que, si falla, muestra su error en su lugar sin detener el resto.
+
+    ``st.stop()`` y ``st.rerun()`` no derivan de ``Exception`` y se propagan.
+    """
+    try:
+        yield
+    except Exception as e:
+        st.error(f"⚠️ No se pudo mostrar «{nombre}»: {e}")
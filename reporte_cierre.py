@@ -0,0 +1,249 @@
+"""Reporte de cierre sin abrir Streamlit.
+
+Carga los libros mensuales con la misma lógica que los dashboards (``ingesta``,
+con su caché Parquet), calcula los KPIs y agregados de cada página y los
+escribe por mes en ``<salida>/<esquema>/<periodo>/``:
+
+- una tabla por agregado en Parquet y/o CSV, más ``kpis.json``
+- ``reporte.html`` con todos los gráficos (autocontenido, sin servidor)
+- ``png/<grafico>.png`` si se pide ``--png`` y está instalado ``kaleido``
+
+Los meses se procesan en paralelo en un pool de procesos.
+
+Uso:
+    python reporte_cierre.py [--esquema cierre_gastos|pagos|todos] [--periodos 2026-01 2026-02]
+        [--salida reportes] [--formatos parquet csv] [--png] [--consolidado] [--procesos N]
+
+Termina con código 1 si algún mes no se pudo procesar.
+"""
+import argparse
+import importlib.util
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import graficos
+from agregados import (DIMENSIONES_CIERRE, MONTOS_CIERRE, MONTOS_PAGOS, cantidad_por_fecha, construir_cubo,
+                       distintos_por, rebanar, serie_diaria, serie_semanal, sumas_por, sumas_por_fecha, totales)
+from exportar import exportar
+from ingesta import ESQUEMAS, PERIODO, cargar_libro, cargar_periodos, describir_periodos, descubrir_libros
+from montos import conciliar, sumar
+
+FORMATOS_TABLA = ["parquet", "csv"]
+
+TITULOS = {
+    "cierre_gastos": "Cierre Gastos Administrativos",
+    "pagos": "Pagos",
+}
+
+
+def agregados_cierre(df):
+    """KPIs y tablas del dashboard de finanzas: ``(kpis, {nombre: DataFrame})``."""
+    cubo = construir_cubo(df, DIMENSIONES_CIERRE, MONTOS_CIERRE)
+    kpis = dict(totales(cubo, MONTOS_CIERRE), REGISTROS=len(df))
+    tablas = {
+        "cartera": rebanar(cubo, "CARTERA", MONTOS_CIERRE, orden="MONTO"),
+        "asesor": rebanar(cubo, "ASESOR", MONTOS_CIERRE, orden="MONTO"),
+        "campana": rebanar(cubo, "CAMPANA", MONTOS_CIERRE, orden="MONTO"),
+        "estado_planilla": rebanar(cubo, "ESTADO_PLANILLA", MONTOS_CIERRE, orden="MONTO"),
+        "semanal": serie_semanal(cubo, "FECHA_DE_PAGO", MONTOS_CIERRE),
+        "diario": serie_diaria(cubo, "FECHA_DE_PAGO", MONTOS_CIERRE, acumulado="MONTO"),
+        "descuadres": conciliar(df),
+    }
+    return kpis, tablas
+
+
+def graficos_cierre(kpis, tablas, periodos):
+    """Figuras del dashboard de finanzas a partir de ``agregados_cierre``."""
+    figuras = {
+        "monto_por_cartera": graficos.monto_por_cartera(tablas["cartera"].sort_values("MONTO"), kpis["MONTO"]),
+        "composicion_monto": graficos.composicion_monto(kpis["VALOR VENTA"], kpis["IGV"]),
+        "descomposicion_cartera": graficos.descomposicion_cartera(tablas["cartera"].sort_values("VALOR VENTA")),
+        "top_asesores": graficos.top_asesores_monto(tablas["asesor"].head(15)),
+    }
+    if len(tablas["diario"]):
+        figuras["monto_diario"] = graficos.monto_diario(tablas["diario"], periodos)
+        figuras["monto_acumulado"] = graficos.monto_acumulado(tablas["diario"], periodos)
+    if len(tablas["semanal"]):
+        figuras["monto_semanal"] = graficos.monto_semanal(tablas["semanal"])
+        figuras["composicion_semanal"] = graficos.composicion_semanal(tablas["semanal"])
+    figuras["analisis_campana"] = graficos.analisis_campana(tablas["campana"])
+    figuras["distribucion_estado"] = graficos.distribucion_estado(tablas["estado_planilla"])
+    return figuras
+
+
+def agregados_pagos(df):
+    """KPIs y tablas del dashboard de pagos: ``(kpis, {nombre: DataFrame})``."""
+    kpis = {col: sumar(df[col]) for col in MONTOS_PAGOS}
+    kpis.update(CARTERAS=int(df["CARTERA"].nunique()), ASESORES=int(df["ASESOR"].nunique()), REGISTROS=len(df))
+    tablas = {
+        "planilla_asesor": sumas_por(df, "ASESOR", ["PAGO PLANILLA"], orden="PAGO PLANILLA"),
+        "gastos_asesor": sumas_por(df, "ASESOR", ["PAGO GASTOS"], orden="PAGO GASTOS"),
+        "carteras_asesor": distintos_por(df, "ASESOR", "CARTERA", "Cantidad_Cartera"),
+        "pagos_por_fecha": sumas_por_fecha(df, "FECHA_DE_PAGO", {"PAGO PLANILLA": "Pago Planilla",
+                                                                 "PAGO GASTOS": "Pago Gastos"}),
+        "cantidad_por_fecha": cantidad_por_fecha(df, "FECHA_DE_PAGO"),
+        "campana": sumas_por(df, "CAMPAÑA", ["Suma Total"], orden="Suma Total"),
+        "razon_social": sumas_por(df, "RAZON SOCIAL", ["Suma Total", "Pago Planilla y Gastos"], orden="Suma Total"),
+        "totales_por_fecha": sumas_por_fecha(df, "Fecha de Pago", {"Suma Total": "Suma Total",
+                                                                   "Pago Planilla y Gastos": "Pago Planilla y Gastos"}),
+        "resumen_estadistico": df[["Suma Total", "Pago Planilla y Gastos"]].describe().rename_axis("estadistico").reset_index(),
+    }
+    return kpis, tablas
+
+
+def graficos_pagos(kpis, tablas, periodos):
+    """Figuras del dashboard de pagos a partir de ``agregados_pagos``."""
+    figuras = {
+        "planilla_asesor": graficos.barras(
+            tablas["planilla_asesor"].head(10), "ASESOR", "PAGO PLANILLA", "Top 10 - Pago Planilla por Asesor",
+            {"PAGO PLANILLA": "Monto (S/)", "ASESOR": "Asesor"}, "Blues", tickangle=-45),
+        "proporcion_planilla_gastos": graficos.proporcion(
+            "Tipo de Pago", ["Pago Planilla", "Pago Gastos"], [kpis["PAGO PLANILLA"], kpis["PAGO GASTOS"]],
+            "Proporción: Pago Planilla vs Pago Gastos"),
+        "gastos_asesor": graficos.barras(
+            tablas["gastos_asesor"].head(10), "ASESOR", "PAGO GASTOS", "Top 10 - Pago Gastos por Asesor",
+            {"PAGO GASTOS": "Monto (S/)", "ASESOR": "Asesor"}, "Oranges", tickangle=-45),
+        "carteras_asesor": graficos.barras(
+            tablas["carteras_asesor"].head(10), "ASESOR", "Cantidad_Cartera", "Top 10 - Carteras por Asesor",
+            {"Cantidad_Cartera": "Cantidad", "ASESOR": "Asesor"}, "Greens", tickangle=-45),
+        "evolucion_cierre": graficos.evolucion_pagos(
+            tablas["pagos_por_fecha"], "Fecha",
+            [("Pago Planilla", "Pago Planilla", "#1f77b4"), ("Pago Gastos", "Pago Gastos", "#ff7f0e")]),
+        "cantidad_por_fecha": graficos.cantidad_por_fecha(tablas["cantidad_por_fecha"]),
+        "suma_campana": graficos.barras(
+            tablas["campana"], "CAMPAÑA", "Suma Total", "Suma Total por Campaña",
+            {"Suma Total": "Monto (S/)", "CAMPAÑA": "Campaña"}, "Blues"),
+        "proporcion_suma_pyg": graficos.proporcion(
+            "Tipo", ["Suma Total", "Pago P y G"], [kpis["Suma Total"], kpis["Pago Planilla y Gastos"]],
+            "Proporción: Suma Total vs Pago P y G"),
+        "razon_social": graficos.comparacion_razon_social(tablas["razon_social"].head(10)),
+    }
+    if len(tablas["totales_por_fecha"]):
+        figuras["evolucion_totales"] = graficos.evolucion_pagos(
+            tablas["totales_por_fecha"], "Fecha",
+            [("Suma Total", "Suma Total", "#1f77b4"), ("Pago Planilla y Gastos", "Pago P y G", "#ff7f0e")])
+    return figuras
+
+
+REPORTES = {
+    "cierre_gastos": (agregados_cierre, graficos_cierre),
+    "pagos": (agregados_pagos, graficos_pagos),
+}
+
+
+def _html(titulo, kpis, figuras):
+    # Un solo archivo: plotly.js se incluye una vez, con el primer gráfico
+    filas_kpis = "".join(
+        f"<tr><th>{nombre}</th><td>{valor:,.2f}</td></tr>" if isinstance(valor, float)
+        else f"<tr><th>{nombre}</th><td>{valor:,}</td></tr>"
+        for nombre, valor in kpis.items()
+    )
+    cuerpo = "".join(
+        fig.to_html(full_html=False, include_plotlyjs=(i == 0)) for i, fig in enumerate(figuras.values())
+    )
+    return (f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{titulo}</title></head>"
+            f"<body><h1>{titulo}</h1><table>{filas_kpis}</table>{cuerpo}</body></html>")
+
+
+def escribir_reporte(nombre_esquema, df, periodos, destino, formatos=FORMATOS_TABLA, png=False):
+    """Calcula y escribe el reporte de ``df`` en ``destino``; devuelve los KPIs.
+
+    ``periodos`` es el texto de los meses incluidos (p.ej. ``Enero 2026``).
+    """
+    calcular, dibujar = REPORTES[nombre_esquema]
+    kpis, tablas = calcular(df)
+    figuras = dibujar(kpis, tablas, periodos)
+    titulo = f"{TITULOS[nombre_esquema]} - {periodos}"
+
+    destino.mkdir(parents=True, exist_ok=True)
+    for nombre, tabla in tablas.items():
+        for formato in formatos:
+            (destino / f"{nombre}.{formato}").write_bytes(exportar(tabla, formato))
+    (destino / "kpis.json").write_text(json.dumps(kpis, ensure_ascii=False, indent=2), encoding="utf-8")
+    (destino / "reporte.html").write_text(_html(titulo, kpis, figuras), encoding="utf-8")
+
+    if png:
+        (destino / "png").mkdir(exist_ok=True)
+        for nombre, fig in figuras.items():
+            fig.write_image(destino / "png" / f"{nombre}.png", width=1400)
+    return kpis
+
+
+def reporte_periodo(nombre_esquema, ruta, periodo, salida, formatos=FORMATOS_TABLA, png=False):
+    """Reporte de un libro mensual (se ejecuta en un proceso del pool)."""
+    df, _ = cargar_libro(nombre_esquema, ruta.parent, ruta.name)
+    return escribir_reporte(nombre_esquema, df, describir_periodos([periodo]),
+                            Path(salida) / nombre_esquema / str(periodo), formatos, png)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera los reportes de cierre sin abrir los dashboards.")
+    parser.add_argument("--esquema", choices=sorted(ESQUEMAS) + ["todos"], default="todos",
+                        help="Libros a procesar (por defecto, todos)")
+    parser.add_argument("--directorio", default=None, help="Carpeta de los libros (por defecto, la de este script)")
+    parser.add_argument("--periodos", nargs="*", default=None,
+                        help="Meses a procesar como AAAA-MM (por defecto, todos los encontrados)")
+    parser.add_argument("--salida", default="reportes", help="Carpeta de salida (por defecto 'reportes')")
+    parser.add_argument("--formatos", nargs="+", choices=FORMATOS_TABLA, default=FORMATOS_TABLA,
+                        help="Formatos de las tablas (por defecto parquet y csv)")
+    parser.add_argument("--png", action="store_true", help="Exportar también cada gráfico como PNG (requiere kaleido)")
+    parser.add_argument("--consolidado", action="store_true",
+                        help="Añadir un reporte de todos los meses juntos en <salida>/<esquema>/consolidado")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos en paralelo (por defecto, uno por CPU)")
+    args = parser.parse_args(argv)
+
+    png = args.png
+    if png and importlib.util.find_spec("kaleido") is None:
+        print("⚠ No está instalado 'kaleido': se omiten los PNG (pip install kaleido)")
+        png = False
+
+    esquemas = sorted(ESQUEMAS) if args.esquema == "todos" else [args.esquema]
+    trabajos = [
+        (nombre, ruta, periodo)
+        for nombre in esquemas
+        for periodo, ruta in descubrir_libros(nombre, args.directorio)
+        if not args.periodos or str(periodo) in args.periodos
+    ]
+    if not trabajos:
+        print("No se encontraron libros para los esquemas y periodos indicados.")
+        return 1
+
+    fallidos = 0
+    with ProcessPoolExecutor(max_workers=args.procesos) as pool:
+        futuros = {
+            (nombre, periodo): pool.submit(reporte_periodo, nombre, ruta, periodo, args.salida, args.formatos, png)
+            for nombre, ruta, periodo in trabajos
+        }
+        for (nombre, periodo), futuro in futuros.items():
+            try:
+                kpis = futuro.result()
+            except Exception as e:
+                fallidos += 1
+                print(f"  ✗ {nombre} {periodo}: {e}")
+            else:
+                print(f"  ✓ {nombre} {periodo}: {kpis['REGISTROS']:,} registros -> "
+                      f"{Path(args.salida) / nombre / str(periodo)}")
+
+    if args.consolidado:
+        for nombre in esquemas:
+            periodos = [periodo for n, _, periodo in trabajos if n == nombre]
+            if not periodos:
+                continue
+            try:
+                df, _ = cargar_periodos(nombre, args.directorio, max_procesos=args.procesos)
+                if args.periodos:
+                    df = df[df[PERIODO].isin(args.periodos)]
+                destino = Path(args.salida) / nombre / "consolidado"
+                escribir_reporte(nombre, df, describir_periodos(periodos), destino, args.formatos, png)
+            except Exception as e:
+                fallidos += 1
+                print(f"  ✗ {nombre} consolidado: {e}")
+            else:
+                print(f"  ✓ {nombre} consolidado: {len(df):,} registros -> {destino}")
+    return 1 if fallidos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""Modo snapshot: los dashboards arrancan desde un paquete precalculado.
+
+Un paso offline (``python snapshot.py``) carga los libros con ``ingesta`` y
+escribe por esquema un paquete versionado en ``<destino>/<esquema>/<version>/``:
+
+- ``datos.arrow``: el DataFrame tipado (Arrow IPC sin comprimir)
+- un ``.arrow`` por agregado precalculado (``cubo`` y ``descuadres`` del CIERRE)
+- ``manifiesto.json``: versión de los datos, reporte de ingesta y tablas
+
+``<destino>/<esquema>/actual.json`` apunta al último paquete y se reemplaza de
+forma atómica, así que un dashboard nunca lee un paquete a medias. Con
+``DASHBOARD_SNAPSHOT=<destino>`` los dashboards abren los archivos Arrow con
+``memory_map`` al arrancar y no tocan el Excel.
+
+Uso:
+    python snapshot.py [--esquema cierre_gastos|pagos|todos] [--directorio .] [--destino snapshots] [--forzar]
+
+Sin ``--forzar`` solo se reconstruye el paquete si cambió algún libro.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pyarrow as pa
+
+from agregados import DIMENSIONES_CIERRE, MONTOS_CIERRE, construir_cubo
+from cache_datos import escribir_atomico
+from ingesta import ESQUEMAS, cargar_periodos, huella_libros
+from montos import conciliar
+
+# Carpeta de los paquetes; si no se define, los dashboards leen los Excel
+DIRECTORIO_SNAPSHOT = os.environ.get("DASHBOARD_SNAPSHOT")
+
+# Subir este número invalida los paquetes escritos con un formato anterior
+VERSION_SNAPSHOT = 2
+
+# Paquetes que se conservan por esquema (el actual y el anterior, que puede
+# seguir abierto en alguna sesión)
+PAQUETES_CONSERVADOS = 2
+
+
+def _precalculados(nombre_esquema, df):
+    # Agregados que los dashboards necesitan antes del primer gráfico
+    if nombre_esquema == "cierre_gastos":
+        return {
+            "cubo": construir_cubo(df, DIMENSIONES_CIERRE, MONTOS_CIERRE),
+            "descuadres": conciliar(df),
+        }
+    return {}
+
+
+def _escribir_arrow(df, ruta):
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(str(ruta), "wb") as salida, pa.ipc.new_file(salida, tabla.schema) as escritor:
+        escritor.write_table(tabla)
+
+
+def _leer_arrow(ruta):
+    # Archivo mapeado en memoria: las columnas se leen sin copiar el archivo
+    # completo a un búfer intermedio
+    return pa.ipc.open_file(pa.memory_map(str(ruta), "r")).read_all().to_pandas()
+
+
+def _carpeta_esquema(nombre_esquema, destino=None):
+    destino = destino or DIRECTORIO_SNAPSHOT or Path(__file__).parent / "snapshots"
+    return Path(destino) / nombre_esquema
+
+
+def manifiesto_snapshot(nombre_esquema, destino=None):
+    """Manifiesto del paquete vigente del esquema, o None si no hay modo snapshot o paquete."""
+    if destino is None and DIRECTORIO_SNAPSHOT is None:
+        return None
+    try:
+        with open(_carpeta_esquema(nombre_esquema, destino) / "actual.json", encoding="utf-8") as f:
+            manifiesto = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifiesto.get("version_snapshot") != VERSION_SNAPSHOT:
+        return None
+    return manifiesto
+
+
+def cargar_snapshot(manifiesto, destino=None):
+    """Lee el paquete del ``manifiesto``: ``(df, reporte, {agregado: DataFrame})``.
+
+    ``reporte`` es el de ``ingesta.cargar_periodos`` al construir el paquete.
+    """
+    carpeta = _carpeta_esquema(manifiesto["esquema"], destino) / manifiesto["carpeta"]
+    df = _leer_arrow(carpeta / "datos.arrow")
+    precalculados = {nombre: _leer_arrow(carpeta / f"{nombre}.arrow") for nombre in manifiesto["precalculados"]}
+    return df, manifiesto["reporte"], precalculados
+
+
+def construir_snapshot(nombre_esquema, directorio=None, destino=None, forzar=False):
+    """Construye el paquete del esquema a partir de los libros de ``directorio``.
+
+    Devuelve ``(manifiesto, construido)``; ``construido`` es False si el paquete
+    vigente ya corresponde a los libros actuales (y no se pidió ``forzar``).
+    """
+    carpeta_esquema = _carpeta_esquema(nombre_esquema, destino)
+    huella = [list(h) for h in huella_libros(nombre_esquema, directorio)]
+    actual = manifiesto_snapshot(nombre_esquema, carpeta_esquema.parent)
+    if actual is not None and not forzar and actual["huella"] == huella:
+        return actual, False
+
+    df, reporte = cargar_periodos(nombre_esquema, directorio)
+    precalculados = _precalculados(nombre_esquema, df)
+
+    carpeta = carpeta_esquema / reporte["version"][:16]
+    carpeta.mkdir(parents=True, exist_ok=True)
+    for nombre, tabla in dict(precalculados, datos=df).items():
+        escribir_atomico(carpeta / f"{nombre}.arrow", lambda ruta, tabla=tabla: _escribir_arrow(tabla, ruta))
+
+    manifiesto = {
+        "version_snapshot": VERSION_SNAPSHOT,
+        "esquema": nombre_esquema,
+        "version": reporte["version"],
+        "creado": datetime.now().isoformat(timespec="seconds"),
+        "carpeta": carpeta.name,
+        "huella": huella,
+        "precalculados": list(precalculados),
+        "reporte": reporte,
+    }
+    contenido = json.dumps(manifiesto, ensure_ascii=False, indent=2)
+    escribir_atomico(carpeta / "manifiesto.json", lambda ruta: ruta.write_text(contenido, encoding="utf-8"))
+    # El puntero se cambia al final: hasta aquí los dashboards siguen con el paquete anterior
+    escribir_atomico(carpeta_esquema / "actual.json", lambda ruta: ruta.write_text(contenido, encoding="utf-8"))
+
+    anteriores = sorted((p for p in carpeta_esquema.iterdir() if p.is_dir() and p != carpeta),
+                        key=lambda p: p.stat().st_mtime, reverse=True)
+    for vieja in anteriores[PAQUETES_CONSERVADOS - 1:]:
+        shutil.rmtree(vieja, ignore_errors=True)
+    return manifiesto, True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Construye los paquetes snapshot que leen los dashboards al arrancar.")
+    parser.add_argument("--esquema", choices=sorted(ESQUEMAS) + ["todos"], default="todos",
+                        help="Libros a empaquetar (por defecto, todos)")
+    parser.add_argument("--directorio", default=None, help="Carpeta de los libros (por defecto, la de este script)")
+    parser.add_argument("--destino", default=None,
+                        help="Carpeta de los paquetes (por defecto DASHBOARD_SNAPSHOT o 'snapshots')")
+    parser.add_argument("--forzar", action="store_true", help="Reconstruir aunque los libros no hayan cambiado")
+    args = parser.parse_args(argv)
+
+    esquemas = sorted(ESQUEMAS) if args.esquema == "todos" else [args.esquema]
+    fallidos = 0
+    for nombre in esquemas:
+        try:
+            manifiesto, construido = construir_snapshot(nombre, args.directorio, args.destino, args.forzar)
+        except Exception as e:
+            fallidos += 1
+            print(f"  ✗ {nombre}: {e}")
+            continue
+        estado = "construido" if construido else "sin cambios"
+        print(f"  ✓ {nombre}: {manifiesto['reporte']['filas']:,} registros, {estado} "
+              f"-> {_carpeta_esquema(nombre, args.destino) / manifiesto['carpeta']}")
+    return 1 if fallidos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
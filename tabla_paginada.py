@@ -0,0 +1,163 @@
+"""Tabla de "Datos Detallados" paginada en el servidor.
+
+En lugar de enviar el DataFrame completo al navegador, se filtra y ordena
+sobre las columnas tipadas y solo se formatea y envía la página visible, así
+el tamaño del mensaje Arrow por rerun no depende del número de filas.
+
+Con una ``motor_sql.Vista`` en lugar del DataFrame la página se pide a DuckDB
+con ``ORDER BY ... LIMIT ... OFFSET``; en ese modo no hay filtro por columna
+(los filtros de la barra lateral ya se aplican en la vista).
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from instrumentacion import anotar_carga, marcar_fallo
+
+TAMANOS_PAGINA = [25, 50, 100, 250]
+
+
+@st.cache_data(max_entries=32)
+def _orden(_df, version, columna, ascendente):
+    # Permutación de filas ordenada por columna; se calcula una vez por versión de datos
+    marcar_fallo()
+    serie = _df[columna].reset_index(drop=True)
+    return serie.sort_values(ascending=ascendente, na_position="last", kind="stable").index.to_numpy()
+
+
+def _mascara_filtro(df, columna, clave):
+    """Widgets de filtro para ``columna`` según su tipo; devuelve la máscara o None."""
+    serie = df[columna]
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        minimo, maximo = serie.min(), serie.max()
+        if pd.isna(minimo):
+            return None
+        rango = st.date_input("Rango de fechas", value=(minimo.date(), maximo.date()), key=f"{clave}_fechas")
+        if len(rango) != 2:
+            return None
+        inicio, fin = pd.Timestamp(rango[0]), pd.Timestamp(rango[1]) + pd.Timedelta(days=1)
+        return (serie >= inicio) & (serie < fin)
+    if pd.api.types.is_numeric_dtype(serie):
+        col_min, col_max = st.columns(2)
+        minimo = col_min.number_input("Mínimo", value=None, key=f"{clave}_min")
+        maximo = col_max.number_input("Máximo", value=None, key=f"{clave}_max")
+        mascara = pd.Series(True, index=serie.index)
+        if minimo is not None:
+            mascara &= (serie >= minimo).fillna(False)
+        if maximo is not None:
+            mascara &= (serie <= maximo).fillna(False)
+        return mascara
+    texto = st.text_input("Contiene", key=f"{clave}_texto").strip()
+    if not texto:
+        return None
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Se busca en las categorías (pocas) y se filtra por código, sin recorrer cadenas por fila
+        categorias = serie.cat.categories
+        coincidentes = np.flatnonzero(categorias.astype(str).str.contains(texto, case=False, regex=False))
+        return pd.Series(np.isin(serie.cat.codes.to_numpy(), coincidentes), index=serie.index)
+    return serie.astype("string").str.contains(texto, case=False, regex=False).fillna(False)
+
+
+def formatear_montos(df, columnas_monto):
+    """Copia de ``df`` con los montos como texto ``S/ 1,234.56`` (solo para mostrar)."""
+    df = df.copy()
+    for col in columnas_monto:
+        if col in df.columns:
+            df[col] = df[col].map(lambda x: f"S/ {x:,.2f}" if pd.notna(x) else "")
+    return df
+
+
+def _controles(columnas, clave, con_filtro=True):
+    # Filtro, orden, sentido y tamaño de página; misma disposición en ambos modos
+    col_filtro, col_orden, col_sentido, col_tamano = st.columns([2, 2, 1, 1])
+    columna_filtro = "(ninguna)"
+    if con_filtro:
+        with col_filtro:
+            columna_filtro = st.selectbox("Filtrar por", ["(ninguna)"] + list(columnas), key=f"{clave}_col_filtro")
+    with col_orden:
+        columna_orden = st.selectbox("Ordenar por", ["(original)"] + list(columnas), key=f"{clave}_col_orden")
+    with col_sentido:
+        ascendente = st.radio("Sentido", ["↑", "↓"], horizontal=True, key=f"{clave}_sentido") == "↑"
+    with col_tamano:
+        tamano = st.selectbox("Filas por página", TAMANOS_PAGINA, index=1, key=f"{clave}_tamano")
+    return columna_filtro, columna_orden, ascendente, tamano
+
+
+def _pagina(total, tamano, clave):
+    # Selector de página; devuelve (inicio, fin) de la página visible
+    paginas = max(1, -(-total // tamano))
+    clave_pagina = f"{clave}_pagina"
+    if st.session_state.get(clave_pagina, 1) > paginas:
+        # Al filtrar puede haber menos páginas que la seleccionada
+        st.session_state[clave_pagina] = paginas
+    col_pagina, col_info = st.columns([1, 3])
+    with col_pagina:
+        pagina = st.number_input("Página", min_value=1, max_value=paginas, step=1, key=clave_pagina)
+    inicio = (pagina - 1) * tamano
+    fin = min(inicio + tamano, total)
+    with col_info:
+        st.caption(f"Mostrando filas {inicio + 1 if total else 0}–{fin} de {total:,} (página {pagina} de {paginas})")
+    return inicio, fin
+
+
+def _mostrar_tabla_sql(vista, clave, columnas, columnas_monto, height):
+    # Orden y página resueltos en DuckDB: solo la página visible llega a pandas
+    _, columna_orden, ascendente, tamano = _controles(columnas, clave, con_filtro=False)
+    orden = None if columna_orden == "(original)" else columna_orden
+    inicio, fin = _pagina(len(vista), tamano, clave)
+    visible = formatear_montos(vista.filas(columnas, orden, ascendente, limite=fin - inicio, desplazamiento=inicio),
+                               columnas_monto)
+    st.dataframe(visible, width='stretch', height=height)
+    anotar_carga(visible)
+    return None, ("(ninguna)", (), columna_orden, ascendente)
+
+
+def filas_tabla(df, columnas, posiciones, firma):
+    """Filas (con ``columnas``) de la vista de la tabla que devolvió ``mostrar_tabla_paginada``, p.ej. para exportarlas."""
+    if posiciones is None and not isinstance(df, pd.DataFrame):
+        _, _, columna_orden, ascendente = firma
+        return df.filas(columnas, None if columna_orden == "(original)" else columna_orden, ascendente)
+    return df[columnas].iloc[posiciones]
+
+
+def mostrar_tabla_paginada(df, clave, version, columnas=None, columnas_monto=(), height=400):
+    """Muestra ``df`` paginado con filtro y orden por columna.
+
+    ``clave`` distingue los widgets de cada tabla de la página y ``version``
+    identifica los datos (para memoizar el orden). Solo la página visible se
+    formatea (montos en ``columnas_monto``) y se envía al navegador.
+
+    Devuelve ``(posiciones, firma)``: las posiciones de las filas filtradas y
+    ordenadas, y una tupla hashable que describe el filtro y orden activos
+    (p.ej. para cachear una exportación de esa vista). Con una vista SQL
+    ``posiciones`` es None (ver ``filas_tabla``).
+    """
+    if not isinstance(df, pd.DataFrame):
+        return _mostrar_tabla_sql(df, clave, list(df.columns) if columnas is None else columnas,
+                                  columnas_monto, height)
+    if columnas is not None:
+        df = df[columnas]
+
+    columna_filtro, columna_orden, ascendente, tamano = _controles(df.columns, clave)
+
+    mascara = None
+    if columna_filtro != "(ninguna)":
+        mascara = _mascara_filtro(df, columna_filtro, clave)
+
+    if columna_orden != "(original)":
+        posiciones = _orden(df, version, columna_orden, ascendente)
+        if mascara is not None:
+            posiciones = posiciones[mascara.to_numpy()[posiciones]]
+    else:
+        posiciones = np.arange(len(df)) if mascara is None else np.flatnonzero(mascara.to_numpy())
+
+    inicio, fin = _pagina(len(posiciones), tamano, clave)
+    visible = formatear_montos(df.iloc[posiciones[inicio:fin]], columnas_monto)
+    st.dataframe(visible, width='stretch', height=height)
+    anotar_carga(visible)
+
+    valores_filtro = tuple(
+        str(st.session_state.get(f"{clave}_{sufijo}")) for sufijo in ("fechas", "min", "max", "texto")
+    ) if mascara is not None else ()
+    firma = (columna_filtro, valores_filtro, columna_orden, ascendente)
+    return posiciones, firma
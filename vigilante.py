@@ -0,0 +1,130 @@
+"""Precarga en segundo plano de los libros nuevos o modificados.
+
+Sin vigilante, el primer usuario que abre la página después de que finanzas
+deja un Excel actualizado paga en su rerun la lectura y los agregados. El
+``Vigilante`` es un hilo por proceso que cada ``DASHBOARD_VIGILAR`` segundos
+(10 por defecto) calcula la huella de los libros de sus esquemas
+(``ingesta.huella_libros``: ruta, mtime y tamaño, sin abrirlos) y, cuando
+cambia:
+
+1. espera a que se repita en dos revisiones seguidas, para no leer un libro
+   que aún se está copiando;
+2. llama a ``precargar(huellas)``, que deja en caché lo que usa el primer
+   rerun de esa versión (datos, cubo, conciliación, índice de filtros y
+   gráficos sin filtros);
+3. publica las huellas nuevas. Hasta entonces ``huella()`` devuelve las
+   anteriores, así que las sesiones nunca ven una versión a medio construir.
+
+Si la precarga falla (p.ej. un libro dañado) se sigue sirviendo la versión
+anterior, el error queda en ``estado()`` y se reintenta cuando los libros
+vuelvan a cambiar. ``DASHBOARD_VIGILAR=0`` desactiva el vigilante: cada rerun
+calcula la huella y el primero tras un cambio carga la versión nueva.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+from ingesta import huella_libros
+from progresivo import hilos_sin_sesion
+
+# Segundos entre revisiones de los libros (0 desactiva el vigilante)
+INTERVALO = float(os.environ.get("DASHBOARD_VIGILAR", 10))
+
+
+hilos_sin_sesion("vigilante")
+
+
+def vigilancia_activa():
+    """True si hay que vigilar los libros (``DASHBOARD_VIGILAR`` distinto de 0)."""
+    return INTERVALO > 0
+
+
+class Vigilante:
+    """Hilo que vigila los libros de ``esquemas`` y publica cada versión ya precargada.
+
+    ``precargar(huellas)`` recibe ``{esquema: huella}`` y corre en el hilo del
+    vigilante; no debe usar ``st.*`` más allá de las funciones cacheadas.
+    """
+
+    def __init__(self, esquemas, precargar, intervalo=None, directorio=None):
+        self.esquemas = list(esquemas)
+        self.intervalo = INTERVALO if intervalo is None else intervalo
+        self.directorio = directorio
+        self._precargar = precargar
+        self._publicadas = None  # {esquema: huella} de la última versión precargada
+        self._estado = {"precargas": 0, "fallos": 0, "ultima_precarga": None, "segundos": None, "error": None}
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._vigilar, name=f"vigilante-{'-'.join(self.esquemas)}", daemon=True)
+
+    def iniciar(self):
+        """Arranca el hilo y devuelve el propio vigilante."""
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        """Pide al hilo que termine tras la revisión en curso."""
+        self._detener.set()
+
+    def huella(self, nombre_esquema):
+        """Huella publicada de ``nombre_esquema``; antes de la primera publicación, la de los libros en disco."""
+        with self._lock:
+            publicadas = self._publicadas
+        if publicadas is None:
+            return huella_libros(nombre_esquema, self.directorio)
+        return publicadas[nombre_esquema]
+
+    def estado(self):
+        """Precargas hechas y fallidas, hora y duración de la última y último error."""
+        with self._lock:
+            return dict(self._estado)
+
+    def resumen(self):
+        """Estado en una línea de texto, para mostrar en la barra lateral."""
+        estado = self.estado()
+        texto = f"Revisando los libros cada {self.intervalo:g} s · {estado['precargas']} precargas"
+        if estado["ultima_precarga"] is not None:
+            texto += f" · última {estado['ultima_precarga']:%H:%M:%S} ({estado['segundos']:.1f} s)"
+        if estado["error"] is not None:
+            texto += f" · ⚠️ falló la precarga: {estado['error']}"
+        return texto
+
+    def _revisar(self):
+        try:
+            return {nombre: huella_libros(nombre, self.directorio) for nombre in self.esquemas}
+        except OSError:
+            # Un libro desapareció entre el listado y su stat: se revisa en la próxima vuelta
+            return None
+
+    def _publicar(self, huellas):
+        inicio = time.perf_counter()
+        try:
+            self._precargar(huellas)
+        except Exception as e:
+            with self._lock:
+                self._estado.update(fallos=self._estado["fallos"] + 1, error=f"{type(e).__name__}: {e}")
+            return False
+        with self._lock:
+            # Cambio atómico: el siguiente rerun de cada sesión ya usa la versión nueva
+            self._publicadas = huellas
+            self._estado.update(precargas=self._estado["precargas"] + 1, ultima_precarga=datetime.now(),
+                                segundos=time.perf_counter() - inicio, error=None)
+        return True
+
+    def _vigilar(self):
+        anteriores = None  # huellas de la revisión anterior
+        fallidas = None  # huellas cuya precarga falló (no se reintenta hasta que cambien)
+        primera = True
+        while True:
+            huellas = self._revisar()
+            with self._lock:
+                publicadas = self._publicadas
+            # Al arrancar se precarga sin esperar; después, solo huellas estables
+            estable = primera or huellas == anteriores
+            if huellas is not None and estable and huellas != publicadas and huellas != fallidas:
+                fallidas = None if self._publicar(huellas) else huellas
+            anteriores = huellas
+            primera = False
+            if self._detener.wait(self.intervalo):
+                return